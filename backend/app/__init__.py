@@ -8,7 +8,10 @@ jwt = JWTManager()
 
 
 def create_app():
+    from app.utils.storage import UploadRequest
+
     app = Flask(__name__)
+    app.request_class = UploadRequest
     app.config["JWT_SECRET_KEY"] = "super-secret-key"  # Change this in production
     app.config["JWT_TOKEN_LOCATION"] = ["cookies"]
     app.config["JWT_COOKIE_SECURE"] = False  # Set to True in production
@@ -38,24 +41,144 @@ def create_app():
     app.config["UPLOAD_FOLDER"] = os.path.join(base_dir, "data/uploads")
     app.config["SUMMARY_FOLDER"] = os.path.join(base_dir, "data/summaries")
     app.config["FLASHCARDS_FOLDER"] = os.path.join(base_dir, "data/flashcards")
+    app.config["QUIZ_FOLDER"] = os.path.join(base_dir, "data/quizzes")
+    app.config["TEXT_CACHE_FOLDER"] = os.path.join(base_dir, "data/text_cache")
+    app.config["TEXT_CACHE_MAX_ENTRIES"] = 32
+    app.config["TEXT_CACHE_MAX_BYTES"] = 64 * 1024 * 1024
+    # Documents still above this many tokens after cleaning are cut to it
+    app.config["TEXT_TOKEN_BUDGET"] = int(os.environ.get("TEXT_TOKEN_BUDGET", 100000))
+    # PDFs with at least PDF_PARALLEL_MIN_PAGES pages are split across workers
+    app.config["PDF_WORKERS"] = int(os.environ.get("PDF_WORKERS", os.cpu_count() or 1))
+    app.config["PDF_PARALLEL_MIN_PAGES"] = int(
+        os.environ.get("PDF_PARALLEL_MIN_PAGES", 40)
+    )
+    app.config["PDF_PAGE_TIMEOUT"] = float(os.environ.get("PDF_PAGE_TIMEOUT", 10))
+    app.config["RETRIEVAL_FOLDER"] = os.path.join(base_dir, "data/retrieval")
+    app.config["RETRIEVAL_CHUNK_TOKENS"] = int(
+        os.environ.get("RETRIEVAL_CHUNK_TOKENS", 300)
+    )
+    # Share of zeroed rows at which the storage GC rewrites a retrieval index
+    app.config["RETRIEVAL_COMPACT_FRACTION"] = float(
+        os.environ.get("RETRIEVAL_COMPACT_FRACTION", 0.25)
+    )
+    app.config["LLM_CACHE_FOLDER"] = os.path.join(base_dir, "data/llm_cache")
+    app.config["LLM_CACHE_MAX_BYTES"] = 256 * 1024 * 1024
+    app.config["JOB_WORKERS"] = int(os.environ.get("JOB_WORKERS", 4))
+    app.config["JOB_MAX_FINISHED"] = 1000
+    # Threads for work scheduled ahead of demand, kept apart from JOB_WORKERS
+    app.config["JOB_BACKGROUND_WORKERS"] = int(
+        os.environ.get("JOB_BACKGROUND_WORKERS", 1)
+    )
+    # What to compute as soon as a file is uploaded: any of text, summary, flashcards
+    app.config["PRECOMPUTE"] = {
+        kind.strip()
+        for kind in os.environ.get("PRECOMPUTE", "text").split(",")
+        if kind.strip()
+    }
+    # Jobs one batch upload may have queued or running at once, and files per batch
+    app.config["BATCH_CONCURRENCY"] = int(os.environ.get("BATCH_CONCURRENCY", 2))
+    app.config["BATCH_MAX_FILES"] = int(os.environ.get("BATCH_MAX_FILES", 100))
+    app.config["MAX_UPLOAD_BYTES"] = int(
+        os.environ.get("MAX_UPLOAD_BYTES", 100 * 1024 * 1024)
+    )
+    # Leave room for the multipart envelope around the file itself
+    app.config["MAX_CONTENT_LENGTH"] = app.config["MAX_UPLOAD_BYTES"] + 1024 * 1024
+    # /upload_batch carries up to BATCH_MAX_FILES files, each within MAX_UPLOAD_BYTES
+    app.config["BATCH_MAX_CONTENT_LENGTH"] = int(
+        os.environ.get(
+            "BATCH_MAX_CONTENT_LENGTH",
+            app.config["BATCH_MAX_FILES"] * app.config["MAX_UPLOAD_BYTES"]
+            + 1024 * 1024,
+        )
+    )
     app.config["ALLOWED_EXTENSIONS"] = {"pdf", "docx", "doc", "txt"}
+    # How long browsers may reuse a saved artifact before revalidating its ETag
+    app.config["ARTIFACT_CACHE_SECONDS"] = int(
+        os.environ.get("ARTIFACT_CACHE_SECONDS", 0)
+    )
+    # Upload bytes each signed-in user may keep; 0 means no limit
+    app.config["USER_QUOTA_BYTES"] = int(
+        os.environ.get("USER_QUOTA_BYTES", 1024 * 1024 * 1024)
+    )
+    # Seconds between storage GC passes; 0 turns the GC off
+    app.config["STORAGE_GC_INTERVAL"] = int(os.environ.get("STORAGE_GC_INTERVAL", 3600))
+    # Summaries, flashcards, quizzes and extracted text unused for ARTIFACT_TTL
+    # seconds are deleted, and the least recently used ones once they take up
+    # more than DERIVED_MAX_BYTES; saved artifacts are restored from the database
+    app.config["ARTIFACT_TTL"] = int(os.environ.get("ARTIFACT_TTL", 30 * 24 * 3600))
+    app.config["DERIVED_MAX_BYTES"] = int(
+        os.environ.get("DERIVED_MAX_BYTES", 2 * 1024 * 1024 * 1024)
+    )
+    # Uploads no document refers to are deleted after this many seconds unused
+    app.config["ANONYMOUS_UPLOAD_TTL"] = int(
+        os.environ.get("ANONYMOUS_UPLOAD_TTL", 7 * 24 * 3600)
+    )
+    app.config["LOG_FOLDER"] = os.path.join(base_dir, "logs")
+    # Each server process writes its metrics here; /metrics serves their sum
+    app.config["METRICS_FOLDER"] = os.path.join(base_dir, "data/metrics")
+    app.config["LOG_LEVEL"] = os.environ.get("LOG_LEVEL", "DEBUG").upper()
 
     # Ensure folders exist
     os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
     os.makedirs(app.config["SUMMARY_FOLDER"], exist_ok=True)
     os.makedirs(app.config["FLASHCARDS_FOLDER"], exist_ok=True)
+    os.makedirs(app.config["QUIZ_FOLDER"], exist_ok=True)
+
+    from app.utils import log
+    from app.utils.metrics import metrics
+
+    log.init_app(app)
+    metrics.init_app(app)
+
+    from app.utils.text_cache import text_cache
+
+    text_cache.init_app(app)
+
+    from app.utils.retrieval import retrieval
+
+    retrieval.init_app(app)
+
+    from app.utils.jobs import jobs
+
+    jobs.init_app(app)
+
+    from app.utils.batches import batches
+
+    batches.init_app(app)
+
+    from app.ai.llm_cache import llm_cache
+
+    llm_cache.init_app(app)
+
+    from app.utils.storage_manager import storage_manager
+
+    storage_manager.init_app(app)
 
     # Import and register blueprints
     from app.routes.upload_routes import upload_bp
     from app.routes.summary_routes import summary_bp
     from app.routes.flashcards_routes import flashcards_bp
+    from app.routes.quiz_routes import quiz_bp
+    from app.routes.batch_routes import batch_bp
+    from app.routes.search_routes import search_bp
+    from app.routes.ask_routes import ask_bp
+    from app.routes.artifacts_routes import artifacts_bp
     from app.routes.auth import login_bp
     from app.routes.sign_up import signup_bp
+    from app.routes.jobs_routes import jobs_bp
+    from app.routes.documents_routes import documents_bp
 
     app.register_blueprint(upload_bp)
     app.register_blueprint(summary_bp)
     app.register_blueprint(flashcards_bp)
+    app.register_blueprint(quiz_bp)
+    app.register_blueprint(batch_bp)
+    app.register_blueprint(search_bp)
+    app.register_blueprint(ask_bp)
+    app.register_blueprint(artifacts_bp)
     app.register_blueprint(login_bp)
     app.register_blueprint(signup_bp)
+    app.register_blueprint(jobs_bp)
+    app.register_blueprint(documents_bp)
 
     return app
@@ -0,0 +1,75 @@
+from langchain_core.prompts import PromptTemplate
+import app.utils.helpers as tools
+from app.ai.chunking import estimate_tokens
+from app.ai.llm import get_chain
+from app.ai.llm_cache import llm_cache
+from app.utils.retrieval import retrieval
+from dotenv import load_dotenv
+import os
+
+load_dotenv()
+
+# Only the best ASK_TOP_K chunks of the user's notes are sent to the model,
+# so a question costs about the same however large the library grows
+ASK_TOP_K = int(os.environ.get("ASK_TOP_K", 6))
+
+ASK_PROMPT = PromptTemplate(
+    input_variables=["question", "context"],
+    template="""
+Task:
+    Answer the student's question using only the excerpts from their notes below.
+
+Rules:
+1. Base the answer only on the excerpts; if they do not contain the answer, say "I couldn't find this in your notes."
+2. Be precise and concise, and explain in the style of a study guide.
+3. Refer to the excerpts by their number in brackets, like [1], where you use them.
+4. Answer in the language of the question.
+
+Excerpts:
+{context}
+
+Question:
+{question}
+
+Instruction:
+ANSWER:
+""",
+)
+
+
+def format_context(chunks: list[dict]) -> str:
+    return "\n\n".join(
+        f"[{i + 1}] ({chunk['filename']})\n{chunk['content']}"
+        for i, chunk in enumerate(chunks)
+    )
+
+
+def answer_question(
+    user_id: int,
+    question: str,
+    document_uid: str | None = None,
+    k: int = ASK_TOP_K,
+) -> dict:
+    """Answers question from the user's notes, sending only the best-matching chunks."""
+    chunks = retrieval.search(user_id, question, k, document_uid)
+    if not chunks:
+        return {"error": "No matching notes found"}
+
+    context = format_context(chunks)
+    tools.debug_print(
+        [f"Answering from {len(chunks)} chunks ({estimate_tokens(context)} tokens)"]
+    )
+    inputs = {"question": question, "context": context}
+    answer = llm_cache.run(get_chain(ASK_PROMPT), inputs).strip()
+    return {
+        "answer": answer,
+        "sources": [
+            {
+                "document_uid": chunk["document_uid"],
+                "filename": chunk["filename"],
+                "position": chunk["position"],
+                "score": chunk["score"],
+            }
+            for chunk in chunks
+        ],
+    }
@@ -0,0 +1,159 @@
+import re
+
+# Rough characters-per-token ratio for the local models; close enough to keep
+# prompts inside the context window without loading a tokenizer.
+CHARS_PER_TOKEN = 4
+
+SECTION_HEADING_RE = re.compile(
+    r"^(chapter|section|part|unit|lesson|module)\s+[\w.]+\b", re.IGNORECASE
+)
+NUMBERED_HEADING_RE = re.compile(r"^\d+(\.\d+)*\.?\s+[A-ZÀ-Ý]")
+SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def is_heading(line: str) -> bool:
+    stripped = line.strip()
+    if not stripped or len(stripped) > 100 or stripped.endswith((".", ",", ";")):
+        return False
+    if stripped.isupper() or stripped.startswith("#"):
+        return True
+    return bool(
+        SECTION_HEADING_RE.match(stripped) or NUMBERED_HEADING_RE.match(stripped)
+    )
+
+
+def split_blocks(text: str) -> list[str]:
+    """Splits text into paragraphs, starting a new block at every heading."""
+    blocks = []
+    current = []
+    for line in text.splitlines():
+        if not line.strip():
+            if current:
+                blocks.append("\n".join(current))
+                current = []
+            continue
+        if is_heading(line) and current:
+            blocks.append("\n".join(current))
+            current = []
+        current.append(line)
+    if current:
+        blocks.append("\n".join(current))
+    return blocks
+
+
+def _split_oversized(block: str, max_tokens: int) -> list[str]:
+    """Breaks a block larger than max_tokens on lines, then sentences, then characters."""
+    if estimate_tokens(block) <= max_tokens:
+        return [block]
+
+    for pattern in ("\n", SENTENCE_RE):
+        parts = (
+            block.split(pattern) if isinstance(pattern, str) else pattern.split(block)
+        )
+        if len(parts) > 1:
+            pieces = []
+            for part in parts:
+                pieces.extend(_split_oversized(part, max_tokens))
+            return _pack(pieces, max_tokens, "\n" if pattern == "\n" else " ")
+
+    size = max_tokens * CHARS_PER_TOKEN
+    return [block[i : i + size] for i in range(0, len(block), size)]
+
+
+def _pack(pieces: list[str], max_tokens: int, sep: str) -> list[str]:
+    packed = []
+    current = ""
+    for piece in pieces:
+        candidate = f"{current}{sep}{piece}" if current else piece
+        if current and estimate_tokens(candidate) > max_tokens:
+            packed.append(current)
+            current = piece
+        else:
+            current = candidate
+    if current:
+        packed.append(current)
+    return packed
+
+
+def chunk_blocks(text: str, chunk_tokens: int, overlap_tokens: int = 0) -> list[str]:
+    """The blocks chunk_text packs: paragraphs and sections, split to fit a chunk."""
+    overlap_tokens = min(overlap_tokens, chunk_tokens // 2)
+    blocks = []
+    for block in split_blocks(text):
+        blocks.extend(_split_oversized(block, chunk_tokens - overlap_tokens))
+    return blocks
+
+
+def pack_blocks(
+    blocks: list[str],
+    chunk_tokens: int,
+    overlap_tokens: int = 0,
+    anchors: dict[int, int] | None = None,
+) -> list[tuple[int, int]]:
+    """Groups blocks into chunks of at most chunk_tokens, as (start, end) ranges.
+
+    Each chunk after the first starts with up to overlap_tokens of trailing
+    blocks from the previous one. anchors maps a block index to the end of
+    a run of blocks that must be one chunk of its own, e.g. because it was
+    one in an earlier version of the text; blocks between anchors are
+    packed as usual.
+    """
+    overlap_tokens = min(overlap_tokens, chunk_tokens // 2)
+    anchors = anchors or {}
+    tokens = [estimate_tokens(block) for block in blocks]
+    ranges = []
+    # The current chunk is blocks[start:i]; blocks before own are its overlap
+    start = own = 0
+    current_tokens = 0
+    i = 0
+    while i < len(blocks):
+        if i in anchors:
+            if i > own:
+                ranges.append((start, i))
+                start = _overlap_start(tokens, start, i, overlap_tokens)
+            end = anchors[i]
+            while start < i and sum(tokens[start:end]) > chunk_tokens:
+                start += 1
+            ranges.append((start, end))
+            start = _overlap_start(tokens, start, end, overlap_tokens)
+            own = i = end
+            current_tokens = sum(tokens[start:i])
+            continue
+        if i > start and current_tokens + tokens[i] > chunk_tokens:
+            ranges.append((start, i))
+            start = _overlap_start(tokens, start, i, overlap_tokens)
+            own = i
+            current_tokens = sum(tokens[start:i])
+        current_tokens += tokens[i]
+        i += 1
+    if own < len(blocks):
+        ranges.append((start, len(blocks)))
+    return ranges
+
+
+def _overlap_start(tokens: list[int], start: int, end: int, overlap_tokens: int) -> int:
+    # First block of the longest tail of blocks[start:end] within overlap_tokens
+    total = 0
+    while end > start and total + tokens[end - 1] <= overlap_tokens:
+        end -= 1
+        total += tokens[end]
+    return end
+
+
+def chunk_text(text: str, chunk_tokens: int, overlap_tokens: int = 0) -> list[str]:
+    """Packs paragraphs and sections into chunks of at most chunk_tokens.
+
+    Chunks break on paragraph and heading boundaries; only blocks that are
+    larger than a chunk on their own are split further. Each chunk after the
+    first repeats up to overlap_tokens of trailing blocks from the previous
+    one so ideas that straddle a boundary keep their context.
+    """
+    blocks = chunk_blocks(text, chunk_tokens, overlap_tokens)
+    return [
+        "\n\n".join(blocks[start:end])
+        for start, end in pack_blocks(blocks, chunk_tokens, overlap_tokens)
+    ]
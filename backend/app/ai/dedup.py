@@ -0,0 +1,95 @@
+import hashlib
+import re
+import struct
+
+# MinHash with LSH banding: NUM_PERM = BANDS * ROWS. Two questions share a
+# bucket in at least one band with high probability once their Jaccard
+# similarity passes roughly (1 / BANDS) ** (1 / ROWS) ~ 0.5.
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 2
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+
+def _make_permutations(count: int) -> list[tuple[int, int]]:
+    # Fixed seeds keep signatures comparable between runs and processes
+    params = []
+    for i in range(count):
+        digest = hashlib.blake2b(f"minhash-{i}".encode(), digest_size=16).digest()
+        a, b = struct.unpack("<QQ", digest)
+        params.append((a % (_MERSENNE_PRIME - 1) + 1, b % _MERSENNE_PRIME))
+    return params
+
+
+_PERMUTATIONS = _make_permutations(NUM_PERM)
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set[str]:
+    """Word n-grams of the normalized text; short texts fall back to single words."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return set(words)
+    return {" ".join(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+def minhash(features: set[str]) -> tuple[int, ...]:
+    hashes = [
+        struct.unpack("<I", hashlib.blake2b(f.encode(), digest_size=4).digest())[0]
+        for f in features
+    ]
+    if not hashes:
+        return (_MAX_HASH,) * NUM_PERM
+    return tuple(
+        min((a * h + b) % _MERSENNE_PRIME for h in hashes) & _MAX_HASH
+        for a, b in _PERMUTATIONS
+    )
+
+
+def similarity(sig_a: tuple[int, ...], sig_b: tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of the two signatures' shingle sets."""
+    return sum(x == y for x, y in zip(sig_a, sig_b)) / NUM_PERM
+
+
+class NearDuplicateIndex:
+    """Incremental MinHash/LSH index of texts seen so far.
+
+    Only texts that collide with the new one in an LSH band are compared, so
+    checking a new text costs about the same however many have been added.
+    """
+
+    def __init__(self, threshold: float = 0.6):
+        self.threshold = threshold
+        self._buckets = {}
+        self._signatures = []
+
+    def add(self, text: str) -> bool:
+        """Adds text unless it is a near-duplicate of an earlier one; returns whether it was added."""
+        signature = minhash(shingles(text))
+        bands = [
+            (band, signature[band * ROWS : (band + 1) * ROWS]) for band in range(BANDS)
+        ]
+
+        candidates = set()
+        for band_key in bands:
+            candidates.update(self._buckets.get(band_key, ()))
+        if any(
+            similarity(signature, self._signatures[i]) >= self.threshold
+            for i in candidates
+        ):
+            return False
+
+        index = len(self._signatures)
+        self._signatures.append(signature)
+        for band_key in bands:
+            self._buckets.setdefault(band_key, []).append(index)
+        return True
+
+
+def dedupe(items: list, key, threshold: float = 0.6) -> list:
+    """Drops items whose key text is a near-duplicate of an earlier item's."""
+    index = NearDuplicateIndex(threshold)
+    return [item for item in items if index.add(key(item))]
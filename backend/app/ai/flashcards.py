@@ -1,8 +1,14 @@
-from langchain_openai import ChatOpenAI
-from langchain_ollama import ChatOllama
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
+from langchain_core.prompts import PromptTemplate
 import app.utils.helpers as tools
+from app.ai.chunking import chunk_text
+from app.ai.dedup import dedupe, NearDuplicateIndex
+from app.ai.json_stream import JsonObjectStream, loads_lenient, parse_objects
+from app.ai.llm import get_chain, get_llm
+from app.ai.llm_cache import llm_cache
+from app.ai.revisions import Revision
+from concurrent.futures import ThreadPoolExecutor
+import queue
+import threading
 from dotenv import load_dotenv
 import os
 import json
@@ -10,19 +16,19 @@ import re
 
 load_dotenv()
 
-# Initialize LLM (Ollama local model or OpenRouter alternative)
-# llm = ChatOpenAI(
-#     model_name="moonshotai/kimi-k2:free",
-#     temperature=0.3,
-#     openai_api_base="https://openrouter.ai/api/v1",
-#     openai_api_key=os.environ.get("OPENROUTER_API_KEY"),
-# )
-
-llm = ChatOllama(model="gemma3:12b", temperature=0.3, base_url="http://localhost:11434")
+# Cards are generated per chunk, so the deck grows with the document:
+# FLASHCARDS_PER_CHUNK cards per chunk, capped at FLASHCARD_MAX_CARDS in total
+FLASHCARD_CHUNK_TOKENS = int(os.environ.get("FLASHCARD_CHUNK_TOKENS", 3000))
+FLASHCARD_CONCURRENCY = int(os.environ.get("FLASHCARD_CONCURRENCY", 4))
+FLASHCARDS_PER_CHUNK = int(os.environ.get("FLASHCARDS_PER_CHUNK", 10))
+FLASHCARD_MAX_CARDS = int(os.environ.get("FLASHCARD_MAX_CARDS", 60))
+# Questions at least this similar (estimated Jaccard) count as duplicates
+FLASHCARD_DUPLICATE_THRESHOLD = 0.6
 
+# The model client (Ollama or the OpenRouter alternative) lives in app.ai.llm
 # Simple short-form flashcard prompt
 FLASHCARD_PROMPT = PromptTemplate(
-    input_variables=["text"],
+    input_variables=["text", "count"],
     template="""
 Task:
 Generate *short, simple flashcards* from the text below, in the **same language as the text**.
@@ -31,7 +37,7 @@ Rules:
 1. Each flashcard must include:
    - "question": short question (max 12 words)
    - "answer": short answer (max 10 words)
-2. Generate **exactly 20 flashcards** per input text.
+2. Generate **exactly {count} flashcards** per input text.
 3. Use the same language as the input text.
 4. Keep it beginner-friendly and easy to review.
 5. Focus on facts, names, dates, and key ideas.
@@ -50,37 +56,211 @@ Text:
 {text}
 
 Instruction:
-RETURN ONLY VALID JSON IN THE SAME LANGUAGE AS THE INPUT TEXT, WITH **NO MORE THAN 10 FLASHCARDS**:
+RETURN ONLY VALID JSON IN THE SAME LANGUAGE AS THE INPUT TEXT, WITH **NO MORE THAN {count} FLASHCARDS**:
 """,
 )
 
 
-chain = LLMChain(llm=llm, prompt=FLASHCARD_PROMPT)
+def clean_card(card) -> dict | None:
+    """Returns the card if it has a question and an answer, with long answers trimmed."""
+    if not isinstance(card, dict) or not card.get("question") or not card.get("answer"):
+        return None
+    # Optional sanity trimming
+    if isinstance(card["answer"], str) and len(card["answer"]) > 60:
+        card["answer"] = card["answer"][:57].rstrip() + "..."
+    return card
 
 
-def generate_flashcards(text: str) -> list:
-    """Generates short, simple flashcards and returns valid JSON (Python list)."""
-    tools.debug_print([f"Generating flashcards..."])
-    tools.debug_print([f"Text length: {len(text)}"])
+def parse_flashcards(result: str) -> list:
+    """Parses one model response into a list of flashcards; raises ValueError if it can't.
 
-    result = chain.run({"text": text}).strip()
+    Output that is not valid JSON (a missing bracket, a cut-off last card)
+    is salvaged card by card instead of being thrown away.
+    """
     # Strip ```json ... ``` wrappers if present
     result = re.sub(
         r"^```(?:json)?|```$", "", result.strip(), flags=re.MULTILINE
     ).strip()
 
     try:
-        flashcards = json.loads(result)
-        # Optional sanity trimming
-        for card in flashcards:
-            if isinstance(card.get("answer"), str) and len(card["answer"]) > 60:
-                card["answer"] = card["answer"][:57].rstrip() + "..."
-        tools.debug_print([f"Generated {len(flashcards)} flashcards"])
-        return flashcards
+        flashcards = loads_lenient(result)
     except json.JSONDecodeError:
-        tools.debug_print(["Failed to parse JSON output from model"])
-        tools.debug_print([f"Raw output: {result}"])
+        flashcards = parse_objects(result)
+        if not flashcards:
+            raise
+    if isinstance(flashcards, dict):
+        flashcards = [flashcards]
+    if not isinstance(flashcards, list):
+        raise ValueError("Model did not return a list of flashcards")
+
+    return [card for card in map(clean_card, flashcards) if card is not None]
+
+
+def card_quotas(chunk_count: int, target: int) -> list[int]:
+    """Splits target cards across chunks as evenly as possible."""
+    base, extra = divmod(target, chunk_count)
+    return [base + (1 if i < extra else 0) for i in range(chunk_count)]
+
+
+def select_cards(per_chunk: list[list], target: int) -> list:
+    """Takes cards round-robin across chunks so every part of the text is covered."""
+    selected = []
+    depth = 0
+    while len(selected) < target and any(depth < len(c) for c in per_chunk):
+        for cards in per_chunk:
+            if depth < len(cards) and len(selected) < target:
+                selected.append(cards[depth])
+        depth += 1
+    return selected
+
+
+def generate_flashcards(
+    text: str,
+    target: int | None = None,
+    chunk_tokens: int = FLASHCARD_CHUNK_TOKENS,
+    concurrency: int = FLASHCARD_CONCURRENCY,
+    revision: Revision | None = None,
+    refresh: bool = False,
+) -> list:
+    """Generates short, simple flashcards and returns valid JSON (Python list).
+
+    Each chunk of the text gets its own share of the target, the chunks are
+    prompted concurrently, and near-duplicate questions are dropped when the
+    chunk decks are merged. With a revision, chunks unchanged since the
+    previous version keep their cards and only the others are prompted.
+    With refresh, cached model outputs are not reused.
+    """
+    tools.debug_print([f"Generating flashcards..."])
+    tools.debug_print([f"Text length: {len(text)}"])
+
+    if revision is not None:
+        chunks = revision.split(text, chunk_tokens) or [text]
+    else:
+        chunks = chunk_text(text, chunk_tokens) or [text]
+    if target is None:
+        target = min(FLASHCARDS_PER_CHUNK * len(chunks), FLASHCARD_MAX_CARDS)
+    target = max(target, len(chunks))
+    quotas = card_quotas(len(chunks), target)
+
+    def generate_chunk(item):
+        index, (chunk, quota) = item
+        if revision is not None and revision.chunks:
+            cards = revision.output(index)
+            if cards is not None:
+                return [dict(card) for card in cards]
+        # Ask for a few extra so the deck still reaches its target after dedup
+        count = quota + max(1, quota // 4)
+        result = llm_cache.run(
+            get_chain(FLASHCARD_PROMPT), {"text": chunk, "count": count}, refresh
+        ).strip()
+        try:
+            cards = parse_flashcards(result)
+            if revision is not None and revision.chunks:
+                revision.record(index, [dict(card) for card in cards])
+            return cards
+        except json.JSONDecodeError:
+            tools.debug_print([f"Failed to parse JSON output for chunk {index + 1}"])
+            tools.debug_print([f"Raw output: {result}"])
+        except Exception as e:
+            tools.debug_print([f"Unexpected error in chunk {index + 1}: {e}"])
+        return None
+
+    workers = max(1, min(concurrency, len(chunks)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(generate_chunk, enumerate(zip(chunks, quotas))))
+
+    if all(cards is None for cards in results):
         return {"error": "Invalid JSON output from model"}
-    except Exception as e:
-        tools.debug_print([f"Unexpected error: {e}"])
-        return {"error": "Unexpected error occurred"}
+
+    # Dedup across the whole deck, then keep each chunk's survivors in order
+    tagged = [
+        (index, card) for index, cards in enumerate(results) for card in (cards or [])
+    ]
+    unique = dedupe(
+        tagged,
+        key=lambda item: str(item[1]["question"]),
+        threshold=FLASHCARD_DUPLICATE_THRESHOLD,
+    )
+    per_chunk = [[] for _ in chunks]
+    for index, card in unique:
+        per_chunk[index].append(card)
+
+    flashcards = select_cards(per_chunk, target)
+    tools.debug_print(
+        [f"Generated {len(flashcards)} flashcards from {len(chunks)} chunks"]
+    )
+    if revision is not None and revision.reused:
+        tools.debug_print([f"Reused cards of {revision.reused} unchanged chunks"])
+    return flashcards
+
+
+def stream_flashcards(
+    text: str,
+    target: int | None = None,
+    chunk_tokens: int = FLASHCARD_CHUNK_TOKENS,
+    concurrency: int = FLASHCARD_CONCURRENCY,
+):
+    """Yields flashcards one at a time as soon as the model finishes writing each.
+
+    Chunks stream concurrently; every card object is parsed the moment its
+    closing brace arrives, checked against the cards already sent for near
+    duplicates, and yielded. Stops once the target is reached.
+    """
+    tools.debug_print([f"Streaming flashcards..."])
+    tools.debug_print([f"Text length: {len(text)}"])
+
+    chunks = chunk_text(text, chunk_tokens) or [text]
+    if target is None:
+        target = min(FLASHCARDS_PER_CHUNK * len(chunks), FLASHCARD_MAX_CARDS)
+    target = max(target, len(chunks))
+    quotas = card_quotas(len(chunks), target)
+
+    cards = queue.Queue()
+    stop = threading.Event()
+    done = object()
+
+    def stream_chunk(item):
+        index, (chunk, quota) = item
+        parser = JsonObjectStream()
+        inputs = {"text": chunk, "count": quota + max(1, quota // 4)}
+        kept = 0
+        try:
+            for token in llm_cache.stream(get_llm(), FLASHCARD_PROMPT, inputs):
+                for card in parser.feed(token):
+                    card = clean_card(card)
+                    if card is not None:
+                        cards.put(card)
+                        kept += 1
+                if stop.is_set() or kept >= inputs["count"]:
+                    return
+            for card in parser.close():
+                card = clean_card(card)
+                if card is not None:
+                    cards.put(card)
+        except Exception as e:
+            tools.debug_print([f"Error streaming chunk {index + 1}: {e}"])
+        finally:
+            cards.put(done)
+
+    seen = NearDuplicateIndex(FLASHCARD_DUPLICATE_THRESHOLD)
+    sent = 0
+    workers = max(1, min(concurrency, len(chunks)))
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        for item in enumerate(zip(chunks, quotas)):
+            pool.submit(stream_chunk, item)
+
+        remaining = len(chunks)
+        while remaining and sent < target:
+            card = cards.get()
+            if card is done:
+                remaining -= 1
+            elif seen.add(str(card["question"])):
+                sent += 1
+                yield card
+    finally:
+        # Client gone or target reached: let the chunk workers wind down
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    tools.debug_print([f"Streamed {sent} flashcards from {len(chunks)} chunks"])
@@ -0,0 +1,105 @@
+import json
+import re
+
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
+_STRING = r'"(?:[^"\\]|\\.)*"'
+_DANGLING_KEY_RE = re.compile(_STRING + r"\s*:$")
+_BARE_KEY_RE = re.compile(r"([{,]\s*)" + _STRING + r"$")
+
+
+def loads_lenient(text: str):
+    """json.loads that also accepts trailing commas before a closing bracket."""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return json.loads(_TRAILING_COMMA_RE.sub(r"\1", text))
+
+
+class JsonObjectStream:
+    """Incrementally pulls JSON objects out of a model's token stream.
+
+    Feed it text as it arrives; every outermost {...} is returned as soon as
+    its closing brace is seen, whatever surrounds it (an array, code fences,
+    chatter). Brackets inside strings are ignored. When the stream ends,
+    close() tries to repair a truncated final object instead of losing it.
+    """
+
+    def __init__(self):
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+
+    def feed(self, text: str) -> list[dict]:
+        objects = []
+        for char in text:
+            if self._depth == 0:
+                if char == "{":
+                    self._depth = 1
+                    self._buffer = [char]
+                continue
+
+            self._buffer.append(char)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+                self._string_start = len(self._buffer) - 1
+            elif char == "{":
+                self._depth += 1
+            elif char == "}":
+                self._depth -= 1
+                if self._depth == 0:
+                    obj = self._decode("".join(self._buffer))
+                    if obj is not None:
+                        objects.append(obj)
+                    self._buffer = []
+        return objects
+
+    def close(self) -> list[dict]:
+        """Returns the repaired trailing object, if the stream stopped inside one."""
+        if self._depth == 0 or not self._buffer:
+            return []
+        buffer = self._buffer
+        if self._in_string:
+            # A string cut off mid-way is dropped rather than kept half-written
+            buffer = buffer[: self._string_start]
+        text = _trim_dangling("".join(buffer))
+        text += "}" * self._depth
+        self._buffer = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        obj = self._decode(text)
+        return [obj] if obj is not None else []
+
+    def _decode(self, text: str) -> dict | None:
+        try:
+            obj = loads_lenient(text)
+        except json.JSONDecodeError:
+            return None
+        return obj if isinstance(obj, dict) else None
+
+
+def _trim_dangling(text: str) -> str:
+    """Removes a trailing key without a value, and a trailing comma."""
+    text = text.rstrip()
+    if text.endswith(":"):
+        text = _DANGLING_KEY_RE.sub("", text).rstrip()
+    else:
+        text = _BARE_KEY_RE.sub(r"\1", text).rstrip()
+    if text.endswith(","):
+        text = text[:-1]
+    return text
+
+
+def parse_objects(text: str) -> list[dict]:
+    """Every JSON object that can be recovered from text, in order."""
+    stream = JsonObjectStream()
+    return stream.feed(text) + stream.close()
@@ -0,0 +1,133 @@
+import os
+import threading
+from dotenv import load_dotenv
+from app.utils.metrics import metrics
+
+load_dotenv()
+
+OLLAMA_MODEL = os.environ.get("OLLAMA_MODEL", "gemma3:12b")
+# Comma-separated list of Ollama servers; calls are spread across all of them
+OLLAMA_BASE_URLS = [
+    url.strip()
+    for url in os.environ.get(
+        "OLLAMA_BASE_URLS", os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
+    ).split(",")
+    if url.strip()
+]
+LLM_TEMPERATURE = float(os.environ.get("LLM_TEMPERATURE", 0.3))
+# Requests sent to one server at a time; more only makes every request slower
+LLM_MAX_INFLIGHT = int(os.environ.get("LLM_MAX_INFLIGHT", 2))
+# How long a call waits for a free slot, and how many calls may wait at once
+LLM_QUEUE_TIMEOUT = float(os.environ.get("LLM_QUEUE_TIMEOUT", 300))
+LLM_MAX_QUEUE = int(os.environ.get("LLM_MAX_QUEUE", 64))
+
+
+def ollama_client(base_url: str, model: str, temperature: float):
+    # The langchain stack is imported on first use, not when the app starts
+    from langchain_ollama import ChatOllama
+
+    return ChatOllama(model=model, temperature=temperature, base_url=base_url)
+
+
+# OpenRouter alternative (a single hosted endpoint, so no pool):
+# def openrouter_factory(model: str, temperature: float):
+#     from langchain_openai import ChatOpenAI
+#
+#     return ChatOpenAI(
+#         model_name="moonshotai/kimi-k2:free",
+#         temperature=temperature,
+#         openai_api_base="https://openrouter.ai/api/v1",
+#         openai_api_key=os.environ.get("OPENROUTER_API_KEY"),
+#     )
+
+
+def build_pool(
+    urls: list[str] | None = None,
+    max_inflight: int = LLM_MAX_INFLIGHT,
+    queue_timeout: float = LLM_QUEUE_TIMEOUT,
+    max_queue: int = LLM_MAX_QUEUE,
+    client_factory=ollama_client,
+):
+    from app.ai.llm_pool import Backend, BackendPool
+
+    backends = [
+        Backend(url, max_inflight, client_factory) for url in urls or OLLAMA_BASE_URLS
+    ]
+    return BackendPool(backends, queue_timeout, max_queue)
+
+
+def pooled_factory(model: str, temperature: float):
+    from app.ai.llm_pool import PooledChatModel
+
+    return PooledChatModel(model=model, temperature=temperature, pool=get_pool())
+
+
+_factory = pooled_factory
+_pool = None
+_clients = {}
+_chains = {}
+_lock = threading.Lock()
+
+
+def get_pool():
+    """The shared backend pool behind the default chat model, built on first use."""
+    global _pool
+    with _lock:
+        if _pool is None:
+            _pool = build_pool()
+            metrics.register_collector("llm_backends", _pool.collect_metrics)
+        return _pool
+
+
+def set_pool(pool):
+    """Replaces the backend pool (e.g. with stub servers) and drops cached clients.
+
+    None goes back to the default pool, built on next use.
+    """
+    global _pool
+    with _lock:
+        _pool = pool
+        if pool is None:
+            metrics.unregister_collector("llm_backends")
+        else:
+            metrics.register_collector("llm_backends", pool.collect_metrics)
+        _clients.clear()
+        _chains.clear()
+
+
+def set_llm_factory(factory):
+    """Replaces how chat models are built (e.g. with an offline fake) and drops cached ones."""
+    global _factory
+    with _lock:
+        _factory = factory
+        _clients.clear()
+        _chains.clear()
+
+
+def get_llm(model: str | None = None, temperature: float | None = None):
+    """Returns the shared chat model client for these settings, building it on first use."""
+    key = (
+        model or OLLAMA_MODEL,
+        LLM_TEMPERATURE if temperature is None else temperature,
+    )
+    with _lock:
+        client = _clients.get(key)
+    if client is None:
+        # Built outside the lock: the default factory takes it to get the pool
+        client = _factory(*key)
+        with _lock:
+            client = _clients.setdefault(key, client)
+    return client
+
+
+def get_chain(prompt, model: str | None = None, temperature: float | None = None):
+    """Returns the shared LLMChain running prompt on get_llm(model, temperature)."""
+    from langchain.chains import LLMChain
+
+    llm = get_llm(model, temperature)
+    key = (prompt.template, id(llm))
+    with _lock:
+        chain = _chains.get(key)
+        if chain is None:
+            chain = _chains[key] = LLMChain(llm=llm, prompt=prompt)
+        return chain
@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from app.ai.chunking import estimate_tokens
+from app.utils.helpers import debug_print
+from app.utils.metrics import LLM_SECONDS, LLM_TOKENS_PER_SECOND, PROMPT_TOKENS, metrics
+
+# Share of the budget a process may write before it looks at the folder again:
+# other server processes write to it too, and only a scan sees their entries
+RESCAN_SHARE = 0.05
+
+
+def _sha256(data: str) -> str:
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def model_signature(llm) -> dict:
+    """Identifies the model settings that change what a prompt generates."""
+    return {
+        "model": getattr(llm, "model", None) or getattr(llm, "model_name", None),
+        "temperature": getattr(llm, "temperature", None),
+    }
+
+
+def _observe_call(mode: str, start: float, output: str):
+    elapsed = time.perf_counter() - start
+    LLM_SECONDS.observe(elapsed, mode=mode)
+    if elapsed > 0:
+        LLM_TOKENS_PER_SECOND.observe(estimate_tokens(output) / elapsed)
+
+
+class LLMCache:
+    """Size-bounded on-disk cache of LLM outputs.
+
+    Keys combine the model name, temperature, the hash of the prompt template
+    and the hash of the inputs, so editing a prompt or switching models misses
+    the cache instead of serving stale output. Entries that can no longer be
+    reached are never touched again and are the first to be evicted.
+
+    The folder is shared by every server process. Each keeps the size of
+    the cache as of its last scan plus what it wrote since; eviction always
+    rescans, so entries written by other processes count toward the budget.
+    """
+
+    def __init__(self, max_bytes: int = 256 * 1024 * 1024):
+        self.folder = None
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._sizes = {}
+        self._total_bytes = 0
+        # Bytes this process wrote since the folder was last scanned
+        self._written_bytes = 0
+        self._lock = threading.Lock()
+        self._evict_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.folder = app.config["LLM_CACHE_FOLDER"]
+        self.max_bytes = app.config.get("LLM_CACHE_MAX_BYTES", self.max_bytes)
+        os.makedirs(self.folder, exist_ok=True)
+        self._scan()
+        metrics.register_collector("llm_cache", self.collect_metrics)
+
+    def key(self, llm, template: str, inputs: dict) -> str:
+        parts = {
+            **model_signature(llm),
+            "prompt": _sha256(template),
+            "input": _sha256(json.dumps(inputs, sort_keys=True, ensure_ascii=False)),
+        }
+        return _sha256(json.dumps(parts, sort_keys=True))
+
+    def run(self, chain, inputs: dict, refresh: bool = False) -> str:
+        """chain.run(inputs), served from the cache when the same call was made before.
+
+        With refresh, the model is always called and its output replaces the
+        cached one.
+        """
+        key = self.key(chain.llm, chain.prompt.template, inputs)
+        output = None if refresh else self.get(key)
+        if output is None:
+            PROMPT_TOKENS.observe(estimate_tokens(chain.prompt.format(**inputs)))
+            start = time.perf_counter()
+            output = chain.run(inputs)
+            _observe_call("run", start, output)
+            self.put(key, output)
+        return output
+
+    def stream(self, llm, prompt, inputs: dict):
+        """Yields llm output chunks for prompt, or the cached output as a single chunk."""
+        key = self.key(llm, prompt.template, inputs)
+        output = self.get(key)
+        if output is not None:
+            yield output
+            return
+
+        text = prompt.format(**inputs)
+        PROMPT_TOKENS.observe(estimate_tokens(text))
+        start = time.perf_counter()
+        parts = []
+        for message in llm.stream(text):
+            if message.content:
+                parts.append(message.content)
+                yield message.content
+        output = "".join(parts)
+        _observe_call("stream", start, output)
+        self.put(key, output)
+
+    def get(self, key: str) -> str | None:
+        path = self._path(key)
+        if path is None or not os.path.isfile(path):
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                output = json.load(f)["output"]
+            # mtime doubles as the last-used time for LRU eviction
+            os.utime(path)
+        except (OSError, ValueError, KeyError):
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        debug_print([f"LLM cache hit {key[:12]}"])
+        return output
+
+    def put(self, key: str, output: str):
+        path = self._path(key)
+        if path is None:
+            return
+        data = json.dumps({"output": output, "created_at": time.time()})
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        size = os.path.getsize(path)
+        with self._lock:
+            self._total_bytes += size - self._sizes.get(key, 0)
+            self._sizes[key] = size
+            self._written_bytes += size
+            due = (
+                self._total_bytes > self.max_bytes
+                or self._written_bytes >= self.max_bytes * RESCAN_SHARE
+            )
+        if due:
+            self._evict()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._sizes),
+                "bytes": self._total_bytes,
+            }
+
+    def collect_metrics(self) -> list[tuple]:
+        stats = self.stats()
+        return [
+            ("llm_cache_hits_total", "counter", "LLM cache hits", stats["hits"]),
+            ("llm_cache_misses_total", "counter", "LLM cache misses", stats["misses"]),
+            (
+                "llm_cache_evictions_total",
+                "counter",
+                "LLM cache entries evicted",
+                stats["evictions"],
+            ),
+            ("llm_cache_entries", "gauge", "LLM cache entries", stats["entries"]),
+            ("llm_cache_bytes", "gauge", "LLM cache size on disk", stats["bytes"]),
+        ]
+
+    def _path(self, key: str) -> str | None:
+        if not self.folder:
+            return None
+        return os.path.join(self.folder, key[:2], f"{key}.json")
+
+    def _scan(self) -> list[tuple]:
+        """Rebuilds the size index from the folder; returns (mtime, key, size) per entry."""
+        entries = []
+        for shard in os.scandir(self.folder):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if not entry.name.endswith(".json"):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    # Evicted by another process during the scan
+                    continue
+                entries.append((stat.st_mtime, entry.name[:-5], stat.st_size))
+        with self._lock:
+            self._sizes = {key: size for _, key, size in entries}
+            self._total_bytes = sum(self._sizes.values())
+            self._written_bytes = 0
+        return entries
+
+    def _evict(self):
+        # One thread per process at a time; the others' writes are in the scan
+        if not self._evict_lock.acquire(blocking=False):
+            return
+        try:
+            entries = self._scan()
+            with self._lock:
+                if self._total_bytes <= self.max_bytes:
+                    return
+            # Drop least recently used entries until the cache is back under
+            # 90% of its budget
+            target = self.max_bytes * 0.9
+            for _, key, _ in sorted(entries):
+                with self._lock:
+                    if self._total_bytes <= target:
+                        break
+                    size = self._sizes.pop(key, 0)
+                    self._total_bytes -= size
+                    self.evictions += 1
+                try:
+                    os.remove(self._path(key))
+                except OSError:
+                    pass
+        finally:
+            self._evict_lock.release()
+
+
+llm_cache = LLMCache()
@@ -0,0 +1,221 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any
+
+import httpx
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.outputs import ChatResult
+from pydantic import ConfigDict
+
+from app.utils.helpers import debug_print, error_print
+from app.utils.metrics import LLM_QUEUE_SECONDS
+
+# A backend that refused a connection is skipped for this long
+BACKEND_COOLDOWN = 30.0
+# Failures that happen before a request reaches the server, so retrying is safe
+CONNECT_ERRORS = (ConnectionError, httpx.ConnectError, httpx.ConnectTimeout)
+
+
+class LLMBusyError(TimeoutError):
+    """No backend had a free slot before the queue timeout, or the queue was full."""
+
+
+class Backend:
+    """One model server, with at most max_inflight requests sent to it at a time."""
+
+    def __init__(self, url: str, max_inflight: int, client_factory):
+        self.url = url
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self.served = 0
+        self.down_until = 0.0
+        self._client_factory = client_factory
+        self._clients = {}
+        self._clients_lock = threading.Lock()
+
+    def client(self, model: str, temperature: float):
+        # One client per backend and settings, so its HTTP connections are reused
+        key = (model, temperature)
+        with self._clients_lock:
+            if key not in self._clients:
+                self._clients[key] = self._client_factory(self.url, model, temperature)
+            return self._clients[key]
+
+    @property
+    def load(self) -> float:
+        return self.inflight / self.max_inflight
+
+
+class BackendPool:
+    """Routes model calls to the least-loaded backend with a free slot.
+
+    Callers that find every backend at its in-flight limit wait in FIFO order
+    for up to queue_timeout seconds; at most max_queue callers wait at once.
+    Either limit being hit raises LLMBusyError instead of piling more load on
+    servers that are already saturated.
+    """
+
+    def __init__(
+        self,
+        backends: list[Backend],
+        queue_timeout: float = 300.0,
+        max_queue: int = 64,
+    ):
+        self.backends = backends
+        self.queue_timeout = queue_timeout
+        self.max_queue = max_queue
+        self._waiting = []
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout: float | None = None, exclude=()) -> Backend:
+        timeout = self.queue_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+        ticket = object()
+        with self._cond:
+            if len(self._waiting) >= self.max_queue:
+                raise LLMBusyError("LLM request queue is full")
+            self._waiting.append(ticket)
+            try:
+                while True:
+                    # First come, first served: only the head of the queue may take a slot
+                    backend = self._waiting[0] is ticket and self._pick(exclude)
+                    if backend:
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise LLMBusyError(
+                            f"No LLM backend free after {timeout:g} seconds"
+                        )
+                    self._cond.wait(min(remaining, 1.0))
+                backend.inflight += 1
+                backend.served += 1
+            finally:
+                self._waiting.remove(ticket)
+                self._cond.notify_all()
+        LLM_QUEUE_SECONDS.observe(time.monotonic() - start)
+        return backend
+
+    def release(self, backend: Backend):
+        with self._cond:
+            backend.inflight -= 1
+            self._cond.notify_all()
+
+    def mark_down(self, backend: Backend):
+        error_print([f"LLM backend {backend.url} unreachable, skipping it for a while"])
+        with self._cond:
+            backend.down_until = time.monotonic() + BACKEND_COOLDOWN
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, exclude=()):
+        backend = self.acquire(exclude=exclude)
+        try:
+            yield backend
+        finally:
+            self.release(backend)
+
+    def stats(self) -> list[dict]:
+        with self._cond:
+            return [
+                {
+                    "url": b.url,
+                    "inflight": b.inflight,
+                    "max_inflight": b.max_inflight,
+                    "served": b.served,
+                    "down": b.down_until > time.monotonic(),
+                }
+                for b in self.backends
+            ]
+
+    def collect_metrics(self) -> list[tuple]:
+        with self._cond:
+            inflight = sum(b.inflight for b in self.backends)
+            waiting = len(self._waiting)
+            down = sum(b.down_until > time.monotonic() for b in self.backends)
+        return [
+            ("llm_inflight", "gauge", "Model calls in flight", inflight),
+            ("llm_queue_waiting", "gauge", "Model calls waiting for a slot", waiting),
+            ("llm_backends_down", "gauge", "Backends skipped after errors", down),
+        ]
+
+    def _pick(self, exclude) -> Backend | None:
+        now = time.monotonic()
+        candidates = [
+            b
+            for b in self.backends
+            if b.inflight < b.max_inflight and b not in exclude and b.down_until <= now
+        ]
+        if not candidates and not any(b.down_until <= now for b in self.backends):
+            # Everything is marked down; trying again beats failing outright
+            candidates = [
+                b
+                for b in self.backends
+                if b.inflight < b.max_inflight and b not in exclude
+            ]
+        if not candidates:
+            return None
+        # Least loaded first; among equals, the one that has served the fewest calls
+        return min(candidates, key=lambda b: (b.load, b.served))
+
+
+class PooledChatModel(BaseChatModel):
+    """Chat model that sends every call through a BackendPool.
+
+    It stands in for a single ChatOllama wherever LangChain expects a chat
+    model: LLMChain, .stream(), the LLM cache key (model and temperature).
+    A call that cannot connect to its backend is retried once on each other
+    backend before the error is raised.
+    """
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    model: str
+    temperature: float
+    pool: Any
+
+    @property
+    def _llm_type(self) -> str:
+        return "pooled-chat"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model": self.model, "temperature": self.temperature}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        tried = []
+        while True:
+            with self.pool.slot(exclude=tried) as backend:
+                client = backend.client(self.model, self.temperature)
+                try:
+                    return client._generate(messages, stop=stop, **kwargs)
+                except CONNECT_ERRORS:
+                    if not self._failover(backend, tried):
+                        raise
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        tried = []
+        while True:
+            started = False
+            with self.pool.slot(exclude=tried) as backend:
+                client = backend.client(self.model, self.temperature)
+                try:
+                    for chunk in client._stream(messages, stop=stop, **kwargs):
+                        started = True
+                        if run_manager:
+                            run_manager.on_llm_new_token(chunk.text)
+                        yield chunk
+                    return
+                except CONNECT_ERRORS:
+                    # Output already sent cannot be taken back, so only retry before it
+                    if started or not self._failover(backend, tried):
+                        raise
+
+    def _failover(self, backend: Backend, tried: list) -> bool:
+        self.pool.mark_down(backend)
+        tried.append(backend)
+        if len(tried) >= len(self.pool.backends):
+            return False
+        debug_print([f"Retrying LLM call on another backend"])
+        return True
@@ -0,0 +1,201 @@
+from langchain_core.prompts import PromptTemplate
+import app.utils.helpers as tools
+from app.ai.json_stream import parse_objects
+from app.ai.llm import get_chain
+from app.ai.llm_cache import llm_cache
+from dotenv import load_dotenv
+import hashlib
+import os
+import re
+
+load_dotenv()
+
+# Quizzes are multiple choice: QUIZ_OPTIONS options per question, one correct.
+# Questions come from the flashcards; wrong options are other cards' answers
+# and terms from the summary, and only questions left short of options are
+# sent to the model, all in one small call
+QUIZ_QUESTIONS = int(os.environ.get("QUIZ_QUESTIONS", 10))
+QUIZ_OPTIONS = 4
+# Candidates sharing this much of their wording with the answer are too close
+DISTRACTOR_MAX_OVERLAP = 0.5
+
+DISTRACTOR_PROMPT = PromptTemplate(
+    input_variables=["items", "count"],
+    template="""
+Task:
+For each numbered question below, write {count} wrong but plausible answers, in the **same language and style as the correct answer**.
+
+Rules:
+1. Every wrong answer must be clearly incorrect for its question, but believable.
+2. Keep each wrong answer about as short as the correct answer.
+3. Output **only valid JSON**, no markdown, no extra text.
+
+Output Format Example:
+[
+  {{"id": 1, "wrong": ["1919", "1938", "1908"]}},
+  {{"id": 2, "wrong": ["Ismet Inonu", "Enver Pasha", "Talat Pasha"]}}
+]
+
+Questions:
+{items}
+
+Instruction:
+RETURN ONLY VALID JSON WITH ONE OBJECT PER QUESTION:
+""",
+)
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_NUMBER_RE = re.compile(r"^[\d\s.,:/%-]+$")
+_BOLD_RE = re.compile(r"\*\*([^*\n]{2,60})\*\*")
+_HEADING_RE = re.compile(r"^#{1,6}\s+(.{2,60})$", re.MULTILINE)
+
+
+def _words(text: str) -> set[str]:
+    return set(_WORD_RE.findall(text.lower()))
+
+
+def _overlap(a: set[str], b: set[str]) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _rank(seed: str, value: str) -> str:
+    # Stable tie-breaker and shuffle key, so the same deck gives the same quiz
+    return hashlib.sha256(f"{seed}\0{value}".encode("utf-8")).hexdigest()
+
+
+def answer_kind(answer: str) -> str:
+    return "number" if _NUMBER_RE.match(answer.strip()) else "text"
+
+
+def summary_terms(summary: str) -> list[str]:
+    """Short key terms from a summary: bold phrases and headings."""
+    terms = _BOLD_RE.findall(summary) + _HEADING_RE.findall(summary)
+    seen = set()
+    unique = []
+    for term in terms:
+        term = term.strip().rstrip(":")
+        if term and len(term.split()) <= 6 and term.lower() not in seen:
+            seen.add(term.lower())
+            unique.append(term)
+    return unique
+
+
+def pick_distractors(card: dict, candidates: list[str], count: int) -> list[str]:
+    """The count candidates that make the most plausible wrong options for card.
+
+    Candidates of the same kind as the answer (numbers for numbers) and of
+    similar length come first, then ones sharing words with the question.
+    Anything that is, or nearly is, the correct answer is skipped.
+    """
+    answer = str(card["answer"])
+    answer_words = _words(answer)
+    question_words = _words(str(card["question"]))
+    kind = answer_kind(answer)
+
+    scored = []
+    seen = {answer.strip().lower()}
+    for candidate in candidates:
+        key = candidate.strip().lower()
+        if not key or key in seen:
+            continue
+        seen.add(key)
+        words = _words(candidate)
+        if _overlap(words, answer_words) >= DISTRACTOR_MAX_OVERLAP:
+            continue
+        length = 1 - abs(len(candidate) - len(answer)) / max(
+            len(candidate), len(answer)
+        )
+        score = (
+            2.0 * (answer_kind(candidate) == kind)
+            + length
+            + 0.5 * _overlap(words, question_words)
+        )
+        scored.append((-score, _rank(card["question"], candidate), candidate))
+    scored.sort()
+    return [candidate for _, _, candidate in scored[:count]]
+
+
+def select_questions(cards: list[dict], count: int) -> list[dict]:
+    """Up to count cards spread evenly over the deck, in deck order."""
+    if len(cards) <= count:
+        return list(cards)
+    step = len(cards) / count
+    return [cards[int(i * step)] for i in range(count)]
+
+
+def request_distractors(
+    items: list[dict], count: int, refresh: bool = False
+) -> dict[int, list[str]]:
+    """Asks the model for wrong answers to the given questions in a single call."""
+    lines = [
+        f"{i + 1}. Question: {item['question']} | Correct answer: {item['answer']}"
+        for i, item in enumerate(items)
+    ]
+    inputs = {"items": "\n".join(lines), "count": count}
+    result = llm_cache.run(get_chain(DISTRACTOR_PROMPT), inputs, refresh)
+
+    wrong = {}
+    for obj in parse_objects(result):
+        try:
+            index = int(obj.get("id")) - 1
+        except (TypeError, ValueError):
+            continue
+        if 0 <= index < len(items) and isinstance(obj.get("wrong"), list):
+            wrong[index] = [str(w) for w in obj["wrong"] if str(w).strip()]
+    return wrong
+
+
+def build_question(card: dict, distractors: list[str]) -> dict:
+    options = distractors[: QUIZ_OPTIONS - 1] + [str(card["answer"])]
+    options.sort(key=lambda option: _rank(card["question"], option))
+    return {
+        "question": str(card["question"]),
+        "options": options,
+        "answer_index": options.index(str(card["answer"])),
+        "answer": str(card["answer"]),
+    }
+
+
+def generate_quiz(
+    flashcards: list[dict],
+    summary: str | None = None,
+    count: int = QUIZ_QUESTIONS,
+    refresh: bool = False,
+) -> list[dict]:
+    """Builds multiple-choice questions from an existing flashcard deck.
+
+    Wrong options are chosen locally from the other cards' answers and the
+    summary's key terms; the model is only asked for options for questions
+    that are still short of them, in one batched call, which with refresh
+    is not read from the LLM cache.
+    """
+    tools.debug_print([f"Generating quiz from {len(flashcards)} flashcards"])
+    cards = [c for c in flashcards if c.get("question") and c.get("answer")]
+    questions = select_questions(cards, count)
+
+    candidates = [str(c["answer"]) for c in cards] + summary_terms(summary or "")
+    needed = QUIZ_OPTIONS - 1
+    distractors = [pick_distractors(card, candidates, needed) for card in questions]
+
+    short = [i for i, options in enumerate(distractors) if len(options) < needed]
+    if short:
+        tools.debug_print([f"Asking the model for options for {len(short)} questions"])
+        try:
+            wrong = request_distractors([questions[i] for i in short], needed, refresh)
+        except Exception as e:
+            tools.error_print([f"Error generating quiz options: {str(e)}"])
+            wrong = {}
+        for position, i in enumerate(short):
+            extra = pick_distractors(questions[i], wrong.get(position, []), needed)
+            distractors[i] = (distractors[i] + extra)[:needed]
+
+    # A question needs at least one wrong option to be worth asking
+    quiz = [
+        build_question(card, options)
+        for card, options in zip(questions, distractors)
+        if options
+    ]
+    tools.debug_print([f"Generated {len(quiz)} quiz questions"])
+    return quiz
@@ -0,0 +1,129 @@
+import hashlib
+import threading
+
+from app.ai.chunking import chunk_blocks, pack_blocks
+
+
+def fingerprint(text: str) -> str:
+    """Identifies a block or chunk of text regardless of how its whitespace was laid out."""
+    return hashlib.sha256(" ".join(text.split()).encode("utf-8")).hexdigest()[:32]
+
+
+class Revision:
+    """Per-chunk outputs of an earlier version of a document, and a record of this one.
+
+    The text is fingerprinted per block (paragraph or section, see
+    chunk_blocks). Runs of blocks that formed a chunk in the previous
+    version are kept as chunks here, so an edit on one page only changes
+    the chunks around it instead of shifting every boundary after it.
+    Chunks whose text is unchanged reuse their previous output; the rest
+    are generated and recorded with record().
+
+    manifest() returns what the next version needs: for each chunk, the
+    fingerprints of its blocks, how many of them repeat the end of the
+    previous chunk, and its output.
+    """
+
+    def __init__(self, previous: dict | None = None):
+        self.previous = previous
+        self.previous_chunks = []
+        self.chunk_tokens = None
+        self.overlap_tokens = None
+        self.chunks = []
+        self.reused = 0
+        self._outputs = {}
+        self._lock = threading.Lock()
+
+    def split(self, text: str, chunk_tokens: int, overlap_tokens: int = 0) -> list[str]:
+        """Chunks text, keeping the previous version's chunk boundaries where they still apply."""
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        previous = self.previous
+        if previous and (
+            previous.get("chunk_tokens") != chunk_tokens
+            or previous.get("overlap_tokens") != overlap_tokens
+        ):
+            # Chunked with other settings; none of its chunks would line up
+            previous = None
+        self.previous_chunks = previous["chunks"] if previous else []
+        self._outputs = {
+            chunk["fp"]: chunk["output"]
+            for chunk in self.previous_chunks
+            if chunk["output"] is not None
+        }
+
+        blocks = chunk_blocks(text, self.chunk_tokens, self.overlap_tokens)
+        fingerprints = [fingerprint(block) for block in blocks]
+        ranges = pack_blocks(
+            blocks,
+            self.chunk_tokens,
+            self.overlap_tokens,
+            self._anchors(fingerprints),
+        )
+
+        chunks = []
+        self.chunks = []
+        previous_end = 0
+        for start, end in ranges:
+            chunk = "\n\n".join(blocks[start:end])
+            chunks.append(chunk)
+            self.chunks.append(
+                {
+                    "fp": fingerprint(chunk),
+                    "blocks": fingerprints[start:end],
+                    "overlap": max(0, previous_end - start),
+                    "output": None,
+                }
+            )
+            previous_end = end
+        return chunks
+
+    def _anchors(self, fingerprints: list[str]) -> dict[int, int]:
+        # Where each previous chunk's own blocks (past its overlap) reappear
+        runs = {}
+        for chunk in self.previous_chunks:
+            own = tuple(chunk["blocks"][chunk["overlap"] :])
+            if own:
+                runs.setdefault(own[0], []).append(own)
+        for candidates in runs.values():
+            candidates.sort(key=len, reverse=True)
+
+        anchors = {}
+        i = 0
+        while i < len(fingerprints):
+            for own in runs.get(fingerprints[i], ()):
+                if tuple(fingerprints[i : i + len(own)]) == own:
+                    anchors[i] = i + len(own)
+                    i += len(own)
+                    break
+            else:
+                i += 1
+        return anchors
+
+    def output(self, index: int):
+        """The previous output for chunk index if its text is unchanged, else None."""
+        output = self._outputs.get(self.chunks[index]["fp"])
+        if output is not None:
+            with self._lock:
+                self.chunks[index]["output"] = output
+                self.reused += 1
+        return output
+
+    def record(self, index: int, output):
+        with self._lock:
+            self.chunks[index]["output"] = output
+
+    def manifest(self) -> dict | None:
+        """This version's chunks and outputs, or None if the text was not split.
+
+        Chunks without an output (a single-chunk text, or a model reply that
+        could not be parsed) are kept: their boundaries still line up the
+        next version.
+        """
+        if not self.chunks:
+            return None
+        return {
+            "chunk_tokens": self.chunk_tokens,
+            "overlap_tokens": self.overlap_tokens,
+            "chunks": self.chunks,
+        }
@@ -1,23 +1,22 @@
-from langchain_openai import ChatOpenAI
-from langchain_ollama import ChatOllama
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
+from langchain_core.prompts import PromptTemplate
 import app.utils.helpers as tools
+from app.ai.chunking import chunk_text, estimate_tokens
+from app.ai.llm import get_chain, get_llm
+from app.ai.llm_cache import llm_cache
+from app.ai.revisions import Revision
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import os
 
 load_dotenv()
 
-# Initialize OpenRouter via ChatOpenAI (reused across calls)
-# llm = ChatOpenAI(
-#     model_name="moonshotai/kimi-k2:free",
-#     temperature=0.3,
-#     openai_api_base="https://openrouter.ai/api/v1",
-#     openai_api_key=os.environ.get("OPENROUTER_API_KEY"),
-# )
-
-llm = ChatOllama(model="gemma3:12b", temperature=0.3, base_url="http://localhost:11434")
+# Map-reduce settings: documents longer than one chunk are summarized per chunk
+# (at most SUMMARY_CONCURRENCY calls in flight) and the notes merged afterwards
+SUMMARY_CHUNK_TOKENS = int(os.environ.get("SUMMARY_CHUNK_TOKENS", 3000))
+SUMMARY_CHUNK_OVERLAP = int(os.environ.get("SUMMARY_CHUNK_OVERLAP", 150))
+SUMMARY_CONCURRENCY = int(os.environ.get("SUMMARY_CONCURRENCY", 4))
 
+# The model client and chains come from app.ai.llm and are built on first use
 # Reusable prompt template
 SUMMARY_PROMPT = PromptTemplate(
     input_variables=["text"],
@@ -50,14 +49,175 @@ DETAILED CHAPTER SUMMARY:
 """,
 )
 
+# Map step: detailed notes for one section of a longer chapter
+CHUNK_PROMPT = PromptTemplate(
+    input_variables=["text", "part", "total"],
+    template="""
+Task:
+    You are reading part {part} of {total} of a chapter. Write detailed study notes for this part only.
+
+Requirements:
+1. Keep every main topic, key idea, definition, term, example and conclusion from this part.
+2. Keep the original headings where they exist.
+3. Use bullet points; be precise and complete rather than short.
+4. Write the notes in the language of the text.
+
+DO NOT INCLUDE ANY OTHER TEXT LIKE: "Here are the notes"; "I hope this is helpful"; etc.
+Do not add information that is not in the text.
+
+Chapter Part:
+{text}
+
+Instruction:
+DETAILED NOTES FOR THIS PART:
+""",
+)
+
+# Reduce step: merge the per-part notes into one study guide
+REDUCE_PROMPT = PromptTemplate(
+    input_variables=["text"],
+    template="""
+Task:
+    The notes below were written for consecutive parts of one chapter. Merge them into a single in-depth, comprehensive study guide for the whole chapter.
+
+Requirements:
+1. Main Topics and Concepts: Identify and explain all the primary subjects covered in the chapter.
+2. Detailed Explanations: Provide clear, step-by-step explanations of key ideas and concepts.
+3. Important Definitions and Terms: List and define all significant terminology.
+4. Examples and Applications: Include practical examples, scenarios, or applications that illustrate each concept.
+5. Key Takeaways and Conclusions: Highlight essential points, insights, and conclusions from the chapter.
+
+Style and Format:
+- Remove repetition between parts and keep the order of the chapter.
+- Use headings, subheadings, and bullet points where appropriate.
+- Focus only on the content of the notes—do not add unrelated information or commentary.
+- Write the study guide in the language of the notes.
+
+DO NOT INCLUDE ANY OTHER TEXT LIKE: "Do you need any other information?"; "I hope this is helpful"; etc."
+
+Chapter Notes:
+{text}
+
+Instruction:
+DETAILED CHAPTER SUMMARY:
+""",
+)
+
+
+def summarize_chunks(
+    chunks: list[str],
+    concurrency: int = SUMMARY_CONCURRENCY,
+    revision: Revision | None = None,
+    refresh: bool = False,
+) -> list[str]:
+    """Runs the map step over chunks concurrently, keeping their order.
+
+    With a revision, chunks unchanged since the previous version keep
+    their notes and only the others are sent to the model. With refresh,
+    cached model outputs are not reused.
+    """
+    total = len(chunks)
+
+    def summarize_chunk(item):
+        index, chunk = item
+        if revision is not None:
+            notes = revision.output(index)
+            if notes is not None:
+                return notes
+        inputs = {"text": chunk, "part": index + 1, "total": total}
+        notes = llm_cache.run(get_chain(CHUNK_PROMPT), inputs, refresh).strip()
+        if revision is not None:
+            revision.record(index, notes)
+        return notes
 
-chain = LLMChain(llm=llm, prompt=SUMMARY_PROMPT)
+    with ThreadPoolExecutor(max_workers=max(1, min(concurrency, total))) as pool:
+        return list(pool.map(summarize_chunk, enumerate(chunks)))
 
 
-def summarize_text(text: str) -> str:
-    """Summarizes the input text using chunking and parallel processing"""
+def condense_notes(
+    notes: list[str],
+    chunk_tokens: int = SUMMARY_CHUNK_TOKENS,
+    concurrency: int = SUMMARY_CONCURRENCY,
+    refresh: bool = False,
+) -> str:
+    """Joins per-chunk notes, summarizing them again while they overflow a chunk."""
+    combined = "\n\n".join(notes)
+    while len(notes) > 1 and estimate_tokens(combined) > chunk_tokens:
+        groups = chunk_text(combined, chunk_tokens)
+        if len(groups) >= len(notes):
+            break
+        notes = summarize_chunks(groups, concurrency, refresh=refresh)
+        combined = "\n\n".join(notes)
+    return combined
+
+
+def merge_notes(
+    notes: list[str],
+    chunk_tokens: int = SUMMARY_CHUNK_TOKENS,
+    concurrency: int = SUMMARY_CONCURRENCY,
+    refresh: bool = False,
+) -> str:
+    """Reduces per-chunk notes to one study guide."""
+    combined = condense_notes(notes, chunk_tokens, concurrency, refresh)
+    return llm_cache.run(get_chain(REDUCE_PROMPT), {"text": combined}, refresh).strip()
+
+
+def summarize_text(
+    text: str,
+    chunk_tokens: int = SUMMARY_CHUNK_TOKENS,
+    overlap_tokens: int = SUMMARY_CHUNK_OVERLAP,
+    concurrency: int = SUMMARY_CONCURRENCY,
+    revision: Revision | None = None,
+    refresh: bool = False,
+) -> str:
+    """Summarizes the input text using chunking and parallel processing
+
+    Pass a Revision holding the previous version's manifest to reuse the
+    notes of unchanged chunks; it records this version's for the next one.
+    With refresh, every model call is made again instead of read from the
+    LLM cache.
+    """
     tools.debug_print([f"Summarizing..."])
     tools.debug_print([f"Text length: {len(text)}"])
-    summary = chain.run({"text": text}).strip()
+
+    if revision is not None:
+        chunks = revision.split(text, chunk_tokens, overlap_tokens)
+    else:
+        chunks = chunk_text(text, chunk_tokens, overlap_tokens)
+    if len(chunks) <= 1:
+        summary = llm_cache.run(
+            get_chain(SUMMARY_PROMPT), {"text": text}, refresh
+        ).strip()
+    else:
+        tools.debug_print([f"Summarizing {len(chunks)} chunks"])
+        notes = summarize_chunks(chunks, concurrency, revision, refresh)
+        if revision is not None and revision.reused:
+            tools.debug_print([f"Reused notes of {revision.reused} unchanged chunks"])
+        summary = merge_notes(notes, chunk_tokens, concurrency, refresh)
+
     tools.debug_print([f"Summary length: {len(summary)}"])
     return summary
+
+
+def stream_summary(
+    text: str,
+    chunk_tokens: int = SUMMARY_CHUNK_TOKENS,
+    overlap_tokens: int = SUMMARY_CHUNK_OVERLAP,
+    concurrency: int = SUMMARY_CONCURRENCY,
+):
+    """Yields the summary as the model generates it.
+
+    Long documents still run the map step first; only the final pass streams.
+    """
+    tools.debug_print([f"Streaming summary..."])
+    tools.debug_print([f"Text length: {len(text)}"])
+
+    chunks = chunk_text(text, chunk_tokens, overlap_tokens)
+    if len(chunks) <= 1:
+        prompt, inputs = SUMMARY_PROMPT, {"text": text}
+    else:
+        notes = summarize_chunks(chunks, concurrency)
+        combined = condense_notes(notes, chunk_tokens, concurrency)
+        prompt, inputs = REDUCE_PROMPT, {"text": combined}
+
+    yield from llm_cache.stream(get_llm(), prompt, inputs)
@@ -1,21 +1,158 @@
 import sqlite3
+import os
+import queue
+import threading
+from contextlib import contextmanager
 from pathlib import Path
 import app.db.schemas as schemas
+from app.utils.metrics import DB_QUERY_SECONDS
 
-DB_PATH = Path("data.db")
-conn = sqlite3.connect(DB_PATH)
-cursor = conn.cursor()
+DB_PATH = Path(os.environ.get("DB_PATH", "data.db"))
+POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 8))
+POOL_TIMEOUT = 30
+# Prepared statements kept per connection; pooled connections live long enough to reuse them
+STATEMENT_CACHE_SIZE = 256
 
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL;",
+    "PRAGMA synchronous = NORMAL;",
+    "PRAGMA foreign_keys = ON;",
+    "PRAGMA busy_timeout = 5000;",
+    "PRAGMA temp_store = MEMORY;",
+    "PRAGMA cache_size = -16000;",
+    "PRAGMA mmap_size = 134217728;",
+)
 
-def do(sql: str, params: tuple | None = None):
-    cursor.execute(sql, params or ())
-    conn.commit()
+
+def connect() -> sqlite3.Connection:
+    # isolation_level=None: statements autocommit unless wrapped in transaction()
+    conn = sqlite3.connect(
+        DB_PATH,
+        isolation_level=None,
+        check_same_thread=False,
+        cached_statements=STATEMENT_CACHE_SIZE,
+        timeout=POOL_TIMEOUT,
+    )
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
 
 
-do("PRAGMA foreign_keys = ON;")
+class ConnectionPool:
+    """Fixed-size pool of SQLite connections shared by the request threads.
 
-do(
+    A connection is only ever used by one thread at a time; WAL mode lets
+    readers on other connections run while a writer holds its transaction.
     """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return connect()
+        return self._idle.get(timeout=POOL_TIMEOUT)
+
+    def release(self, conn: sqlite3.Connection):
+        if conn.in_transaction:
+            conn.rollback()
+        self._idle.put(conn)
+
+
+_pool = ConnectionPool(POOL_SIZE)
+_local = threading.local()
+
+
+def _reset_after_fork():
+    # SQLite connections must not cross a fork; a forked server worker starts
+    # with an empty pool of its own
+    global _pool, _local
+    _pool = ConnectionPool(POOL_SIZE)
+    _local = threading.local()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+@contextmanager
+def connection():
+    """Yields a pooled connection, or the one held by this thread's open transaction."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
+        yield conn
+        return
+    conn = _pool.acquire()
+    try:
+        yield conn
+    finally:
+        _pool.release(conn)
+
+
+@contextmanager
+def transaction():
+    """Groups the writes inside the block into one commit.
+
+    Nested calls join the outer transaction; every db helper called inside the
+    block on this thread uses the same connection.
+    """
+    if getattr(_local, "conn", None) is not None:
+        yield _local.conn
+        return
+
+    with connection() as conn:
+        # Only once BEGIN succeeds: if it times out the connection goes back
+        # to the pool, and this thread must not keep using it
+        conn.execute("BEGIN IMMEDIATE")
+        _local.conn = conn
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+        finally:
+            _local.conn = None
+
+
+def execute(sql: str, params: tuple | None = None) -> sqlite3.Cursor:
+    """Runs one statement; use the returned cursor only for lastrowid and rowcount."""
+    with DB_QUERY_SECONDS.time(op="execute"), connection() as conn:
+        return conn.execute(sql, params or ())
+
+
+def executemany(sql: str, rows) -> sqlite3.Cursor:
+    with DB_QUERY_SECONDS.time(op="executemany"), connection() as conn:
+        return conn.executemany(sql, rows)
+
+
+def fetch_one(sql: str, params: tuple | None = None) -> tuple | None:
+    with DB_QUERY_SECONDS.time(op="fetch_one"), connection() as conn:
+        return conn.execute(sql, params or ()).fetchone()
+
+
+def fetch_all(sql: str, params: tuple | None = None) -> list[tuple]:
+    with DB_QUERY_SECONDS.time(op="fetch_all"), connection() as conn:
+        return conn.execute(sql, params or ()).fetchall()
+
+
+def do(sql: str, params: tuple | None = None):
+    execute(sql, params)
+
+
+def init_db():
+    with transaction():
+        do(
+            """
 CREATE TABLE IF NOT EXISTS users (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     username TEXT NOT NULL UNIQUE,
@@ -24,50 +161,215 @@ CREATE TABLE IF NOT EXISTS users (
     created_at TEXT DEFAULT (datetime('now','localtime'))
 );
 """
-)
+        )
 
-do(
-    """
+        do(
+            """
 CREATE TABLE IF NOT EXISTS documents (
     uid TEXT PRIMARY KEY,
     user_id INTEGER NOT NULL,
     original_name TEXT NOT NULL,
     file_type TEXT NOT NULL DEFAULT 'pdf',
+    content_hash TEXT,
+    size_bytes INTEGER,
     created_at TEXT DEFAULT (datetime('now','localtime')),
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
 """
-)
+        )
 
-do(
-    """
+        do(
+            """
 CREATE TABLE IF NOT EXISTS summaries (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     document_uid TEXT NOT NULL,
+    content TEXT,
     created_at TEXT DEFAULT (datetime('now','localtime')),
     FOREIGN KEY (document_uid) REFERENCES documents(uid) ON DELETE CASCADE
 );
 """
-)
+        )
 
-do(
-    """
+        do(
+            """
 CREATE TABLE IF NOT EXISTS flashcards (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     document_uid TEXT NOT NULL,
+    content TEXT,
     created_at TEXT DEFAULT (datetime('now','localtime')),
     FOREIGN KEY (document_uid) REFERENCES documents(uid) ON DELETE CASCADE
 );
 """
-)
+        )
 
-do(
-    """
+        do(
+            """
 CREATE TABLE IF NOT EXISTS quizzes (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     document_uid TEXT NOT NULL,
+    content TEXT,
     created_at TEXT DEFAULT (datetime('now','localtime')),
     FOREIGN KEY (document_uid) REFERENCES documents(uid) ON DELETE CASCADE
 );
 """
-)
+        )
+
+        # Background job state, shared by every server process so any of them
+        # can answer a status poll
+        do(
+            """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    job_key TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    pid INTEGER,
+    created_at REAL,
+    started_at REAL,
+    finished_at REAL
+);
+"""
+        )
+
+        # Batch imports: the files of each batch and the jobs scheduled for them
+        do(
+            """
+CREATE TABLE IF NOT EXISTS batches (
+    id TEXT PRIMARY KEY,
+    files TEXT NOT NULL,
+    tasks TEXT NOT NULL,
+    pid INTEGER,
+    created_at REAL
+);
+"""
+        )
+
+        # Full-text search: one search_entries row per (document, kind) gives
+        # the rowid of its search_index row, so an entry is replaced in place
+        do(
+            """
+CREATE TABLE IF NOT EXISTS search_entries (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    document_uid TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    UNIQUE (document_uid, kind),
+    FOREIGN KEY (document_uid) REFERENCES documents(uid) ON DELETE CASCADE
+);
+"""
+        )
+        do(
+            """
+CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+    user_id, title, body,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+);
+"""
+        )
+        do(
+            """
+CREATE TRIGGER IF NOT EXISTS search_entries_delete AFTER DELETE ON search_entries
+BEGIN
+    DELETE FROM search_index WHERE rowid = old.id;
+END;
+"""
+        )
+
+        # Chunk text behind the rows of each user's retrieval matrix
+        do(
+            """
+CREATE TABLE IF NOT EXISTS retrieval_chunks (
+    user_id INTEGER NOT NULL,
+    row INTEGER NOT NULL,
+    document_uid TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    PRIMARY KEY (user_id, row),
+    FOREIGN KEY (document_uid) REFERENCES documents(uid) ON DELETE CASCADE
+);
+"""
+        )
+
+        # Per-chunk outputs behind a document's latest summary and flashcards,
+        # reused for the chunks a revised version leaves unchanged
+        do(
+            """
+CREATE TABLE IF NOT EXISTS chunk_manifests (
+    document_uid TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (document_uid, kind),
+    FOREIGN KEY (document_uid) REFERENCES documents(uid) ON DELETE CASCADE
+);
+"""
+        )
+
+        # Databases created before artifact content was stored in the schema
+        for table in ("summaries", "flashcards", "quizzes"):
+            add_column(table, "content", "TEXT")
+        add_column("documents", "content_hash", "TEXT")
+        add_column("documents", "size_bytes", "INTEGER")
+
+        # Covering index for a user's library ordered by upload time; it
+        # replaces idx_documents_user_created, which lacked hash and size
+        do("DROP INDEX IF EXISTS idx_documents_user_created;")
+        do(
+            """
+CREATE INDEX IF NOT EXISTS idx_documents_user_listing
+ON documents (
+    user_id, created_at, uid, original_name, file_type, content_hash, size_bytes
+);
+"""
+        )
+        # Upload dedup looks documents up by content, per user and globally
+        do(
+            """
+CREATE INDEX IF NOT EXISTS idx_documents_user_hash
+ON documents (user_id, content_hash);
+"""
+        )
+        do(
+            """
+CREATE INDEX IF NOT EXISTS idx_documents_hash
+ON documents (content_hash);
+"""
+        )
+        # Revised uploads are matched to earlier versions by name
+        do(
+            """
+CREATE INDEX IF NOT EXISTS idx_documents_user_name
+ON documents (user_id, original_name, created_at);
+"""
+        )
+        do(
+            """
+CREATE INDEX IF NOT EXISTS idx_jobs_key_status
+ON jobs (job_key, status);
+"""
+        )
+        do(
+            """
+CREATE INDEX IF NOT EXISTS idx_retrieval_chunks_document
+ON retrieval_chunks (document_uid, row);
+"""
+        )
+        for table in ("summaries", "flashcards", "quizzes"):
+            do(
+                f"""
+CREATE INDEX IF NOT EXISTS idx_{table}_document
+ON {table} (document_uid, id);
+"""
+            )
+
+
+def add_column(table: str, column: str, declaration: str):
+    """Adds column to an existing table unless it is already there."""
+    columns = [row[1] for row in fetch_all(f"PRAGMA table_info({table})")]
+    if column not in columns:
+        do(f"ALTER TABLE {table} ADD COLUMN {column} {declaration};")
+
+
+init_db()
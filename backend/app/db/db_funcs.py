@@ -1,21 +1,12 @@
+import time
+
 import app.db.schemas as schemas
 import app.db.db as db
-from pathlib import Path
-import sqlite3
 from app.utils.helpers import generate_hash
 
-DB_PATH = Path("data.db")
-conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-cursor = conn.cursor()
-
-
-def do(sql: str, params: tuple | None = None):
-    cursor.execute(sql, params or ())
-    conn.commit()
-
 
 def add_user(user: schemas.User) -> schemas.User:
-    do(
+    cursor = db.execute(
         "INSERT INTO users (username, password) VALUES (?, ?)",
         (
             user.username,
@@ -27,8 +18,9 @@ def add_user(user: schemas.User) -> schemas.User:
 
 
 def list_users() -> list[schemas.User]:
-    cursor.execute("SELECT id, username, password, full_name, created_at FROM users")
-    rows = cursor.fetchall()
+    rows = db.fetch_all(
+        "SELECT id, username, password, full_name, created_at FROM users"
+    )
     users = [
         schemas.User(
             id=row[0],
@@ -43,11 +35,10 @@ def list_users() -> list[schemas.User]:
 
 
 def get_user_by_username(username: str) -> schemas.User | None:
-    cursor.execute(
+    row = db.fetch_one(
         "SELECT id, username, password, full_name, created_at FROM users WHERE username = ?",
         (username,),
     )
-    row = cursor.fetchone()
     if row:
         return schemas.User(
             id=row[0],
@@ -60,35 +51,383 @@ def get_user_by_username(username: str) -> schemas.User | None:
 
 
 def upload_document(document: schemas.Document) -> schemas.Document:
-    do(
-        "INSERT INTO documents (uid, user_id, original_name, file_type) VALUES (?, ?, ?, ?)",
-        (document.uid, document.user_id, document.original_name, document.file_type),
+    db.execute(
+        """
+        INSERT INTO documents (uid, user_id, original_name, file_type, content_hash, size_bytes)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        (
+            document.uid,
+            document.user_id,
+            document.original_name,
+            document.file_type,
+            document.content_hash,
+            document.size_bytes,
+        ),
     )
     return document
 
 
 def add_summary(summary: schemas.Summary) -> schemas.Summary:
-    do(
-        "INSERT INTO summaries (document_uid) VALUES (?)",
-        (summary.document_uid,),
+    cursor = db.execute(
+        "INSERT INTO summaries (document_uid, content) VALUES (?, ?)",
+        (summary.document_uid, summary.content),
     )
     summary_id = cursor.lastrowid
-    return schemas.Summary(id=summary_id, document_uid=summary.document_uid)
+    return schemas.Summary(
+        id=summary_id, document_uid=summary.document_uid, content=summary.content
+    )
 
 
 def add_flashcards(flashcard: schemas.Flashcard) -> schemas.Flashcard:
-    do(
-        "INSERT INTO flashcards (document_uid) VALUES (?)",
-        (flashcard.document_uid,),
+    cursor = db.execute(
+        "INSERT INTO flashcards (document_uid, content) VALUES (?, ?)",
+        (flashcard.document_uid, flashcard.content),
     )
     flashcard_id = cursor.lastrowid
-    return schemas.Flashcard(id=flashcard_id, document_uid=flashcard.document_uid)
+    return schemas.Flashcard(
+        id=flashcard_id, document_uid=flashcard.document_uid, content=flashcard.content
+    )
 
 
 def add_quiz(quiz: schemas.Quiz) -> schemas.Quiz:
-    do(
-        "INSERT INTO quizzes (document_uid) VALUES (?)",
-        (quiz.document_uid,),
+    cursor = db.execute(
+        "INSERT INTO quizzes (document_uid, content) VALUES (?, ?)",
+        (quiz.document_uid, quiz.content),
     )
     quiz_id = cursor.lastrowid
-    return schemas.Quiz(id=quiz_id, document_uid=quiz.document_uid)
+    return schemas.Quiz(
+        id=quiz_id, document_uid=quiz.document_uid, content=quiz.content
+    )
+
+
+DOCUMENT_COLUMNS = (
+    "uid, user_id, original_name, file_type, content_hash, size_bytes, created_at"
+)
+
+
+def document_from_row(row: tuple) -> schemas.Document:
+    return schemas.Document(
+        uid=row[0],
+        user_id=row[1],
+        original_name=row[2],
+        file_type=row[3],
+        content_hash=row[4],
+        size_bytes=row[5],
+        created_at=row[6],
+    )
+
+
+def get_document(uid: str) -> schemas.Document | None:
+    row = db.fetch_one(
+        f"SELECT {DOCUMENT_COLUMNS} FROM documents WHERE uid = ?",
+        (uid,),
+    )
+    return document_from_row(row) if row else None
+
+
+def find_document_by_hash(user_id: int, content_hash: str) -> schemas.Document | None:
+    """Returns the user's existing document with this content, if any."""
+    row = db.fetch_one(
+        f"""
+        SELECT {DOCUMENT_COLUMNS} FROM documents
+        WHERE user_id = ? AND content_hash = ?
+        ORDER BY created_at LIMIT 1
+        """,
+        (user_id, content_hash),
+    )
+    return document_from_row(row) if row else None
+
+
+def list_documents(
+    user_id: int, limit: int, after: tuple[str, str] | None = None
+) -> list[schemas.Document]:
+    """Returns a user's documents, newest first, starting after the (created_at, uid) key."""
+    if after is None:
+        rows = db.fetch_all(
+            f"""
+            SELECT {DOCUMENT_COLUMNS} FROM documents
+            WHERE user_id = ?
+            ORDER BY created_at DESC, uid DESC LIMIT ?
+            """,
+            (user_id, limit),
+        )
+    else:
+        rows = db.fetch_all(
+            f"""
+            SELECT {DOCUMENT_COLUMNS} FROM documents
+            WHERE user_id = ? AND (created_at, uid) < (?, ?)
+            ORDER BY created_at DESC, uid DESC LIMIT ?
+            """,
+            (user_id, after[0], after[1], limit),
+        )
+    return [document_from_row(row) for row in rows]
+
+
+# Largest INTEGER SQLite stores, and so the largest row id a keyset cursor can hold
+MAX_ROW_ID = 2**63 - 1
+
+ARTIFACT_TABLES = {
+    "summaries": schemas.Summary,
+    "flashcards": schemas.Flashcard,
+    "quizzes": schemas.Quiz,
+}
+
+
+def list_artifacts(
+    table: str, document_uid: str, limit: int, after: int | None = None
+) -> list:
+    """Returns a document's artifacts from table, newest first, with ids below after."""
+    model = ARTIFACT_TABLES[table]
+    rows = db.fetch_all(
+        f"""
+        SELECT id, document_uid, content, created_at FROM {table}
+        WHERE document_uid = ? AND id < ?
+        ORDER BY id DESC LIMIT ?
+        """,
+        (document_uid, after if after is not None else MAX_ROW_ID, limit),
+    )
+    return [
+        model(id=row[0], document_uid=row[1], content=row[2], created_at=row[3])
+        for row in rows
+    ]
+
+
+JOB_COLUMNS = (
+    "id, job_key, kind, status, result, error, pid, created_at, started_at, finished_at"
+)
+
+
+def save_job(values: tuple):
+    """Inserts or replaces a job row; values follow JOB_COLUMNS."""
+    db.execute(
+        f"INSERT OR REPLACE INTO jobs ({JOB_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        values,
+    )
+
+
+def get_job(job_id: str) -> tuple | None:
+    return db.fetch_one(f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,))
+
+
+def find_active_jobs(job_key: str) -> list[tuple]:
+    return db.fetch_all(
+        f"""
+SELECT {JOB_COLUMNS} FROM jobs
+WHERE job_key = ? AND status IN ('queued', 'running')
+ORDER BY created_at DESC
+""",
+        (job_key,),
+    )
+
+
+def delete_finished_jobs(before: float) -> int:
+    cursor = db.execute(
+        "DELETE FROM jobs WHERE finished_at IS NOT NULL AND finished_at < ?",
+        (before,),
+    )
+    return cursor.rowcount
+
+
+BATCH_COLUMNS = "id, files, tasks, pid, created_at"
+
+
+def save_batch(values: tuple):
+    """Inserts or replaces a batch row; values follow BATCH_COLUMNS."""
+    db.execute(
+        f"INSERT OR REPLACE INTO batches ({BATCH_COLUMNS}) VALUES (?, ?, ?, ?, ?)",
+        values,
+    )
+
+
+def get_batch(batch_id: str) -> tuple | None:
+    return db.fetch_one(
+        f"SELECT {BATCH_COLUMNS} FROM batches WHERE id = ?", (batch_id,)
+    )
+
+
+def delete_batches(before: float) -> int:
+    cursor = db.execute("DELETE FROM batches WHERE created_at < ?", (before,))
+    return cursor.rowcount
+
+
+def index_search_entry(
+    document_uid: str, user_id: int, kind: str, title: str, body: str
+):
+    """Adds or replaces the search index entry for a document's kind of text."""
+    with db.transaction():
+        row = db.fetch_one(
+            "SELECT id FROM search_entries WHERE document_uid = ? AND kind = ?",
+            (document_uid, kind),
+        )
+        if row:
+            entry_id = row[0]
+            db.execute("DELETE FROM search_index WHERE rowid = ?", (entry_id,))
+        else:
+            entry_id = db.execute(
+                "INSERT INTO search_entries (document_uid, kind) VALUES (?, ?)",
+                (document_uid, kind),
+            ).lastrowid
+        db.execute(
+            "INSERT INTO search_index (rowid, user_id, title, body) VALUES (?, ?, ?, ?)",
+            (entry_id, str(user_id), title, body),
+        )
+
+
+def search_entries(match: str, limit: int) -> list[tuple]:
+    """Best matches for an FTS5 query, as (document_uid, kind, original_name, snippet, rank)."""
+    return db.fetch_all(
+        """
+        SELECT e.document_uid, e.kind, d.original_name,
+               snippet(search_index, 2, '**', '**', '...', 16),
+               bm25(search_index, 0.0, 2.0, 1.0) AS rank
+        FROM search_index
+        JOIN search_entries e ON e.id = search_index.rowid
+        JOIN documents d ON d.uid = e.document_uid
+        WHERE search_index MATCH ?
+        ORDER BY rank LIMIT ?
+        """,
+        (match, limit),
+    )
+
+
+def get_retrieval_rows(document_uid: str) -> list[int]:
+    """Rows of the owner's retrieval matrix that hold this document's chunks."""
+    rows = db.fetch_all(
+        "SELECT row FROM retrieval_chunks WHERE document_uid = ? ORDER BY row",
+        (document_uid,),
+    )
+    return [row[0] for row in rows]
+
+
+def replace_retrieval_chunks(user_id: int, document_uid: str, chunks: list[tuple]):
+    """Replaces a document's chunks; chunks are (row, position, content) tuples."""
+    with db.transaction():
+        db.execute(
+            "DELETE FROM retrieval_chunks WHERE document_uid = ?", (document_uid,)
+        )
+        db.executemany(
+            """
+            INSERT INTO retrieval_chunks (user_id, row, document_uid, position, content)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            [
+                (user_id, row, document_uid, pos, content)
+                for row, pos, content in chunks
+            ],
+        )
+
+
+def get_user_retrieval_rows(user_id: int) -> list[int]:
+    """Rows of the user's retrieval matrix that still hold a chunk."""
+    rows = db.fetch_all(
+        "SELECT row FROM retrieval_chunks WHERE user_id = ? ORDER BY row",
+        (user_id,),
+    )
+    return [row[0] for row in rows]
+
+
+def renumber_retrieval_rows(user_id: int, rows: list[int]):
+    """Moves the chunk at rows[i] to row i; rows must be in ascending order."""
+    with db.transaction():
+        # Ascending, each row moves down into a slot already vacated
+        db.executemany(
+            "UPDATE retrieval_chunks SET row = ? WHERE user_id = ? AND row = ?",
+            [(new, user_id, old) for new, old in enumerate(rows) if new != old],
+        )
+
+
+def get_retrieval_chunks(user_id: int, rows: list[int]) -> list[tuple]:
+    """(row, document_uid, original_name, position, content) for the given rows."""
+    if not rows:
+        return []
+    placeholders = ", ".join("?" for _ in rows)
+    return db.fetch_all(
+        f"""
+        SELECT c.row, c.document_uid, d.original_name, c.position, c.content
+        FROM retrieval_chunks c JOIN documents d ON d.uid = c.document_uid
+        WHERE c.user_id = ? AND c.row IN ({placeholders})
+        """,
+        (user_id, *rows),
+    )
+
+
+def delete_document(uid: str) -> bool:
+    """Deletes a document; its artifacts, search entries and chunks go with it."""
+    cursor = db.execute("DELETE FROM documents WHERE uid = ?", (uid,))
+    return cursor.rowcount > 0
+
+
+def user_storage(user_id: int) -> tuple[int, int]:
+    """(document count, total upload bytes) of a user's documents."""
+    row = db.fetch_one(
+        "SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM documents WHERE user_id = ?",
+        (user_id,),
+    )
+    return row[0], row[1]
+
+
+# Keeps IN lists well under SQLite's limit on bound parameters
+LOOKUP_BATCH_SIZE = 500
+
+
+def _existing(sql: str, values: list[str]) -> set[str]:
+    found = set()
+    for start in range(0, len(values), LOOKUP_BATCH_SIZE):
+        batch = values[start : start + LOOKUP_BATCH_SIZE]
+        placeholders = ", ".join("?" for _ in batch)
+        rows = db.fetch_all(sql.format(placeholders=placeholders), tuple(batch))
+        found.update(row[0] for row in rows)
+    return found
+
+
+def existing_document_uids(uids: list[str]) -> set[str]:
+    """The given uids that still have a documents row."""
+    return _existing("SELECT uid FROM documents WHERE uid IN ({placeholders})", uids)
+
+
+def referenced_hashes(content_hashes: list[str]) -> set[str]:
+    """The given content hashes that at least one document is stored as."""
+    return _existing(
+        "SELECT DISTINCT content_hash FROM documents WHERE content_hash IN ({placeholders})",
+        content_hashes,
+    )
+
+
+def find_previous_version(
+    user_id: int, original_name: str, exclude_uid: str
+) -> schemas.Document | None:
+    """The user's latest other document uploaded under the same file name."""
+    row = db.fetch_one(
+        f"""
+        SELECT {DOCUMENT_COLUMNS} FROM documents
+        WHERE user_id = ? AND original_name = ? AND uid != ?
+        ORDER BY created_at DESC LIMIT 1
+        """,
+        (user_id, original_name, exclude_uid),
+    )
+    return document_from_row(row) if row else None
+
+
+def save_chunk_manifest(document_uid: str, kind: str, content: str):
+    db.execute(
+        """
+        INSERT OR REPLACE INTO chunk_manifests (document_uid, kind, content, created_at)
+        VALUES (?, ?, ?, ?)
+        """,
+        (document_uid, kind, content, time.time()),
+    )
+
+
+def find_chunk_manifest(user_id: int, original_name: str, kind: str) -> str | None:
+    """The newest kind manifest of any version of the user's document with this name."""
+    row = db.fetch_one(
+        """
+        SELECT m.content FROM chunk_manifests m
+        JOIN documents d ON d.uid = m.document_uid
+        WHERE d.user_id = ? AND d.original_name = ? AND m.kind = ?
+        ORDER BY m.created_at DESC LIMIT 1
+        """,
+        (user_id, original_name, kind),
+    )
+    return row[0] if row else None
@@ -15,22 +15,27 @@ class Document(BaseModel):
     user_id: int
     original_name: str
     file_type: str
+    content_hash: Optional[str] = None
+    size_bytes: Optional[int] = None
     created_at: Optional[str] = None
 
 
 class Summary(BaseModel):
     id: Optional[int] = None
     document_uid: str
+    content: Optional[str] = None
     created_at: Optional[str] = None
 
 
 class Flashcard(BaseModel):
     id: Optional[int] = None
     document_uid: str
+    content: Optional[str] = None
     created_at: Optional[str] = None
 
 
 class Quiz(BaseModel):
     id: Optional[int] = None
     document_uid: str
+    content: Optional[str] = None
     created_at: Optional[str] = None
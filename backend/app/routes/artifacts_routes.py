@@ -0,0 +1,42 @@
+from flask import Blueprint, jsonify, current_app
+import os
+from app.utils.helpers import error_print
+from app.utils.artifacts import ARTIFACT_FILES, artifact_path, load_artifact
+from app.utils.http_cache import send_artifact
+from app.utils.storage import touch
+
+artifacts_bp = Blueprint("artifacts_bp", __name__)
+
+ARTIFACT_MIMETYPES = {
+    "summary": "text/plain",
+    "flashcards": "application/json",
+    "quiz": "application/json",
+}
+
+
+@artifacts_bp.route("/artifacts/<kind>/<filename>", methods=["GET"])
+def get_artifact(kind: str, filename: str):
+    """Serves a saved summary, flashcard deck or quiz as stored, without generating it.
+
+    Responses carry a strong ETag and answer If-None-Match with 304; bodies
+    are gzip or brotli compressed when the client accepts it.
+    """
+    if kind not in ARTIFACT_FILES:
+        return jsonify({"error": "Unknown artifact"}), 404
+
+    uid = os.path.splitext(filename)[0]
+    path = artifact_path(kind, uid)
+    # Restores the file from its database row if the storage GC evicted it
+    if (
+        not os.path.isfile(path)
+        and load_artifact(path, ARTIFACT_FILES[kind][2], uid) is None
+    ):
+        error_print([f"No {kind} saved for {filename}"])
+        return jsonify({"error": f"No {kind} found"}), 404
+    touch(path)
+
+    return send_artifact(
+        path,
+        ARTIFACT_MIMETYPES[kind],
+        current_app.config.get("ARTIFACT_CACHE_SECONDS", 0),
+    )
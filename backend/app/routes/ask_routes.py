@@ -0,0 +1,35 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.utils.helpers import error_print
+from app.db.db_funcs import get_document
+
+ask_bp = Blueprint("ask_bp", __name__)
+
+
+@ask_bp.route("/ask", methods=["POST"])
+@jwt_required()
+def ask():
+    """Answers a question from the user's notes, optionally from one document only."""
+    # Imported here so only LLM routes load the model stack
+    from app.ai.ask import answer_question
+
+    data = request.get_json(silent=True) or {}
+    question = str(data.get("question") or "").strip()
+    if not question:
+        return jsonify({"error": "Missing question"}), 400
+
+    user_id = int(get_jwt_identity())
+    document_uid = data.get("document_uid")
+    if document_uid is not None:
+        document = get_document(document_uid)
+        if document is None or document.user_id != user_id:
+            return jsonify({"error": "Document not found"}), 404
+
+    try:
+        result = answer_question(user_id, question, document_uid)
+    except Exception as e:
+        error_print([f"Error answering question: {str(e)}"])
+        return jsonify({"error": "Error answering question"}), 500
+    if "error" in result:
+        return jsonify(result), 404
+    return jsonify(result)
@@ -14,9 +14,6 @@ login_bp = Blueprint("auth_bp", __name__)
 
 @login_bp.route("/login", methods=["POST"])
 def login():
-    raw = request.get_data(as_text=True)
-    debug_print([f"Raw login payload: {raw}"])
-
     data = request.get_json(silent=True)
     if not data:
         error_print(["Invalid or missing JSON in /login"])
@@ -0,0 +1,136 @@
+import os
+import zipfile
+
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+from werkzeug.exceptions import RequestEntityTooLarge
+from app.utils.helpers import allowed_file, debug_print, error_print
+from app.utils.file_ops import is_extractable
+from app.utils.storage import QuotaExceededError, resolve_upload
+from app.utils.artifacts import artifact_path, artifact_saved
+from app.utils.artifacts import build_summary, build_flashcards
+from app.utils.batches import batches
+from app.routes.upload_routes import store_upload
+
+batch_bp = Blueprint("batch_bp", __name__)
+
+
+def archive_members(archive: zipfile.ZipFile, allowed: set) -> list[zipfile.ZipInfo]:
+    """The documents inside a zip archive, skipping folders and OS metadata."""
+    members = []
+    for info in archive.infolist():
+        name = os.path.basename(info.filename)
+        if info.is_dir() or not name or name.startswith("."):
+            continue
+        if info.filename.startswith("__MACOSX/"):
+            continue
+        if allowed_file(name, allowed):
+            members.append(info)
+    return members
+
+
+def batch_documents(files, allowed: set):
+    """(stream, filename, error) for every document uploaded, unpacking zip archives.
+
+    Archive members are opened one at a time as the caller asks for them.
+    """
+    for file in files:
+        filename = file.filename or ""
+        if filename.lower().endswith(".zip"):
+            try:
+                file.stream.seek(0)
+                with zipfile.ZipFile(file.stream) as archive:
+                    for info in archive_members(archive, allowed):
+                        with archive.open(info) as member:
+                            yield member, os.path.basename(info.filename), None
+            except zipfile.BadZipFile:
+                error_print([f"Invalid zip archive {filename}"])
+                yield None, filename, "Invalid zip archive"
+        elif allowed_file(filename, allowed):
+            yield file.stream, filename, None
+        else:
+            yield None, filename, "Invalid file format"
+
+
+def store_files(files, user_id: int | None) -> list[dict]:
+    """Saves every uploaded file, unpacking zip archives, and returns one reply per document.
+
+    Only stored documents count toward BATCH_MAX_FILES. Once it is reached,
+    or as many files have failed, one "Too many files" entry ends the reply
+    and the rest of the batch is not read.
+    """
+    allowed = current_app.config["ALLOWED_EXTENSIONS"]
+    max_files = current_app.config["BATCH_MAX_FILES"]
+    stored = []
+    saved = failed = 0
+
+    for stream, filename, error in batch_documents(files, allowed):
+        if saved >= max_files or failed >= max_files:
+            error_print([f"Batch upload stopped at {filename}: too many files"])
+            stored.append({"filename": filename, "error": "Too many files"})
+            break
+        if error is None:
+            try:
+                stored.append(store_upload(stream, filename, user_id))
+                saved += 1
+                continue
+            except RequestEntityTooLarge:
+                error = "File too large"
+            except QuotaExceededError:
+                error = "Storage quota exceeded"
+        stored.append({"filename": filename, "error": error})
+        failed += 1
+    return stored
+
+
+@batch_bp.route("/upload_batch", methods=["POST"])
+def upload_batch():
+    """Uploads many documents, or zip archives of them, and generates their artifacts.
+
+    Summaries and flashcards are scheduled for every document, at most
+    BATCH_CONCURRENCY at a time; poll GET /batches/<batch_id> for progress.
+    """
+    # Set before the body is parsed: MAX_CONTENT_LENGTH is sized for one file.
+    # Each file part is still held to MAX_UPLOAD_BYTES, and parts over it
+    # are reported per file instead of failing the batch
+    request.max_content_length = current_app.config["BATCH_MAX_CONTENT_LENGTH"]
+    files = [f for f in request.files.getlist("files") if f.filename]
+    if not files:
+        return jsonify({"error": "No selected file"})
+
+    verify_jwt_in_request(optional=True)
+    identity = get_jwt_identity()
+    stored = store_files(files, int(identity) if identity is not None else None)
+    debug_print([f"Batch upload stored {len(stored)} files"])
+
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
+    builders = {"summary": build_summary, "flashcards": build_flashcards}
+
+    batch = batches.create(stored)
+    for entry in stored:
+        if "error" in entry:
+            continue
+        uid = entry["file_id"]
+        file_path, content_hash = resolve_upload(upload_folder, entry["saved_as"])
+        if file_path is None or not is_extractable(file_path):
+            entry["error"] = "Unsupported file format"
+            continue
+        for kind, fn in builders.items():
+            output_path = artifact_path(kind, uid)
+            # Re-uploaded documents keep the artifacts they already have
+            if artifact_saved(kind, uid, output_path):
+                batch.skip(uid, kind)
+            else:
+                batch.add(uid, kind, fn, file_path, output_path, uid, content_hash)
+
+    batches.start(batch)
+    return jsonify(batch.to_dict()), 202
+
+
+@batch_bp.route("/batches/<batch_id>", methods=["GET"])
+def batch_status(batch_id: str):
+    batch = batches.get(batch_id)
+    if batch is None:
+        error_print([f"Batch {batch_id} not found"])
+        return jsonify({"error": "Batch not found"}), 404
+    return jsonify(batch.to_dict())
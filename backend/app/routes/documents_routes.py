@@ -0,0 +1,125 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.utils.helpers import error_print, encode_cursor, decode_cursor
+from app.utils.retrieval import retrieval
+from app.utils.storage_manager import storage_manager
+from app.db.db_funcs import get_document, list_documents, list_artifacts
+from app.db.db_funcs import delete_document, user_storage, MAX_ROW_ID
+
+documents_bp = Blueprint("documents_bp", __name__)
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def page_size() -> int:
+    try:
+        limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        limit = DEFAULT_PAGE_SIZE
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+@documents_bp.route("/documents", methods=["GET"])
+@jwt_required()
+def documents():
+    """Lists the user's documents, newest first, one keyset page at a time."""
+    user_id = int(get_jwt_identity())
+    limit = page_size()
+
+    after = None
+    if request.args.get("cursor"):
+        after = decode_cursor(request.args["cursor"])
+        if (
+            not isinstance(after, list)
+            or len(after) != 2
+            or not all(isinstance(part, str) for part in after)
+        ):
+            error_print(["Invalid documents cursor"])
+            return jsonify({"error": "Invalid cursor"}), 400
+
+    rows = list_documents(user_id, limit + 1, after)
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor([page[-1].created_at, page[-1].uid])
+
+    return jsonify(
+        {
+            "documents": [document.model_dump() for document in page],
+            "next_cursor": next_cursor,
+        }
+    )
+
+
+@documents_bp.route("/documents/<uid>", methods=["DELETE"])
+@jwt_required()
+def remove_document(uid: str):
+    """Deletes a document with its summaries, flashcards, quizzes and index entries.
+
+    The uploaded file itself is left to the storage GC, since other
+    documents may be stored as the same bytes.
+    """
+    document = get_document(uid)
+    if document is None or document.user_id != int(get_jwt_identity()):
+        error_print([f"Document {uid} not found"])
+        return jsonify({"error": "Document not found"}), 404
+
+    retrieval.remove_document(document)
+    delete_document(uid)
+    storage_manager.remove_artifacts(uid)
+    return jsonify({"deleted": uid})
+
+
+@documents_bp.route("/usage", methods=["GET"])
+@jwt_required()
+def usage():
+    """The user's stored documents and upload bytes against their quota."""
+    count, used = user_storage(int(get_jwt_identity()))
+    quota = storage_manager.user_quota_bytes
+    return jsonify(
+        {
+            "documents": count,
+            "used_bytes": used,
+            "quota_bytes": quota or None,
+            "available_bytes": max(0, quota - used) if quota else None,
+        }
+    )
+
+
+@documents_bp.route("/documents/<uid>/<kind>", methods=["GET"])
+@jwt_required()
+def document_artifacts(uid: str, kind: str):
+    """Lists a document's summaries, flashcards or quizzes, newest first."""
+    if kind not in ("summaries", "flashcards", "quizzes"):
+        return jsonify({"error": "Unknown artifact type"}), 404
+
+    document = get_document(uid)
+    if document is None or document.user_id != int(get_jwt_identity()):
+        error_print([f"Document {uid} not found"])
+        return jsonify({"error": "Document not found"}), 404
+
+    limit = page_size()
+    after = None
+    if request.args.get("cursor"):
+        after = decode_cursor(request.args["cursor"])
+        # bool is an int too, but never a row id; nor is anything SQLite
+        # cannot bind, which would raise OverflowError
+        if (
+            not isinstance(after, int)
+            or isinstance(after, bool)
+            or not 0 < after <= MAX_ROW_ID
+        ):
+            error_print(["Invalid artifacts cursor"])
+            return jsonify({"error": "Invalid cursor"}), 400
+
+    rows = list_artifacts(kind, uid, limit + 1, after)
+    page = rows[:limit]
+    next_cursor = encode_cursor(page[-1].id) if len(rows) > limit else None
+
+    return jsonify(
+        {
+            kind: [artifact.model_dump() for artifact in page],
+            "next_cursor": next_cursor,
+        }
+    )
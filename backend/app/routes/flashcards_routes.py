@@ -1,9 +1,21 @@
-from flask import Blueprint, jsonify, current_app
+from flask import (
+    Blueprint,
+    jsonify,
+    current_app,
+    request,
+    Response,
+    stream_with_context,
+)
 import os
 import json
 from app.utils.helpers import debug_print, error_print
-from app.utils.file_ops import extract_text_from_pdf, extract_text_from_docx
-from app.ai.flashcards import generate_flashcards  # <- import your flashcard generator
+from app.utils.file_ops import is_extractable
+from app.utils.storage import resolve_upload
+from app.utils.text_cache import text_cache
+from app.utils.artifacts import build_flashcards, record_artifact, write_atomic
+from app.utils.artifacts import artifact_path
+from app.utils.jobs import jobs
+from app.routes.summary_routes import stored_result
 
 flashcards_bp = Blueprint("flashcards_bp", __name__)
 
@@ -12,49 +24,93 @@ flashcards_bp = Blueprint("flashcards_bp", __name__)
 def generate_flashcards_route(filename: str):
     uid = os.path.splitext(filename)[0]
     upload_folder = current_app.config["UPLOAD_FOLDER"]
-    flashcards_folder = current_app.config.get("FLASHCARDS_FOLDER", "flashcards")
 
     if not filename or "." not in filename:
         error_print(["Invalid filename"])
         return jsonify({"error": "Invalid filename"})
 
-    file_path = os.path.join(upload_folder, filename)
-    if not os.path.isfile(file_path):
+    file_path, content_hash = resolve_upload(upload_folder, filename)
+    if file_path is None:
         error_print([f"File {filename} not found"])
         return jsonify({"error": "File not found"})
 
-    try:
-        ext = filename.rsplit(".", 1)[1].lower()
-        if ext == "txt":
-            with open(file_path, "r", encoding="utf-8") as f:
-                file_content = f.read()
-        elif ext == "pdf":
-            file_content = extract_text_from_pdf(file_path)
-        elif ext == "docx":
-            file_content = extract_text_from_docx(file_path)
-        else:
-            error_print(["Unsupported file format"])
-            return jsonify({"error": "Unsupported file format"})
-
-        flashcards = generate_flashcards(file_content)
-
-        # Ensure JSON serializable
-        if isinstance(flashcards, str):
-            try:
-                flashcards = json.loads(flashcards)
-            except json.JSONDecodeError:
-                error_print(["Invalid flashcard JSON output"])
-                return jsonify({"error": "Invalid flashcard JSON output"})
-
-        # Save flashcards as JSON file
-        os.makedirs(flashcards_folder, exist_ok=True)
-        output_path = os.path.join(flashcards_folder, f"{uid}_flashcards.json")
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(flashcards, f, indent=2, ensure_ascii=False)
-
-        debug_print([f"Flashcards generated for {filename}"])
-        return jsonify({"flashcards": flashcards})
+    if not is_extractable(file_path):
+        error_print(["Unsupported file format"])
+        return jsonify({"error": "Unsupported file format"})
+
+    output_path = artifact_path("flashcards", uid)
+    stored = stored_result("flashcards", uid, output_path)
+    if stored is not None:
+        return stored
 
+    try:
+        job = jobs.submit(
+            (uid, "flashcards"),
+            build_flashcards,
+            file_path,
+            output_path,
+            uid,
+            content_hash,
+            bool(request.args.get("refresh")),
+            kind="flashcards",
+        )
     except Exception as e:
-        error_print([f"Error generating flashcards: {str(e)}"])
+        error_print([f"Error queueing flashcards: {str(e)}"])
         return jsonify({"error": "Error generating flashcards"})
+
+    return jsonify({"job_id": job.id, "status": job.status}), 202
+
+
+@flashcards_bp.route("/stream_flashcards/<filename>", methods=["GET"])
+def stream_flashcards_route(filename: str):
+    """Streams flashcards as NDJSON, one card per line as soon as it is generated.
+
+    The full deck is saved to FLASHCARDS_FOLDER once the stream completes.
+    """
+    # Imported here so only LLM routes load the model stack
+    from app.ai.flashcards import stream_flashcards
+
+    uid = os.path.splitext(filename)[0]
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
+
+    if not filename or "." not in filename:
+        error_print(["Invalid filename"])
+        return jsonify({"error": "Invalid filename"})
+
+    file_path, content_hash = resolve_upload(upload_folder, filename)
+    if file_path is None:
+        error_print([f"File {filename} not found"])
+        return jsonify({"error": "File not found"})
+
+    if not is_extractable(file_path):
+        error_print(["Unsupported file format"])
+        return jsonify({"error": "Unsupported file format"})
+
+    output_path = artifact_path("flashcards", uid)
+
+    def generate():
+        flashcards = []
+        try:
+            file_content = text_cache.get_text(file_path, content_hash)
+            for card in stream_flashcards(file_content):
+                flashcards.append(card)
+                yield json.dumps(card, ensure_ascii=False) + "\n"
+        except Exception as e:
+            error_print([f"Error streaming flashcards: {str(e)}"])
+            yield json.dumps({"error": "Error generating flashcards"}) + "\n"
+            return
+
+        if not flashcards:
+            yield json.dumps({"error": "Invalid JSON output from model"}) + "\n"
+            return
+
+        content = json.dumps(flashcards, indent=2, ensure_ascii=False)
+        write_atomic(output_path, content)
+        record_artifact("flashcards", uid, content)
+        debug_print([f"Flashcards streamed for {filename}"])
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,14 @@
+from flask import Blueprint, jsonify
+from app.utils.helpers import error_print
+from app.utils.jobs import jobs
+
+jobs_bp = Blueprint("jobs_bp", __name__)
+
+
+@jobs_bp.route("/jobs/<job_id>", methods=["GET"])
+def job_status(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        error_print([f"Job {job_id} not found"])
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
@@ -0,0 +1,54 @@
+from flask import Blueprint, jsonify, current_app, request
+import os
+from app.utils.helpers import error_print
+from app.utils.file_ops import is_extractable
+from app.utils.storage import resolve_upload
+from app.utils.artifacts import artifact_path, build_quiz
+from app.utils.jobs import jobs
+from app.routes.summary_routes import stored_result
+
+quiz_bp = Blueprint("quiz_bp", __name__)
+
+
+@quiz_bp.route("/generate_quiz/<filename>", methods=["GET"])
+def generate_quiz_route(filename: str):
+    """Queues a multiple-choice quiz built from the document's flashcards and summary."""
+    uid = os.path.splitext(filename)[0]
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
+
+    if not filename or "." not in filename:
+        error_print(["Invalid filename"])
+        return jsonify({"error": "Invalid filename"})
+
+    file_path, content_hash = resolve_upload(upload_folder, filename)
+    if file_path is None:
+        error_print([f"File {filename} not found"])
+        return jsonify({"error": "File not found"})
+
+    if not is_extractable(file_path):
+        error_print(["Unsupported file format"])
+        return jsonify({"error": "Unsupported file format"})
+
+    output_path = artifact_path("quiz", uid)
+    stored = stored_result("quiz", uid, output_path)
+    if stored is not None:
+        return stored
+
+    try:
+        job = jobs.submit(
+            (uid, "quiz"),
+            build_quiz,
+            file_path,
+            output_path,
+            uid,
+            content_hash,
+            artifact_path("flashcards", uid),
+            artifact_path("summary", uid),
+            bool(request.args.get("refresh")),
+            kind="quiz",
+        )
+    except Exception as e:
+        error_print([f"Error queueing quiz: {str(e)}"])
+        return jsonify({"error": "Error generating quiz"})
+
+    return jsonify({"job_id": job.id, "status": job.status}), 202
@@ -0,0 +1,17 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from app.utils.search import search
+from app.routes.documents_routes import page_size
+
+search_bp = Blueprint("search_bp", __name__)
+
+
+@search_bp.route("/search", methods=["GET"])
+@jwt_required()
+def search_route():
+    """Searches the user's document text, summaries and flashcards, best match first."""
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "Missing search query"}), 400
+    user_id = int(get_jwt_identity())
+    return jsonify({"query": query, "results": search(user_id, query, page_size())})
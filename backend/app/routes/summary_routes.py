@@ -1,8 +1,20 @@
-from flask import Blueprint, jsonify, current_app
+from flask import (
+    Blueprint,
+    jsonify,
+    current_app,
+    request,
+    Response,
+    stream_with_context,
+)
 import os
+import json
 from app.utils.helpers import debug_print, error_print
-from app.utils.file_ops import extract_text_from_pdf, extract_text_from_docx
-from app.ai.summarizer import summarize_text
+from app.utils.file_ops import is_extractable
+from app.utils.storage import resolve_upload
+from app.utils.text_cache import text_cache
+from app.utils.artifacts import build_summary, record_artifact, write_atomic
+from app.utils.artifacts import artifact_path, load_result
+from app.utils.jobs import jobs
 
 summary_bp = Blueprint("summary_bp", __name__)
 
@@ -11,40 +23,112 @@ summary_bp = Blueprint("summary_bp", __name__)
 def generate_summary(filename: str):
     uid = os.path.splitext(filename)[0]
     upload_folder = current_app.config["UPLOAD_FOLDER"]
-    summary_folder = current_app.config["SUMMARY_FOLDER"]
 
     if not filename or "." not in filename:
         error_print(["Invalid filename"])
         return jsonify({"error": "Invalid filename"})
 
-    file_path = os.path.join(upload_folder, filename)
-    if not os.path.isfile(file_path):
+    file_path, content_hash = resolve_upload(upload_folder, filename)
+    if file_path is None:
         error_print([f"File {filename} not found"])
         return jsonify({"error": "File not found"})
 
+    if not is_extractable(file_path):
+        error_print(["Unsupported file format"])
+        return jsonify({"error": "Unsupported file format"})
+
+    output_path = artifact_path("summary", uid)
+    stored = stored_result("summary", uid, output_path)
+    if stored is not None:
+        return stored
+
     try:
-        ext = filename.rsplit(".", 1)[1].lower()
-        if ext == "txt":
-            with open(file_path, "r", encoding="utf-8") as f:
-                file_content = f.read()
-        elif ext == "pdf":
-            file_content = extract_text_from_pdf(file_path)
-        elif ext == "docx":
-            file_content = extract_text_from_docx(file_path)
-        else:
-            error_print(["Unsupported file format"])
-            return jsonify({"error": "Unsupported file format"})
-
-        summary = summarize_text(file_content)
-
-        os.makedirs(summary_folder, exist_ok=True)
-        with open(
-            os.path.join(summary_folder, f"{uid}_summary.txt"), "w", encoding="utf-8"
-        ) as f:
-            f.write(summary)
-
-        debug_print([f"Summary generated for {filename}"])
-        return jsonify({"summary": summary})
+        job = jobs.submit(
+            (uid, "summary"),
+            build_summary,
+            file_path,
+            output_path,
+            uid,
+            content_hash,
+            bool(request.args.get("refresh")),
+            kind="summary",
+        )
     except Exception as e:
-        error_print([f"Error generating summary: {str(e)}"])
+        error_print([f"Error queueing summary: {str(e)}"])
         return jsonify({"error": "Error generating summary"})
+
+    return jsonify({"job_id": job.id, "status": job.status}), 202
+
+
+def stored_result(kind: str, uid: str, output_path: str):
+    """Serves an artifact that is already saved as a finished job, unless ?refresh=1.
+
+    Precomputed results are returned at once; the job id, the same on every
+    read, still works with /jobs/<job_id> for clients that always poll.
+    """
+    if request.args.get("refresh") or jobs.inflight((uid, kind)):
+        return None
+    result = load_result(kind, output_path, uid)
+    if result is None:
+        return None
+    job = jobs.completed((uid, kind), result, kind=kind)
+    return jsonify({"job_id": job.id, "status": job.status, "result": result})
+
+
+def sse_event(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@summary_bp.route("/stream_summary/<filename>", methods=["GET"])
+def stream_summary_route(filename: str):
+    """Streams the summary as Server-Sent Events while the model generates it.
+
+    Emits a "start" event immediately, one "token" event per model chunk and a
+    final "done" event with the full text, which is also saved to SUMMARY_FOLDER.
+    """
+    # Imported here so only LLM routes load the model stack
+    from app.ai.summarizer import stream_summary
+
+    uid = os.path.splitext(filename)[0]
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
+
+    if not filename or "." not in filename:
+        error_print(["Invalid filename"])
+        return jsonify({"error": "Invalid filename"})
+
+    file_path, content_hash = resolve_upload(upload_folder, filename)
+    if file_path is None:
+        error_print([f"File {filename} not found"])
+        return jsonify({"error": "File not found"})
+
+    if not is_extractable(file_path):
+        error_print(["Unsupported file format"])
+        return jsonify({"error": "Unsupported file format"})
+
+    output_path = artifact_path("summary", uid)
+
+    def generate():
+        yield sse_event("start", {"filename": filename})
+        parts = []
+        try:
+            file_content = text_cache.get_text(file_path, content_hash)
+            for token in stream_summary(file_content):
+                parts.append(token)
+                yield sse_event("token", token)
+        except Exception as e:
+            error_print([f"Error streaming summary: {str(e)}"])
+            yield sse_event("error", "Error generating summary")
+            return
+
+        summary = "".join(parts).strip()
+        write_atomic(output_path, summary)
+        record_artifact("summary", uid, summary)
+
+        debug_print([f"Summary streamed for {filename}"])
+        yield sse_event("done", {"summary": summary})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
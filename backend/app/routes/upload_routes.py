@@ -1,6 +1,24 @@
 from flask import Blueprint, request, jsonify, current_app
 import os
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
 from app.utils.helpers import allowed_file, generate_uid, debug_print, error_print
+from app.utils.storage import QuotaExceededError, receive_stream, save_stream
+from app.utils.storage_manager import storage_manager
+from app.utils.file_ops import is_extractable
+from app.utils.jobs import jobs
+from app.utils.artifacts import (
+    artifact_path,
+    artifact_saved,
+    build_flashcards,
+    build_summary,
+    extract_upload,
+    index_upload,
+)
+from app.utils.metrics import UPLOAD_SIZE
+from app.db.db_funcs import find_document_by_hash, upload_document
+from app.db.db_funcs import find_previous_version, referenced_hashes
+from app.db.db import transaction
+import app.db.schemas as schemas
 
 upload_bp = Blueprint("upload_bp", __name__)
 
@@ -18,27 +36,149 @@ def upload():
         return jsonify({"error": "No selected file"})
 
     if file and allowed_file(file.filename, current_app.config["ALLOWED_EXTENSIONS"]):
-        original_filename = file.filename
-        debug_print([f"File is {original_filename}"])
+        debug_print([f"File is {file.filename}"])
 
-        file_uid = generate_uid()
-        file_extension = original_filename.rsplit(".", 1)[1].lower()
-        unique_filename = f"{file_uid}.{file_extension}"
+        # Anonymous uploads are addressed by content; signed-in users get a document
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+        user_id = int(identity) if identity is not None else None
+        try:
+            return jsonify(store_upload(file.stream, file.filename, user_id))
+        except QuotaExceededError as e:
+            error_print([f"Upload refused for user {user_id}: {str(e)}"])
+            return jsonify({"error": "Storage quota exceeded"}), 413
+    else:
+        error_print(["Invalid file format"])
+        return jsonify({"error": "Invalid file format"})
+
+
+def store_upload(stream, original_filename: str, user_id: int | None) -> dict:
+    """Saves one uploaded file and registers it for user_id; returns the upload reply.
 
-        upload_folder = current_app.config["UPLOAD_FOLDER"]
-        os.makedirs(upload_folder, exist_ok=True)
-        file_path = os.path.join(upload_folder, unique_filename)
-        file.save(file_path)
+    Raises QuotaExceededError if a new document would not fit in the user's quota.
+    """
+    file_extension = original_filename.rsplit(".", 1)[1].lower()
+    upload_folder = current_app.config["UPLOAD_FOLDER"]
+    stream = receive_stream(
+        stream, upload_folder, current_app.config.get("MAX_UPLOAD_BYTES")
+    )
 
+    file_uid = None
+    new_document = False
+    previous = None
+    # One write transaction (BEGIN IMMEDIATE) from storing the blob to
+    # registering the document: concurrent uploads, in any server process,
+    # check the quota and look for an existing document one at a time, and
+    # a blob removed after a refused upload cannot be one another upload
+    # has just found in place
+    try:
+        with transaction():
+            content_hash, size, file_path, created = save_stream(
+                stream, upload_folder, file_extension
+            )
+            if user_id is not None:
+                document = find_document_by_hash(user_id, content_hash)
+                if document is None:
+                    try:
+                        storage_manager.check_quota(user_id, size)
+                    except QuotaExceededError:
+                        if created and not referenced_hashes([content_hash]):
+                            os.remove(file_path)
+                        raise
+                    document = upload_document(
+                        schemas.Document(
+                            uid=generate_uid(),
+                            user_id=user_id,
+                            original_name=original_filename,
+                            file_type=file_extension,
+                            content_hash=content_hash,
+                            size_bytes=size,
+                        )
+                    )
+                    new_document = True
+                    previous = find_previous_version(
+                        user_id, original_filename, document.uid
+                    )
+                file_uid = document.uid
+    finally:
+        stream.close()
+
+    UPLOAD_SIZE.observe(size)
+    if created:
         debug_print([f"File saved to {file_path}"])
-        return jsonify(
-            {
-                "success": "File Uploaded",
-                "file_id": file_uid,
-                "filename": original_filename,
-                "saved_as": unique_filename,
-            }
-        )
     else:
-        error_print(["Invalid file format"])
-        return jsonify({"error": "Invalid file format"})
+        debug_print([f"File matches stored blob {content_hash[:12]}"])
+    file_uid = file_uid or content_hash
+
+    if is_extractable(file_path):
+        precompute(file_uid, file_path, content_hash, new_document, previous)
+
+    return {
+        "success": "File Uploaded",
+        "file_id": file_uid,
+        "filename": original_filename,
+        "saved_as": f"{file_uid}.{file_extension}",
+        "content_hash": content_hash,
+        "duplicate": not created,
+        # Earlier upload of the same file name that this one revises, if any
+        "previous_version": previous.uid if previous else None,
+    }
+
+
+def precompute(
+    uid: str,
+    file_path: str,
+    content_hash: str,
+    new_document: bool,
+    previous: schemas.Document | None = None,
+):
+    """Schedules work on a fresh upload before anyone asks for it.
+
+    New documents are always extracted and indexed for /search and /ask.
+    The PRECOMPUTE policy adds "text" (extract every upload) and "summary"
+    or "flashcards" (generate them). A new version of a document also gets
+    whichever of those its previous version has, since only its changed
+    chunks go to the model. These run as background jobs, so they only use
+    capacity that requested work leaves free; a generate request for the
+    same artifact joins the job instead of starting another.
+    """
+    policy = set(current_app.config.get("PRECOMPUTE", set()))
+    if previous is not None:
+        policy.update(
+            kind
+            for kind in ("summary", "flashcards")
+            if artifact_saved(kind, previous.uid, artifact_path(kind, previous.uid))
+        )
+    if new_document:
+        jobs.submit(
+            (uid, "index"),
+            index_upload,
+            uid,
+            file_path,
+            content_hash,
+            kind="index",
+            background=True,
+        )
+    elif "text" in policy:
+        jobs.submit(
+            (content_hash, "text"),
+            extract_upload,
+            file_path,
+            content_hash,
+            kind="text",
+            background=True,
+        )
+
+    for kind, build in (("summary", build_summary), ("flashcards", build_flashcards)):
+        output_path = artifact_path(kind, uid)
+        if kind in policy and not artifact_saved(kind, uid, output_path):
+            jobs.submit(
+                (uid, kind),
+                build,
+                file_path,
+                output_path,
+                uid,
+                content_hash,
+                kind=kind,
+                background=True,
+            )
@@ -0,0 +1,275 @@
+import json
+import os
+import threading
+
+from app.utils.helpers import debug_print, error_print
+from app.utils.jobs import jobs
+from app.utils.log import log_event
+from app.utils.storage import shard_path, touch
+from app.utils.text_cache import text_cache
+import app.utils.search as search
+from app.utils.retrieval import retrieval
+import app.db.db_funcs as db_funcs
+import app.db.schemas as schemas
+
+
+# Where each kind of artifact is saved: the config key of its folder, its file
+# name and the table keeping every version of it
+ARTIFACT_FILES = {
+    "summary": ("SUMMARY_FOLDER", "{uid}_summary.txt", "summaries"),
+    "flashcards": ("FLASHCARDS_FOLDER", "{uid}_flashcards.json", "flashcards"),
+    "quiz": ("QUIZ_FOLDER", "{uid}_quiz.json", "quizzes"),
+}
+
+
+def artifact_path(kind: str, document_uid: str) -> str:
+    """The file a document's artifact of this kind is saved to; needs an app context."""
+    from flask import current_app
+
+    folder, name, _ = ARTIFACT_FILES[kind]
+    return shard_path(
+        current_app.config[folder], document_uid, name.format(uid=document_uid)
+    )
+
+
+def artifact_saved(kind: str, document_uid: str, path: str) -> bool:
+    """Whether the artifact exists, as a file or, if that was evicted, as a row."""
+    if os.path.isfile(path):
+        return True
+    return bool(db_funcs.list_artifacts(ARTIFACT_FILES[kind][2], document_uid, 1))
+
+
+def load_result(kind: str, path: str, document_uid: str) -> dict | None:
+    """A saved artifact in the form its build job returns, or None if there is none."""
+    content = load_artifact(path, ARTIFACT_FILES[kind][2], document_uid)
+    if content is None:
+        return None
+    return {kind: content if kind == "summary" else json.loads(content)}
+
+
+def write_atomic(path: str, data: str | bytes):
+    """Writes data to path through a temporary file so readers never see a partial file."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Unique per writer: several threads or server processes may save the same path
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    if isinstance(data, bytes):
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+    else:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(data)
+    os.replace(tmp_path, path)
+
+
+def record_artifact(kind: str, document_uid: str, content: str):
+    """Stores a generated artifact against its documents row, if the upload has one."""
+    document = db_funcs.get_document(document_uid)
+    if document is None:
+        return
+    try:
+        if kind == "summary":
+            db_funcs.add_summary(
+                schemas.Summary(document_uid=document_uid, content=content)
+            )
+        elif kind == "flashcards":
+            db_funcs.add_flashcards(
+                schemas.Flashcard(document_uid=document_uid, content=content)
+            )
+        elif kind == "quiz":
+            db_funcs.add_quiz(schemas.Quiz(document_uid=document_uid, content=content))
+        if kind in ("summary", "flashcards"):
+            search.index_document(document, kind, content)
+    except Exception as e:
+        error_print([f"Could not record {kind} for {document_uid}: {str(e)}"])
+
+
+def load_revision(kind: str, document_uid: str, refresh: bool = False):
+    """A Revision holding the chunk manifest of the latest version of this document.
+
+    Versions are the user's documents with the same file name, this one
+    included, so both a revised upload and a regenerated artifact reuse
+    the outputs of unchanged chunks. With refresh the Revision starts
+    empty, so every chunk is generated again.
+    """
+    from app.ai.revisions import Revision
+
+    if refresh:
+        return Revision()
+    document = db_funcs.get_document(document_uid)
+    if document is None:
+        return Revision()
+    content = db_funcs.find_chunk_manifest(
+        document.user_id, document.original_name, kind
+    )
+    return Revision(json.loads(content) if content else None)
+
+
+def save_revision(kind: str, document_uid: str, revision):
+    """Stores this version's chunk manifest for the document's next version."""
+    manifest = revision.manifest()
+    if manifest is None or db_funcs.get_document(document_uid) is None:
+        return
+    try:
+        db_funcs.save_chunk_manifest(
+            document_uid, kind, json.dumps(manifest, ensure_ascii=False)
+        )
+    except Exception as e:
+        error_print([f"Could not save the {kind} manifest of {document_uid}: {str(e)}"])
+        return
+    log_event(
+        "chunk outputs reused",
+        document=document_uid,
+        kind=kind,
+        chunks=len(manifest["chunks"]),
+        reused=revision.reused,
+    )
+
+
+def extract_upload(file_path: str, content_hash: str | None) -> dict:
+    """Extracts an upload into the text cache ahead of its first use; run as a job."""
+    return {"chars": len(text_cache.get_text(file_path, content_hash))}
+
+
+def index_upload(document_uid: str, file_path: str, content_hash: str | None) -> dict:
+    """Extracts a newly uploaded document and indexes it for search and questions."""
+    document = db_funcs.get_document(document_uid)
+    if document is None:
+        return {"indexed": False}
+    text = text_cache.get_text(file_path, content_hash)
+    search.index_document(document, "text", text)
+    chunks = retrieval.index_document(document, text)
+    return {"indexed": True, "chunks": chunks}
+
+
+def build_summary(
+    file_path: str,
+    output_path: str,
+    document_uid: str,
+    content_hash: str | None = None,
+    refresh: bool = False,
+) -> dict:
+    """Extracts file_path, summarizes it and saves the summary to output_path.
+
+    With refresh, nothing is reused from earlier runs: neither cached model
+    outputs nor the chunk outputs of a previous version.
+    """
+    from app.ai.summarizer import summarize_text
+
+    revision = load_revision("summary", document_uid, refresh)
+    summary = summarize_text(
+        text_cache.get_text(file_path, content_hash),
+        revision=revision,
+        refresh=refresh,
+    )
+    write_atomic(output_path, summary)
+    record_artifact("summary", document_uid, summary)
+    save_revision("summary", document_uid, revision)
+    debug_print([f"Summary generated for {os.path.basename(file_path)}"])
+    return {"summary": summary}
+
+
+def build_flashcards(
+    file_path: str,
+    output_path: str,
+    document_uid: str,
+    content_hash: str | None = None,
+    refresh: bool = False,
+) -> dict:
+    """Extracts file_path, generates flashcards and saves them to output_path as JSON.
+
+    With refresh, nothing is reused from earlier runs, as in build_summary.
+    """
+    from app.ai.flashcards import generate_flashcards
+
+    revision = load_revision("flashcards", document_uid, refresh)
+    flashcards = generate_flashcards(
+        text_cache.get_text(file_path, content_hash),
+        revision=revision,
+        refresh=refresh,
+    )
+
+    # Ensure JSON serializable
+    if isinstance(flashcards, str):
+        flashcards = json.loads(flashcards)
+    if isinstance(flashcards, dict) and "error" in flashcards:
+        raise ValueError(flashcards["error"])
+
+    content = json.dumps(flashcards, indent=2, ensure_ascii=False)
+    write_atomic(output_path, content)
+    record_artifact("flashcards", document_uid, content)
+    save_revision("flashcards", document_uid, revision)
+    debug_print([f"Flashcards generated for {os.path.basename(file_path)}"])
+    return {"flashcards": flashcards}
+
+
+def load_artifact(path: str, table: str, document_uid: str) -> str | None:
+    """A saved artifact: the file at path, else the newest row in table.
+
+    A file the storage GC evicted is written back from its row, so the
+    next read, and the artifacts route, find it on disk again.
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+        touch(path)
+        return content
+    except FileNotFoundError:
+        pass
+    rows = db_funcs.list_artifacts(table, document_uid, 1)
+    if not rows:
+        return None
+    write_atomic(path, rows[0].content)
+    debug_print([f"Restored {os.path.basename(path)} from the database"])
+    return rows[0].content
+
+
+def build_quiz(
+    file_path: str,
+    output_path: str,
+    document_uid: str,
+    content_hash: str | None,
+    flashcards_path: str,
+    summary_path: str,
+    refresh: bool = False,
+) -> dict:
+    """Builds a quiz from the document's flashcards and summary, saved to output_path.
+
+    Existing flashcards are reused; without them, cards are generated from the
+    stored summary (much shorter than the document), and only when neither
+    exists is the document itself processed. With refresh, the model calls
+    this makes are not read from the LLM cache.
+    """
+    from app.ai.flashcards import generate_flashcards
+    from app.ai.quiz import generate_quiz
+
+    summary = load_artifact(summary_path, "summaries", document_uid)
+    saved = load_artifact(flashcards_path, "flashcards", document_uid)
+    if saved:
+        flashcards = json.loads(saved)
+    elif summary:
+        debug_print([f"No flashcards for {document_uid}, using its summary"])
+        flashcards = generate_flashcards(summary, refresh=refresh)
+        if isinstance(flashcards, dict) and "error" in flashcards:
+            raise ValueError(flashcards["error"])
+    else:
+        # Joins a flashcards job already running for the document
+        flashcards = jobs.call(
+            (document_uid, "flashcards"),
+            build_flashcards,
+            file_path,
+            flashcards_path,
+            document_uid,
+            content_hash,
+            refresh,
+            kind="flashcards",
+        )["flashcards"]
+
+    quiz = generate_quiz(flashcards, summary, refresh=refresh)
+    if not quiz:
+        raise ValueError("No quiz questions could be built")
+
+    content = json.dumps(quiz, indent=2, ensure_ascii=False)
+    write_atomic(output_path, content)
+    record_artifact("quiz", document_uid, content)
+    debug_print([f"Quiz generated for {os.path.basename(file_path)}"])
+    return {"quiz": quiz}
@@ -0,0 +1,182 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+from app.utils.helpers import debug_print, error_print, generate_uid
+from app.utils.jobs import DONE, FAILED, QUEUED, RUNNING, JOB_RETENTION_SECONDS
+from app.utils.jobs import _pid_alive, jobs
+import app.db.db_funcs as db_funcs
+
+
+class Batch:
+    """A group of uploaded files and the generation jobs scheduled for them.
+
+    Each task is one (file, kind) job. Tasks wait in the batch until one of
+    its running jobs finishes, so a batch never has more than concurrency
+    jobs in the shared job queue and a large import cannot crowd out
+    everyone else's requests.
+    """
+
+    def __init__(self, files: list[dict], concurrency: int):
+        self.id = generate_uid()
+        self.files = files
+        self.tasks = []
+        self.concurrency = concurrency
+        self.pid = os.getpid()
+        self.created_at = time.time()
+        self._pending = deque()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "Batch":
+        """A read-only view of a batch started by this or another process."""
+        batch = cls.__new__(cls)
+        batch.id, files, tasks, batch.pid, batch.created_at = row
+        batch.files = json.loads(files)
+        batch.tasks = json.loads(tasks)
+        batch.concurrency = None
+        batch._pending = deque()
+        batch._lock = threading.Lock()
+        return batch
+
+    def to_row(self) -> tuple:
+        with self._lock:
+            tasks = json.dumps(self.tasks)
+        return (self.id, json.dumps(self.files), tasks, self.pid, self.created_at)
+
+    def add(self, file_id: str, kind: str, fn, *args):
+        """Schedules fn(*args) as the kind job for file_id."""
+        task = {"file_id": file_id, "kind": kind, "job_id": None, "status": QUEUED}
+        self.tasks.append(task)
+        self._pending.append((task, fn, args))
+
+    def skip(self, file_id: str, kind: str):
+        """Records a kind artifact for file_id that already exists."""
+        self.tasks.append(
+            {"file_id": file_id, "kind": kind, "job_id": None, "status": DONE}
+        )
+
+    def _task_status(self, task: dict) -> str:
+        if task["job_id"] is None:
+            if task["status"] == QUEUED and not _pid_alive(self.pid):
+                # The process holding the pending task died before scheduling it
+                return FAILED
+            return task["status"]
+        job = jobs.get(task["job_id"])
+        return job.status if job is not None else FAILED
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            tasks = [dict(task) for task in self.tasks]
+        counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+        by_file = {}
+        for task in tasks:
+            status = self._task_status(task)
+            counts[status] += 1
+            by_file.setdefault(task["file_id"], {})[task["kind"]] = {
+                "job_id": task["job_id"],
+                "status": status,
+            }
+
+        files = []
+        for entry in self.files:
+            entry = dict(entry)
+            if "file_id" in entry:
+                entry["jobs"] = by_file.get(entry["file_id"], {})
+            files.append(entry)
+
+        return {
+            "batch_id": self.id,
+            "status": RUNNING if counts[QUEUED] or counts[RUNNING] else DONE,
+            "total": len(tasks),
+            "queued": counts[QUEUED],
+            "running": counts[RUNNING],
+            "done": counts[DONE],
+            "failed": counts[FAILED],
+            "created_at": self.created_at,
+            "files": files,
+        }
+
+
+class BatchQueue:
+    """Starts batches on the shared job queue and keeps them for progress polls.
+
+    With shared=True batches are also written to the batches table, so a
+    poll answered by another server process sees the same progress.
+    """
+
+    def __init__(self, concurrency: int = 2, max_batches: int = 100):
+        self.concurrency = concurrency
+        self.max_batches = max_batches
+        self.shared = False
+        self._batches = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.concurrency = app.config.get("BATCH_CONCURRENCY", self.concurrency)
+        self.shared = app.config.get("JOB_SHARED", True)
+        if self.shared:
+            db_funcs.delete_batches(time.time() - JOB_RETENTION_SECONDS)
+
+    def create(self, files: list[dict]) -> Batch:
+        return Batch(files, self.concurrency)
+
+    def start(self, batch: Batch) -> Batch:
+        with self._lock:
+            self._batches[batch.id] = batch
+            while len(self._batches) > self.max_batches:
+                self._batches.popitem(last=False)
+        self._save(batch)
+        debug_print([f"Batch {batch.id}: {len(batch.tasks)} tasks"])
+        for _ in range(batch.concurrency):
+            self._submit_next(batch)
+        return batch
+
+    def get(self, batch_id: str) -> Batch | None:
+        with self._lock:
+            batch = self._batches.get(batch_id)
+        if batch is None and self.shared:
+            row = db_funcs.get_batch(batch_id)
+            batch = Batch.from_row(row) if row else None
+        return batch
+
+    def _submit_next(self, batch: Batch):
+        while True:
+            with batch._lock:
+                if not batch._pending:
+                    return
+                task, fn, args = batch._pending.popleft()
+            try:
+                job = jobs.submit(
+                    (task["file_id"], task["kind"]), fn, *args, kind=task["kind"]
+                )
+            except Exception as e:
+                error_print([f"Batch {batch.id} could not queue a job: {str(e)}"])
+                with batch._lock:
+                    task["status"] = FAILED
+                self._save(batch)
+                continue
+
+            with batch._lock:
+                task["job_id"] = job.id
+            self._save(batch)
+            if job.pid != os.getpid():
+                # Joined a job another server process is running; it uses none
+                # of this process's workers and cannot call back here
+                continue
+            # Called at once if the job has already finished
+            job.add_done_callback(lambda _job: self._submit_next(batch))
+            return
+
+    def _save(self, batch: Batch):
+        if not self.shared:
+            return
+        try:
+            db_funcs.save_batch(batch.to_row())
+        except Exception as e:
+            error_print([f"Could not record batch {batch.id}: {str(e)}"])
+
+
+batches = BatchQueue()
@@ -1,14 +1,217 @@
-def extract_text_from_pdf(file_path: str) -> str:
+import os
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+from app.utils.metrics import EXTRACTION_SECONDS
+
+PDF_WORKERS = os.cpu_count() or 1
+PDF_PARALLEL_MIN_PAGES = 40
+PDF_PAGE_TIMEOUT = 10.0
+# Page ranges handed to each worker per pool; more ranges balance uneven pages
+PDF_RANGES_PER_WORKER = 4
+# Separates PDF pages in extracted text, as pdftotext does; text_clean relies on it
+PAGE_BREAK = "\f"
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+class PageTimeout(Exception):
+    pass
+
+
+def _raise_page_timeout(signum, frame):
+    raise PageTimeout()
+
+
+def _extract_page(reader, index: int, page_timeout: float) -> str:
+    # SIGALRM only works on the main thread, which is where pool workers run
+    use_alarm = page_timeout and _alarm_available()
+    if use_alarm:
+        previous = signal.signal(signal.SIGALRM, _raise_page_timeout)
+        signal.setitimer(signal.ITIMER_REAL, page_timeout)
+    try:
+        return reader.pages[index].extract_text() or ""
+    except PageTimeout:
+        return ""
+    except Exception:
+        # A malformed page should not take the rest of the document with it
+        return ""
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous)
+
+
+def _extract_page_range(
+    file_path: str, start: int, stop: int, page_timeout: float
+) -> list[str]:
     from PyPDF2 import PdfReader
 
     reader = PdfReader(file_path)
-    return "\n".join(
-        [page.extract_text() for page in reader.pages if page.extract_text()]
+    return [_extract_page(reader, i, page_timeout) for i in range(start, stop)]
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = ProcessPoolExecutor(
+                max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+            )
+            _pool_workers = workers
+        return _pool
+
+
+def _reset_pool(pool: ProcessPoolExecutor | None = None):
+    """Shuts pool (by default the current one) down and kills its workers.
+
+    shutdown() alone leaves a worker stuck in a hung page running forever.
+    """
+    global _pool
+    with _pool_lock:
+        pool = pool or _pool
+        if pool is None:
+            return
+        if _pool is pool:
+            _pool = None
+    processes = list((pool._processes or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+
+def shutdown_pool():
+    """Stops the PDF worker processes, if any were started."""
+    _reset_pool()
+
+
+def _alarm_available() -> bool:
+    # What _extract_page needs to stop a hung page in this thread
+    return (
+        hasattr(signal, "SIGALRM")
+        and threading.current_thread() is threading.main_thread()
     )
 
 
+def _page_ranges(page_count: int, parts: int) -> list[tuple[int, int]]:
+    size = max(1, -(-page_count // parts))
+    return [(i, min(i + size, page_count)) for i in range(0, page_count, size)]
+
+
+def _extract_pages_pooled(
+    file_path: str, page_count: int, workers: int, parts: int, page_timeout: float
+) -> list[str]:
+    pool = _get_pool(workers)
+    ranges = _page_ranges(page_count, parts)
+    futures = [
+        pool.submit(_extract_page_range, file_path, start, stop, page_timeout)
+        for start, stop in ranges
+    ]
+
+    # One deadline for the whole document, a backstop for pages that hang
+    # somewhere SIGALRM cannot interrupt
+    deadline = page_timeout * -(-page_count // workers) * 2 if page_timeout else None
+    done, pending = wait(futures, timeout=deadline)
+    if pending:
+        # The workers running those ranges are stuck; cancel() cannot stop them
+        _reset_pool(pool)
+
+    pages = []
+    for (start, stop), future in zip(ranges, futures):
+        if future in done:
+            pages.extend(future.result())
+        else:
+            pages.extend([""] * (stop - start))
+    return pages
+
+
+def extract_text_from_pdf(
+    file_path: str,
+    workers: int | None = None,
+    parallel_min_pages: int | None = None,
+    page_timeout: float | None = None,
+) -> str:
+    """Extracts PDF text, spreading pages over a process pool for large files.
+
+    Off the main thread (job queue workers) a page cannot be timed out in
+    process, so even small files are extracted in the pool there.
+    """
+    from PyPDF2 import PdfReader
+
+    workers = PDF_WORKERS if workers is None else workers
+    if parallel_min_pages is None:
+        parallel_min_pages = PDF_PARALLEL_MIN_PAGES
+    page_timeout = PDF_PAGE_TIMEOUT if page_timeout is None else page_timeout
+
+    reader = PdfReader(file_path)
+    page_count = len(reader.pages)
+
+    if workers > 1 and page_count >= parallel_min_pages:
+        parts = workers * PDF_RANGES_PER_WORKER
+    elif not page_timeout or _alarm_available():
+        pages = [_extract_page(reader, i, page_timeout) for i in range(page_count)]
+        return PAGE_BREAK.join(text for text in pages if text)
+    else:
+        parts = 1
+
+    workers = max(1, workers)
+    try:
+        pages = _extract_pages_pooled(
+            file_path, page_count, workers, parts, page_timeout
+        )
+    except BrokenProcessPool:
+        # A worker died (or another document's deadline recycled the pool):
+        # one more try on a fresh pool, still under a deadline
+        _reset_pool()
+        pages = _extract_pages_pooled(
+            file_path, page_count, workers, parts, page_timeout
+        )
+
+    return PAGE_BREAK.join(text for text in pages if text)
+
+
 def extract_text_from_docx(file_path: str) -> str:
     import docx
 
     doc = docx.Document(file_path)
     return "\n".join([para.text for para in doc.paragraphs])
+
+
+def extract_text_from_txt(file_path: str) -> str:
+    with open(file_path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+EXTRACTORS = {
+    "pdf": extract_text_from_pdf,
+    "docx": extract_text_from_docx,
+    "txt": extract_text_from_txt,
+}
+
+
+def file_extension(file_path: str) -> str:
+    return os.path.splitext(file_path)[1].lstrip(".").lower()
+
+
+def is_extractable(file_path: str) -> bool:
+    return file_extension(file_path) in EXTRACTORS
+
+
+def extract_text(file_path: str, **pdf_options) -> str:
+    """Extracts plain text from a supported upload, dispatching on its extension.
+
+    pdf_options are forwarded to extract_text_from_pdf for PDF uploads.
+    """
+    ext = file_extension(file_path)
+    if ext not in EXTRACTORS:
+        raise ValueError(f"Unsupported file format: {ext}")
+    with EXTRACTION_SECONDS.time(format=ext):
+        if ext == "pdf":
+            return extract_text_from_pdf(file_path, **pdf_options)
+        return EXTRACTORS[ext](file_path)
@@ -1,13 +1,13 @@
-from colorama import Fore, Style
+from app.utils.log import logger
 import uuid
 
 
 def debug_print(message: list):
-    print(f"{Fore.GREEN}[DEBUG]{Style.RESET_ALL} {' '.join(map(str, message))}")
+    logger.debug(" ".join(map(str, message)))
 
 
 def error_print(message: list):
-    print(f"{Fore.RED}[ERROR]{Style.RESET_ALL} {' '.join(map(str, message))}")
+    logger.error(" ".join(map(str, message)))
 
 
 def generate_uid() -> str:
@@ -22,3 +22,20 @@ def generate_hash(data: str) -> str:
     import hashlib
 
     return hashlib.sha256(data.encode()).hexdigest()
+
+
+def encode_cursor(value) -> str:
+    import base64
+    import json
+
+    return base64.urlsafe_b64encode(json.dumps(value).encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    import base64
+    import json
+
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except ValueError:
+        return None
@@ -0,0 +1,146 @@
+import gzip
+import hashlib
+import json
+import os
+
+from flask import Response, request, send_file
+
+from app.utils.artifacts import write_atomic
+
+try:
+    import brotli
+except ImportError:
+    # Optional: without it only gzip variants are stored and offered
+    brotli = None
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+# File suffix of the stored variant for each Content-Encoding
+SUFFIXES = {"gzip": "gz", "br": "br"}
+# Bodies this small are sent as they are; compressing them saves nothing
+MIN_COMPRESS_BYTES = 512
+
+
+def _compressors() -> dict:
+    # In order of preference when a client accepts several equally
+    compressors = {}
+    if brotli is not None:
+        compressors["br"] = lambda data: brotli.compress(data, quality=BROTLI_QUALITY)
+    compressors["gzip"] = lambda data: gzip.compress(data, GZIP_LEVEL, mtime=0)
+    return compressors
+
+
+def variant_path(path: str, sha256: str, encoding: str) -> str:
+    """Where the encoding of one version of the artifact at path is stored."""
+    return f"{path}.{sha256}.{SUFFIXES[encoding]}"
+
+
+def artifact_variants(path: str) -> dict:
+    """Content hash and stored encodings of the artifact at path.
+
+    Compressing at the highest levels is slow, so it is done once per
+    version of the file: the result is kept in "<path>.<sha256>.gz" /
+    "<path>.<sha256>.br" files and a "<path>.meta" file recording which
+    version is current. Variants are named by the content they encode, so
+    a writer racing with a regeneration can never pair one version's
+    metadata with another version's bytes.
+    Returns {"sha256": ..., "size": ..., "encodings": [encoding, ...]}.
+    """
+    meta_path = f"{path}.meta"
+    with open(path, "rb") as f:
+        # The stat of the open file: path may be replaced while it is read
+        stat = os.fstat(f.fileno())
+        previous = None
+        try:
+            with open(meta_path, "r", encoding="utf-8") as meta_file:
+                previous = json.load(meta_file)
+            # Variants missing (or named as before they carried the hash) are rebuilt
+            if (
+                previous["mtime_ns"] == stat.st_mtime_ns
+                and previous["size"] == stat.st_size
+                and all(
+                    os.path.isfile(variant_path(path, previous["sha256"], encoding))
+                    for encoding in previous["encodings"]
+                )
+            ):
+                return previous
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            pass
+        data = f.read()
+
+    meta = {
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": hashlib.sha256(data).hexdigest(),
+        "encodings": [],
+    }
+    if len(data) >= MIN_COMPRESS_BYTES:
+        for encoding, compress in _compressors().items():
+            compressed = compress(data)
+            if len(compressed) < len(data):
+                write_atomic(variant_path(path, meta["sha256"], encoding), compressed)
+                meta["encodings"].append(encoding)
+    write_atomic(meta_path, json.dumps(meta))
+
+    if isinstance(previous, dict) and previous.get("sha256") != meta["sha256"]:
+        # The previous version's variants are no longer listed anywhere
+        for encoding in previous.get("encodings", ()):
+            try:
+                os.remove(variant_path(path, previous["sha256"], encoding))
+            except (FileNotFoundError, KeyError):
+                pass
+    return meta
+
+
+def _etag_matches(header: str | None, sha256: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    for tag in header.split(","):
+        tag = tag.strip().removeprefix("W/").strip('"')
+        # Any encoding of the same content counts as a match
+        if tag.split("-", 1)[0] == sha256:
+            return True
+    return False
+
+
+def send_artifact(path: str, mimetype: str, max_age: int = 0):
+    """Sends a stored artifact with a strong ETag, 304s and a negotiated encoding.
+
+    The ETag is the artifact's SHA-256, suffixed with the encoding for
+    compressed bodies, since each encoding is a different byte sequence.
+    """
+    for attempt in range(2):
+        meta = artifact_variants(path)
+        encoding = request.accept_encodings.best_match(meta["encodings"])
+        if _etag_matches(request.headers.get("If-None-Match"), meta["sha256"]):
+            response = Response(status=304)
+            break
+        try:
+            response = send_file(
+                variant_path(path, meta["sha256"], encoding) if encoding else path,
+                mimetype=mimetype,
+                etag=False,
+                conditional=False,
+                max_age=None,
+            )
+            break
+        except FileNotFoundError:
+            # A regeneration removed this version's variant after meta was
+            # read; the next look at meta finds the new version
+            if encoding is None or attempt:
+                raise
+
+    if response.status_code != 304:
+        # The stored variant's file name is not the artifact's
+        response.headers.pop("Content-Disposition", None)
+        if encoding:
+            response.headers["Content-Encoding"] = encoding
+    etag = meta["sha256"] if encoding is None else f"{meta['sha256']}-{encoding}"
+    response.headers["ETag"] = f'"{etag}"'
+    response.headers["Vary"] = "Accept-Encoding"
+    # Private: artifacts belong to one user. Revalidated after max_age, which is
+    # cheap with the ETag, since ?refresh=1 can replace an artifact in place
+    response.headers["Cache-Control"] = f"private, max-age={max_age}, must-revalidate"
+    return response
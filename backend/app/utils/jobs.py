@@ -0,0 +1,389 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils.helpers import debug_print, error_print, generate_uid
+from app.utils.metrics import metrics
+import app.db.db_funcs as db_funcs
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+# Finished jobs older than this are dropped from the shared jobs table
+JOB_RETENTION_SECONDS = 24 * 60 * 60
+
+# How often a job awaited in another process is looked up again
+SHARED_POLL_SECONDS = 1.0
+
+
+def _pid_alive(pid: int | None) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Job:
+    def __init__(self, key: tuple, kind: str):
+        self.id = generate_uid()
+        self.key = key
+        self.kind = kind
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.pid = os.getpid()
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.background = False
+        self._call = None
+        self._done = threading.Event()
+        self._callbacks = []
+        self._callback_lock = threading.Lock()
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "Job":
+        """A read-only view of a job recorded by this or another process."""
+        job = cls.__new__(cls)
+        (job.id, key, job.kind, job.status, result, job.error, job.pid) = row[:7]
+        job.created_at, job.started_at, job.finished_at = row[7:]
+        job.key = tuple(json.loads(key))
+        job.result = json.loads(result) if result is not None else None
+        job.background = False
+        job._call = None
+        job._done = threading.Event()
+        job._callbacks = []
+        job._callback_lock = threading.Lock()
+        if job.status in (QUEUED, RUNNING) and not _pid_alive(job.pid):
+            # The process running it died before finishing
+            job.status = FAILED
+            job.error = f"Error generating {job.kind}"
+        if job.status in (DONE, FAILED):
+            job._done.set()
+        return job
+
+    def to_row(self) -> tuple:
+        return (
+            self.id,
+            json.dumps(list(self.key)),
+            self.kind,
+            self.status,
+            json.dumps(self.result) if self.result is not None else None,
+            self.error,
+            self.pid,
+            self.created_at,
+            self.started_at,
+            self.finished_at,
+        )
+
+    @property
+    def finished(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        return self._done.wait(timeout)
+
+    def add_done_callback(self, callback):
+        """Calls callback(job) once the job finishes, or right away if it has."""
+        with self._callback_lock:
+            if not self.finished:
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def _finish(self):
+        with self._callback_lock:
+            self._done.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception as e:
+                error_print([f"Job {self.id} callback failed: {str(e)}"])
+
+    def to_dict(self) -> dict:
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if self.status == DONE:
+            data["result"] = self.result
+        if self.status == FAILED:
+            data["error"] = self.error
+        return data
+
+
+class JobQueue:
+    """Bounded pool of background workers for slow generation work.
+
+    Jobs are identified by a key such as (document uid, "summary"). Submitting
+    a key that is already queued or running returns the existing job instead
+    of starting a second one, so duplicate clicks share one generation.
+    Finished jobs are kept, up to max_finished, so their status can be polled.
+
+    Background jobs (work scheduled ahead of demand, such as precomputing on
+    upload) run on their own background_workers threads so they never hold
+    up requested work. Requesting a key whose background job has not started
+    yet moves it to the main workers.
+
+    With shared=True, job state is also written to the jobs table, so when the
+    app runs in several server processes a poll can reach any of them and a
+    key already running in another process is joined rather than repeated.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_finished: int = 1000,
+        background_workers: int = 1,
+    ):
+        self.max_workers = max_workers
+        self.max_finished = max_finished
+        self.background_workers = background_workers
+        self._executor = None
+        self._background_executor = None
+        self._jobs = OrderedDict()
+        self._inflight = {}
+        self._closed = False
+        self._lock = threading.Lock()
+        self.shared = False
+
+    def init_app(self, app):
+        self.max_workers = app.config.get("JOB_WORKERS", self.max_workers)
+        self.max_finished = app.config.get("JOB_MAX_FINISHED", self.max_finished)
+        self.background_workers = app.config.get(
+            "JOB_BACKGROUND_WORKERS", self.background_workers
+        )
+        self.shared = app.config.get("JOB_SHARED", True)
+        metrics.register_collector("jobs", self.collect_metrics)
+        if self.shared:
+            db_funcs.delete_finished_jobs(time.time() - JOB_RETENTION_SECONDS)
+
+    def collect_metrics(self) -> list[tuple]:
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return [
+            (
+                f"jobs_{status}",
+                "gauge",
+                f"Jobs currently {status}",
+                statuses.count(status),
+            )
+            for status in ("queued", "running")
+        ]
+
+    def submit(
+        self,
+        key: tuple,
+        fn,
+        *args,
+        kind: str | None = None,
+        background: bool = False,
+    ) -> Job:
+        """Queues fn(*args) under key, or returns the in-flight job for key."""
+        with self._lock:
+            job = self._join(key, background)
+        if job is not None:
+            return job
+        # Queried without the lock so a slow database never stalls other keys
+        shared = self._find_shared(key)
+
+        with self._lock:
+            # Another thread may have queued key while the lock was released
+            job = self._join(key, background) or shared
+            if job is not None:
+                if job is shared:
+                    debug_print([f"Joining in-flight job {job.id} for {key}"])
+                return job
+
+            job = Job(key, kind or str(key[-1]))
+            job.background = background
+            job._call = (fn, args)
+            self._save(job)
+            self._jobs[job.id] = job
+            self._inflight[key] = job
+            self._prune()
+            if background:
+                if self._background_executor is None:
+                    self._background_executor = ThreadPoolExecutor(
+                        max_workers=self.background_workers,
+                        thread_name_prefix="job-background",
+                    )
+                self._background_executor.submit(self._run, job, fn, args)
+            else:
+                self._main_executor().submit(self._run, job, fn, args)
+        return job
+
+    def call(self, key: tuple, fn, *args, kind: str | None = None):
+        """Runs fn(*args) as the job for key and returns its result.
+
+        For work a job needs from another key. If key is in flight that job
+        is awaited, otherwise it runs in the calling thread, so a worker
+        never waits on a job queued behind it when the workers are all busy.
+        Raises RuntimeError if the job fails.
+        """
+        with self._lock:
+            job = self._join(key, False)
+        if job is None:
+            shared = self._find_shared(key)
+            with self._lock:
+                job = self._inflight.get(key) or shared
+                if job is None:
+                    job = Job(key, kind or str(key[-1]))
+                    job._call = (fn, args)
+                    self._save(job)
+                    self._jobs[job.id] = job
+                    self._inflight[key] = job
+                    self._prune()
+        call = job._call
+        if call is not None:
+            # Ours, or still queued here: whichever thread gets it first runs it
+            self._run(job, *call)
+        while not job.wait(SHARED_POLL_SECONDS):
+            if job._call is None and job.pid != os.getpid():
+                # Running in another process; its row says when it is done
+                job = self.get(job.id) or job
+        if job.status != DONE:
+            raise RuntimeError(job.error or f"Error generating {job.kind}")
+        return job.result
+
+    def inflight(self, key: tuple) -> Job | None:
+        """The queued or running job for key, in this or another process."""
+        with self._lock:
+            job = self._inflight.get(key)
+        return job or self._find_shared(key)
+
+    def _join(self, key: tuple, background: bool) -> Job | None:
+        # Called with self._lock held
+        if self._closed:
+            raise RuntimeError("Job queue is shut down")
+        job = self._inflight.get(key)
+        if job is None:
+            return None
+        debug_print([f"Joining in-flight job {job.id} for {key}"])
+        if job.background and not background and job.status == QUEUED:
+            # Someone is waiting for it now; whichever worker gets it first runs it
+            job.background = False
+            self._main_executor().submit(self._run, job, *job._call)
+        return job
+
+    def completed(self, key: tuple, result, kind: str | None = None) -> Job:
+        """Records result, already computed, as a finished job for key.
+
+        The job id is derived from key, so recording the same result again
+        (each read of a saved artifact) returns the job already recorded
+        instead of adding another one.
+        """
+        job_id = str(uuid.uuid5(uuid.NAMESPACE_OID, json.dumps(list(key))))
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.result == result:
+                self._jobs.move_to_end(job_id)
+                return job
+        job = Job(key, kind or str(key[-1]))
+        job.id = job_id
+        job.result = result
+        job.status = DONE
+        job.started_at = job.finished_at = job.created_at
+        job._done.set()
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._save(job)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None and self.shared:
+            row = db_funcs.get_job(job_id)
+            job = Job.from_row(row) if row else None
+        return job
+
+    def shutdown(self, wait: bool = True):
+        """Stops accepting work; with wait=True, blocks until running jobs finish."""
+        with self._lock:
+            self._closed = True
+            executors = (self._executor, self._background_executor)
+            self._executor = self._background_executor = None
+        for executor in executors:
+            if executor is not None:
+                executor.shutdown(wait=wait)
+
+    def _main_executor(self) -> ThreadPoolExecutor:
+        # Called with self._lock held
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers, thread_name_prefix="job"
+            )
+        return self._executor
+
+    def _run(self, job: Job, fn, args):
+        with self._lock:
+            if job.status != QUEUED:
+                # A promoted background job, already taken by the other pool
+                return
+            job.status = RUNNING
+        job.started_at = time.time()
+        self._save(job)
+        try:
+            job.result = fn(*args)
+            job.status = DONE
+        except Exception as e:
+            error_print([f"Job {job.id} ({job.kind}) failed: {str(e)}"])
+            job.error = f"Error generating {job.kind}"
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            self._save(job)
+            with self._lock:
+                if self._inflight.get(job.key) is job:
+                    del self._inflight[job.key]
+            job._call = None
+            job._finish()
+
+    def _find_shared(self, key: tuple) -> Job | None:
+        if not self.shared:
+            return None
+        for row in db_funcs.find_active_jobs(json.dumps(list(key))):
+            job = Job.from_row(row)
+            # Rows left by this process are not in memory, so they are stale
+            if job.pid != os.getpid() and not job.finished:
+                return job
+        return None
+
+    def _save(self, job: Job):
+        if not self.shared:
+            return
+        try:
+            db_funcs.save_job(job.to_row())
+        except Exception as e:
+            error_print([f"Could not record job {job.id}: {str(e)}"])
+
+    def _prune(self):
+        # Drop the oldest finished jobs once the history is full
+        if len(self._jobs) <= self.max_finished:
+            return
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.max_finished:
+                break
+            if self._jobs[job_id].finished:
+                del self._jobs[job_id]
+
+
+jobs = JobQueue()
@@ -0,0 +1,133 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from datetime import datetime
+
+from colorama import Fore, Style
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "DEBUG").upper()
+
+logger = logging.getLogger("ai_notes")
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, process, thread, message and fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(
+                timespec="milliseconds"
+            ),
+            "level": record.levelname.lower(),
+            "pid": record.process,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class ConsoleFormatter(logging.Formatter):
+    """The familiar coloured "[DEBUG] message" lines, with fields appended."""
+
+    COLORS = {
+        logging.DEBUG: Fore.GREEN,
+        logging.INFO: Fore.CYAN,
+        logging.WARNING: Fore.YELLOW,
+        logging.ERROR: Fore.RED,
+        logging.CRITICAL: Fore.RED,
+    }
+
+    def format(self, record: logging.LogRecord) -> str:
+        color = self.COLORS.get(record.levelno, "")
+        line = f"{color}[{record.levelname}]{Style.RESET_ALL} {record.getMessage()}"
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
+
+
+# Callers only put records on the queue; a listener thread formats and writes them
+_queue = queue.SimpleQueue()
+_listener = None
+_queue_handler = logging.handlers.QueueHandler(_queue)
+_settings = {}
+
+
+def configure(
+    log_folder: str | None = None, level: str = LOG_LEVEL, console: bool = True
+) -> str | None:
+    """(Re)starts the logging pipeline; returns the JSON log file path, if any."""
+    global _listener
+    _settings.update(log_folder=log_folder, level=level, console=console)
+    handlers = []
+    if console:
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(ConsoleFormatter())
+        handlers.append(stream)
+
+    path = None
+    if log_folder:
+        os.makedirs(log_folder, exist_ok=True)
+        path = os.path.join(
+            log_folder,
+            f"backend_{datetime.now():%Y-%m-%d_%H-%M-%S}_{os.getpid()}.jsonl",
+        )
+        file_handler = logging.FileHandler(path, encoding="utf-8", delay=True)
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+
+    if _listener is not None:
+        _listener.stop()
+    _listener = logging.handlers.QueueListener(_queue, *handlers)
+    _listener.start()
+
+    if _queue_handler not in logger.handlers:
+        logger.addHandler(_queue_handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    return path
+
+
+def init_app(app):
+    path = configure(
+        app.config.get("LOG_FOLDER"),
+        app.config.get("LOG_LEVEL", LOG_LEVEL),
+        app.config.get("LOG_CONSOLE", True),
+    )
+    if path:
+        log_event("logging started", path=path)
+
+
+def shutdown():
+    """Flushes queued records and stops the listener thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def log_event(message: str, level: int = logging.INFO, **fields):
+    """Logs message with structured fields kept as separate JSON keys."""
+    logger.log(level, message, extra={"fields": fields})
+
+
+def _restart_after_fork():
+    # The listener thread does not survive a fork; each server worker gets a
+    # fresh queue, listener and log file of its own
+    global _listener, _queue
+    if _listener is not None:
+        for handler in _listener.handlers:
+            handler.close()
+    _listener = None
+    _queue = _queue_handler.queue = queue.SimpleQueue()
+    configure(**_settings)
+
+
+configure()
+atexit.register(shutdown)
+os.register_at_fork(after_in_child=_restart_after_fork)
@@ -0,0 +1,334 @@
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from app.utils.log import log_event
+
+KB = 1024
+MB = 1024 * 1024
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels, rendered Prometheus-style."""
+
+    def __init__(self, name: str, help: str, buckets: tuple, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.labelnames = labelnames
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket counts (last slot is +Inf), then sum and count
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def snapshot(self) -> dict:
+        """This process's series, in the form written to the worker's metrics file."""
+        with self._lock:
+            series = [
+                [list(key), list(counts), total, count]
+                for key, (counts, total, count) in self._series.items()
+            ]
+        return {
+            "help": self.help,
+            "buckets": list(self.buckets),
+            "labelnames": list(self.labelnames),
+            "series": series,
+        }
+
+    def reset(self):
+        # After a fork: the lock may have been held by a thread that is gone
+        self._lock = threading.Lock()
+        self._series = {}
+
+
+def _render_histogram(name: str, data: dict) -> list[str]:
+    buckets = tuple(data["buckets"]) + ("+Inf",)
+    labelnames = tuple(data["labelnames"])
+    lines = [f"# HELP {name} {data['help']}", f"# TYPE {name} histogram"]
+    for key, counts, total, count in sorted(data["series"], key=lambda s: s[0]):
+        cumulative = 0
+        for bound, bucket_count in zip(buckets, counts):
+            cumulative += bucket_count
+            le = _labels(labelnames, key, f'le="{bound}"')
+            lines.append(f"{name}_bucket{le} {cumulative}")
+        labels = _labels(labelnames, key)
+        lines.append(f"{name}_sum{labels} {total}")
+        lines.append(f"{name}_count{labels} {count}")
+    return lines
+
+
+def _merge(snapshots: list[dict]) -> dict:
+    """Adds up the snapshots of several processes, series by series."""
+    histograms = {}
+    samples = {}
+    for snapshot in snapshots:
+        for name, data in snapshot["histograms"].items():
+            merged = histograms.setdefault(name, {**data, "series": {}})
+            for key, counts, total, count in data["series"]:
+                series = merged["series"].setdefault(
+                    tuple(key), [[0] * len(counts), 0.0, 0]
+                )
+                series[0] = [a + b for a, b in zip(series[0], counts)]
+                series[1] += total
+                series[2] += count
+        for name, kind, help, value in snapshot["samples"]:
+            sample = samples.setdefault(name, [name, kind, help, 0])
+            sample[3] += value
+    for data in histograms.values():
+        data["series"] = [
+            [list(key), *series] for key, series in data["series"].items()
+        ]
+    return {"histograms": histograms, "samples": list(samples.values())}
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Metrics:
+    """Metric registry served on /metrics.
+
+    Histograms are recorded where the work happens; collectors are callables
+    returning (name, type, help, value) samples for counters kept elsewhere,
+    such as the LLM cache statistics, and are read at scrape time.
+
+    Under several server processes each one keeps its own registry, so with
+    a folder set every process writes a snapshot of it to <folder>/<pid>.json
+    (after requests, at most every FLUSH_SECONDS, and when scraped) and
+    /metrics serves the sum of the snapshots of the processes still alive.
+    A process that exits takes its counts with it, which a scraper sees as
+    a counter reset.
+    """
+
+    FLUSH_SECONDS = 5.0
+
+    def __init__(self):
+        self.folder = None
+        self._histograms = {}
+        self._collectors = {}
+        self._lock = threading.Lock()
+        self._flushed_at = 0.0
+
+    def histogram(
+        self, name: str, help: str, buckets: tuple, labelnames: tuple = ()
+    ) -> Histogram:
+        with self._lock:
+            if name not in self._histograms:
+                self._histograms[name] = Histogram(name, help, buckets, labelnames)
+            return self._histograms[name]
+
+    def register_collector(self, name: str, collect):
+        with self._lock:
+            self._collectors[name] = collect
+
+    def unregister_collector(self, name: str):
+        with self._lock:
+            self._collectors.pop(name, None)
+
+    def snapshot(self) -> dict:
+        """This process's histograms and collector samples."""
+        with self._lock:
+            histograms = list(self._histograms.values())
+            collectors = list(self._collectors.values())
+        samples = []
+        for collect in collectors:
+            samples.extend(list(sample) for sample in collect())
+        return {
+            "histograms": {h.name: h.snapshot() for h in histograms},
+            "samples": samples,
+        }
+
+    def render(self) -> str:
+        if self.folder is None:
+            merged = _merge([self.snapshot()])
+        else:
+            self.flush()
+            merged = _merge(self._read_snapshots())
+        lines = []
+        for name, data in merged["histograms"].items():
+            lines.extend(_render_histogram(name, data))
+        for name, kind, help, value in merged["samples"]:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self):
+        """Writes this process's snapshot for the process serving the next scrape."""
+        if self.folder is None:
+            return
+        self._flushed_at = time.monotonic()
+        path = os.path.join(self.folder, f"{os.getpid()}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+
+    def _read_snapshots(self) -> list[dict]:
+        snapshots = []
+        for name in os.listdir(self.folder):
+            pid, ext = os.path.splitext(name)
+            if ext != ".json" or not pid.isdigit():
+                continue
+            path = os.path.join(self.folder, name)
+            if not _pid_alive(int(pid)):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    snapshots.append(json.load(f))
+            except (FileNotFoundError, ValueError):
+                continue
+        return snapshots
+
+    def _reset_after_fork(self):
+        # A forked worker starts counting from zero; the parent's counts
+        # stay the parent's, and are not added in again for every worker
+        self._lock = threading.Lock()
+        for histogram in self._histograms.values():
+            histogram.reset()
+        self._flushed_at = 0.0
+
+    def init_app(self, app):
+        """Times every request and serves the registry on /metrics."""
+        from flask import g, request
+
+        self.folder = app.config.get("METRICS_FOLDER")
+        if self.folder:
+            os.makedirs(self.folder, exist_ok=True)
+
+        @app.before_request
+        def start_timer():
+            g.request_start = time.perf_counter()
+
+        @app.after_request
+        def record_request(response):
+            start = g.pop("request_start", None)
+            if start is not None:
+                elapsed = time.perf_counter() - start
+                # The URL rule, not the path, keeps label cardinality bounded
+                endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+                REQUEST_SECONDS.observe(
+                    elapsed,
+                    endpoint=endpoint,
+                    method=request.method,
+                    status=response.status_code,
+                )
+                log_event(
+                    "request",
+                    method=request.method,
+                    path=request.path,
+                    status=response.status_code,
+                    duration_ms=round(elapsed * 1000, 2),
+                )
+            if time.monotonic() - self._flushed_at >= self.FLUSH_SECONDS:
+                try:
+                    self.flush()
+                except OSError as e:
+                    log_event("metrics flush failed", logging.WARNING, error=str(e))
+            return response
+
+        app.add_url_rule("/metrics", "metrics", self.serve)
+
+    def serve(self):
+        from flask import Response
+
+        return Response(self.render(), mimetype="text/plain; version=0.0.4")
+
+
+metrics = Metrics()
+os.register_at_fork(after_in_child=metrics._reset_after_fork)
+
+REQUEST_SECONDS = metrics.histogram(
+    "http_request_duration_seconds",
+    "Time to produce the response headers, by route",
+    LATENCY_BUCKETS,
+    ("endpoint", "method", "status"),
+)
+UPLOAD_SIZE = metrics.histogram(
+    "upload_size_bytes",
+    "Size of uploaded files",
+    (10 * KB, 100 * KB, 500 * KB, MB, 5 * MB, 10 * MB, 25 * MB, 50 * MB, 100 * MB),
+)
+EXTRACTION_SECONDS = metrics.histogram(
+    "extraction_duration_seconds",
+    "Time to extract text from an upload, by file format",
+    LATENCY_BUCKETS,
+    ("format",),
+)
+TEXT_TOKENS_SAVED = metrics.histogram(
+    "text_clean_tokens_saved",
+    "Estimated tokens removed from each extracted document before prompting",
+    (0, 100, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000),
+)
+PROMPT_TOKENS = metrics.histogram(
+    "llm_prompt_tokens",
+    "Estimated tokens per prompt sent to the model",
+    (100, 250, 500, 1000, 2000, 3000, 4000, 6000, 8000, 16000),
+)
+LLM_SECONDS = metrics.histogram(
+    "llm_request_duration_seconds",
+    "Model call latency on cache misses, by call mode",
+    (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300),
+    ("mode",),
+)
+LLM_QUEUE_SECONDS = metrics.histogram(
+    "llm_queue_wait_seconds",
+    "Time a model call waited for a free backend slot",
+    (0.001, 0.01, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+LLM_TOKENS_PER_SECOND = metrics.histogram(
+    "llm_output_tokens_per_second",
+    "Estimated output tokens per second of model calls",
+    (1, 2, 5, 10, 20, 30, 50, 75, 100, 200, 500),
+)
+DB_QUERY_SECONDS = metrics.histogram(
+    "db_query_duration_seconds",
+    "SQLite statement time including waiting for a pooled connection",
+    (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1),
+    ("op",),
+)
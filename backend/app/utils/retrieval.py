@@ -0,0 +1,273 @@
+import fcntl
+import os
+import re
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+
+from app.ai.chunking import chunk_text
+from app.utils.helpers import debug_print
+import app.db.db_funcs as db_funcs
+import app.db.schemas as schemas
+
+# Width of the hashed term vectors. Terms are hashed into this many columns
+# with a random sign, so collisions mostly cancel out instead of adding up
+RETRIEVAL_DIM = 1024
+CHUNK_TOKENS = 300
+CHUNK_OVERLAP_TOKENS = 40
+# A user's matrix is rewritten without its zeroed rows once they are this
+# share of it
+COMPACT_DEAD_FRACTION = 0.25
+
+_TERM_RE = re.compile(r"\w\w+", re.UNICODE)
+
+
+def term_vector(text: str, dim: int = RETRIEVAL_DIM) -> np.ndarray:
+    """Unit-length hashed term-frequency vector of text (sublinear tf)."""
+    vector = np.zeros(dim, dtype=np.float32)
+    hashes = np.fromiter(
+        (zlib.crc32(term.encode("utf-8")) for term in _TERM_RE.findall(text.lower())),
+        dtype=np.uint32,
+    )
+    if not hashes.size:
+        return vector
+    signs = np.where(hashes & 0x80000000, 1.0, -1.0).astype(np.float32)
+    np.add.at(vector, hashes % dim, signs)
+    nonzero = vector != 0
+    vector[nonzero] = np.sign(vector[nonzero]) * (1 + np.log(np.abs(vector[nonzero])))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class RetrievalIndex:
+    """Per-user index of document chunks for question answering.
+
+    Each user's chunks are rows of a float32 matrix in a memory-mapped file,
+    one hashed TF vector per chunk, with document frequencies kept beside it.
+    A query is weighted by IDF and scored against the whole matrix in one
+    NumPy product, so finding the best chunks costs the same however the
+    library is split into documents. Chunk text lives in retrieval_chunks.
+
+    Writers take a per-user file lock, so several server processes can add
+    documents to the same index. Re-indexing or deleting a document zeroes
+    its old rows; compact() drops them once they make up compact_fraction
+    of the matrix, and the storage GC calls it for every user.
+    """
+
+    def __init__(
+        self,
+        dim: int = RETRIEVAL_DIM,
+        chunk_tokens: int = CHUNK_TOKENS,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+        compact_fraction: float = COMPACT_DEAD_FRACTION,
+    ):
+        self.folder = None
+        self.dim = dim
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.compact_fraction = compact_fraction
+
+    def init_app(self, app):
+        self.folder = app.config["RETRIEVAL_FOLDER"]
+        self.chunk_tokens = app.config.get("RETRIEVAL_CHUNK_TOKENS", self.chunk_tokens)
+        self.compact_fraction = app.config.get(
+            "RETRIEVAL_COMPACT_FRACTION", self.compact_fraction
+        )
+        os.makedirs(self.folder, exist_ok=True)
+
+    def _path(self, user_id: int, name: str) -> str:
+        return os.path.join(self.folder, str(user_id), name)
+
+    def users(self) -> list[int]:
+        """Users with an index folder."""
+        try:
+            names = os.listdir(self.folder)
+        except FileNotFoundError:
+            return []
+        return [int(name) for name in names if name.isdigit()]
+
+    @contextmanager
+    def _locked(self, user_id: int, shared: bool = False):
+        # Searches share the lock; writers, which may renumber rows, hold it alone
+        os.makedirs(os.path.dirname(self._path(user_id, "lock")), exist_ok=True)
+        with open(self._path(user_id, "lock"), "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _rows(self, user_id: int) -> int:
+        try:
+            size = os.path.getsize(self._path(user_id, "vectors.f32"))
+        except FileNotFoundError:
+            return 0
+        # A row still being appended by another process is left out
+        return size // (self.dim * 4)
+
+    def _matrix(self, user_id: int, mode: str = "r") -> np.memmap | None:
+        rows = self._rows(user_id)
+        if not rows:
+            return None
+        return np.memmap(
+            self._path(user_id, "vectors.f32"),
+            dtype=np.float32,
+            mode=mode,
+            shape=(rows, self.dim),
+        )
+
+    def _load_stats(self, user_id: int) -> np.ndarray:
+        # Document frequency of every column, then the number of live chunks
+        try:
+            return np.load(self._path(user_id, "stats.npy"))
+        except FileNotFoundError:
+            return np.zeros(self.dim + 1, dtype=np.int64)
+
+    def _save_stats(self, user_id: int, stats: np.ndarray):
+        tmp_path = self._path(user_id, f"stats.{os.getpid()}.tmp.npy")
+        np.save(tmp_path, stats)
+        os.replace(tmp_path, self._path(user_id, "stats.npy"))
+
+    def index_document(self, document: schemas.Document, text: str) -> int:
+        """Chunks text and adds it to the owner's index; returns the chunk count."""
+        chunks = chunk_text(text, self.chunk_tokens, self.overlap_tokens)
+        if not chunks:
+            return 0
+        vectors = np.stack([term_vector(chunk, self.dim) for chunk in chunks])
+        user_id = document.user_id
+
+        with self._locked(user_id):
+            stats = self._load_stats(user_id)
+            self._clear_rows(user_id, document.uid, stats)
+
+            start = self._rows(user_id)
+            with open(self._path(user_id, "vectors.f32"), "ab") as f:
+                f.truncate(start * self.dim * 4)
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            stats[: self.dim] += np.count_nonzero(vectors, axis=0)
+            stats[self.dim] += len(chunks)
+            self._save_stats(user_id, stats)
+
+            db_funcs.replace_retrieval_chunks(
+                user_id,
+                document.uid,
+                [(start + i, i, chunk) for i, chunk in enumerate(chunks)],
+            )
+        debug_print([f"Indexed {len(chunks)} chunks of {document.uid} for retrieval"])
+        return len(chunks)
+
+    def remove_document(self, document: schemas.Document):
+        """Zeroes a document's rows, before its chunks are deleted with it."""
+        with self._locked(document.user_id):
+            stats = self._load_stats(document.user_id)
+            if self._clear_rows(document.user_id, document.uid, stats):
+                self._save_stats(document.user_id, stats)
+
+    def _clear_rows(self, user_id: int, document_uid: str, stats: np.ndarray) -> int:
+        # Takes the document's old rows out of the matrix and of stats
+        rows = self._rows(user_id)
+        old_rows = [r for r in db_funcs.get_retrieval_rows(document_uid) if r < rows]
+        if old_rows:
+            matrix = self._matrix(user_id, "r+")
+            stats[: self.dim] -= np.count_nonzero(matrix[old_rows], axis=0)
+            stats[self.dim] -= len(old_rows)
+            matrix[old_rows] = 0
+            matrix.flush()
+        return len(old_rows)
+
+    def compact(self, user_id: int, force: bool = False) -> int:
+        """Rewrites the user's matrix without zeroed rows; returns how many were dropped.
+
+        Does nothing until dead rows make up compact_fraction of the matrix,
+        unless force. Live rows keep their order and retrieval_chunks is
+        renumbered to match; document frequencies are recounted from them.
+        """
+        with self._locked(user_id):
+            rows = self._rows(user_id)
+            if not rows:
+                return 0
+            live = [r for r in db_funcs.get_user_retrieval_rows(user_id) if r < rows]
+            dead = rows - len(live)
+            if not dead or (not force and dead < rows * self.compact_fraction):
+                return 0
+
+            vectors = np.ascontiguousarray(self._matrix(user_id)[live])
+            stats = np.zeros(self.dim + 1, dtype=np.int64)
+            stats[: self.dim] = np.count_nonzero(vectors, axis=0)
+            stats[self.dim] = len(live)
+
+            path = self._path(user_id, "vectors.f32")
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(vectors.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            try:
+                db_funcs.renumber_retrieval_rows(user_id, live)
+            except Exception:
+                os.remove(tmp_path)
+                raise
+            os.replace(tmp_path, path)
+            self._save_stats(user_id, stats)
+        debug_print([f"Compacted retrieval index of user {user_id}: {dead} rows"])
+        return dead
+
+    def search(
+        self,
+        user_id: int,
+        query: str,
+        k: int = 6,
+        document_uid: str | None = None,
+    ) -> list[dict]:
+        """The k chunks of the user's notes that best match query, best first."""
+        with self._locked(user_id, shared=True):
+            return self._search(user_id, query, k, document_uid)
+
+    def _search(
+        self, user_id: int, query: str, k: int, document_uid: str | None
+    ) -> list[dict]:
+        matrix = self._matrix(user_id)
+        if matrix is None:
+            return []
+        stats = self._load_stats(user_id)
+        idf = np.log((1 + stats[self.dim]) / (1 + stats[: self.dim])) + 1
+        weighted = term_vector(query, self.dim) * idf.astype(np.float32)
+        columns = np.flatnonzero(weighted)
+        if not columns.size:
+            return []
+
+        rows = np.arange(matrix.shape[0])
+        if document_uid is not None:
+            rows = np.array(
+                [r for r in db_funcs.get_retrieval_rows(document_uid) if r < len(rows)],
+                dtype=np.int64,
+            )
+            if not rows.size:
+                return []
+            scores = matrix[rows][:, columns] @ weighted[columns]
+        else:
+            scores = matrix[:, columns] @ weighted[columns]
+
+        k = min(k, scores.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        best = {int(rows[i]): float(scores[i]) for i in top if scores[i] > 0}
+
+        chunks = db_funcs.get_retrieval_chunks(user_id, list(best))
+        results = [
+            {
+                "document_uid": chunk[1],
+                "filename": chunk[2],
+                "position": chunk[3],
+                "content": chunk[4],
+                "score": best[chunk[0]],
+            }
+            for chunk in chunks
+        ]
+        return sorted(results, key=lambda result: -result["score"])
+
+
+retrieval = RetrievalIndex()
@@ -0,0 +1,75 @@
+import json
+import re
+
+from app.utils.helpers import debug_print, error_print
+import app.db.db_funcs as db_funcs
+import app.db.schemas as schemas
+
+# Words of a query that are searched for; the rest are ignored
+MAX_QUERY_TERMS = 16
+# A shorter last word is matched whole: a one-letter prefix matches nearly everything
+MIN_PREFIX_CHARS = 2
+
+_TERM_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def flashcards_text(content: str) -> str:
+    """The questions and answers of a saved deck, one card per line."""
+    try:
+        cards = json.loads(content)
+    except ValueError:
+        return content
+    if not isinstance(cards, list):
+        return content
+    return "\n".join(
+        f"{card.get('question', '')} {card.get('answer', '')}"
+        for card in cards
+        if isinstance(card, dict)
+    )
+
+
+def index_document(document: schemas.Document, kind: str, content: str):
+    """Indexes a document's text, summary or flashcards for its owner's searches."""
+    body = flashcards_text(content) if kind == "flashcards" else content
+    db_funcs.index_search_entry(
+        document.uid, document.user_id, kind, document.original_name, body
+    )
+    debug_print([f"Indexed {kind} of {document.uid} for search"])
+
+
+def match_expression(query: str, user_id: int) -> str | None:
+    """An FTS5 query for every word of query, limited to user_id's entries.
+
+    Words are quoted, so punctuation and FTS5 operators in user input are
+    taken literally; the last word also matches as a prefix, for search as
+    you type, which the index's prefix option keeps fast.
+    """
+    terms = _TERM_RE.findall(query)[:MAX_QUERY_TERMS]
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    if query[-1].isalnum() and len(terms[-1]) >= MIN_PREFIX_CHARS:
+        quoted[-1] += "*"
+    return f'user_id:"{user_id}" AND {{title body}}: ({" ".join(quoted)})'
+
+
+def search(user_id: int, query: str, limit: int = 20) -> list[dict]:
+    """The user's best matching documents for query, with highlighted snippets."""
+    match = match_expression(query, user_id)
+    if match is None:
+        return []
+    try:
+        rows = db_funcs.search_entries(match, limit)
+    except Exception as e:
+        error_print([f"Search failed for {query!r}: {str(e)}"])
+        return []
+    return [
+        {
+            "document_uid": row[0],
+            "kind": row[1],
+            "filename": row[2],
+            "snippet": row[3],
+            "rank": row[4],
+        }
+        for row in rows
+    ]
@@ -0,0 +1,200 @@
+import hashlib
+import os
+import re
+import tempfile
+import time
+
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+
+SHA256_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class QuotaExceededError(Exception):
+    """Storing an upload would take its user over their storage quota."""
+
+
+def shard_path(folder: str, key: str, name: str) -> str:
+    """Where name, keyed by a hash or uid, lives in folder: <folder>/<key[:2]>/<name>.
+
+    Spreading files over 256 subfolders keeps every directory small. Files
+    saved before sharding stay at <folder>/<name> until the storage GC moves
+    them, so that path is returned while it is the only copy.
+    """
+    path = os.path.join(folder, key[:2], name)
+    if not os.path.exists(path):
+        legacy_path = os.path.join(folder, name)
+        if os.path.exists(legacy_path):
+            return legacy_path
+    return path
+
+
+def touch(path: str):
+    """Marks path as just used, for least-recently-used eviction.
+
+    Only the access time changes; the modification time identifies the
+    version of the file (see http_cache).
+    """
+    try:
+        stat = os.stat(path)
+        os.utime(path, ns=(time.time_ns(), stat.st_mtime_ns))
+    except OSError:
+        pass
+
+
+def blob_path(upload_folder: str, content_hash: str, ext: str) -> str:
+    """Where the single stored copy of an upload with this content lives."""
+    return shard_path(upload_folder, content_hash, f"{content_hash}.{ext}")
+
+
+class UploadStream:
+    """Writable upload target that hashes and size-checks bytes as they arrive.
+
+    The multipart parser writes each file part straight into a temporary file
+    next to the blob store, so the upload is never held in memory and never
+    copied a second time to compute its hash. Closing an uncommitted stream
+    removes the temporary file.
+
+    A part over max_bytes is read to its end but not kept, so the other
+    parts of the request still parse; committing it raises
+    RequestEntityTooLarge.
+    """
+
+    def __init__(self, folder: str, max_bytes: int | None = None):
+        os.makedirs(folder, exist_ok=True)
+        fd, self.path = tempfile.mkstemp(dir=folder, suffix=".part")
+        self._file = os.fdopen(fd, "w+b")
+        self._hash = hashlib.sha256()
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.too_large = False
+        self.committed = False
+
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        if self.max_bytes and self.size > self.max_bytes:
+            if not self.too_large:
+                self.too_large = True
+                self._file.seek(0)
+                self._file.truncate()
+            return len(data)
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def hexdigest(self) -> str:
+        return self._hash.hexdigest()
+
+    def commit(self, dest: str) -> bool:
+        """Moves the upload to dest; returns False if identical content is already there."""
+        if self.too_large:
+            self.close()
+            raise RequestEntityTooLarge()
+        self._file.close()
+        self.committed = True
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        if os.path.exists(dest):
+            os.remove(self.path)
+            touch(dest)
+            return False
+        os.replace(self.path, dest)
+        return True
+
+    def close(self):
+        self._file.close()
+        if not self.committed and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __getattr__(self, name):
+        # read, readline, seek, tell, flush... go to the underlying file
+        return getattr(self._file, name)
+
+
+class UploadRequest(Request):
+    """Request class that streams file parts into UploadStream objects."""
+
+    def _get_file_stream(
+        self, total_content_length, content_type, filename=None, content_length=None
+    ):
+        max_bytes = current_app.config.get("MAX_UPLOAD_BYTES")
+        if filename and filename.lower().endswith(".zip"):
+            # Archives are only bounded by the request; each member is
+            # checked against MAX_UPLOAD_BYTES as it is unpacked
+            max_bytes = self.max_content_length
+        stream = UploadStream(
+            os.path.join(current_app.config["UPLOAD_FOLDER"], "tmp"), max_bytes
+        )
+        # Tracked so parts from an aborted parse are cleaned up too
+        self.__dict__.setdefault("_upload_streams", []).append(stream)
+        return stream
+
+    def close(self):
+        super().close()
+        for stream in self.__dict__.get("_upload_streams", ()):
+            stream.close()
+
+
+def save_upload(file, upload_folder: str, ext: str, max_bytes: int | None = None):
+    """Stores an uploaded file under its content hash.
+
+    Returns (content_hash, size, path, created); created is False when the
+    same bytes were already stored, in which case the existing blob is kept.
+    """
+    return save_stream(file.stream, upload_folder, ext, max_bytes)
+
+
+def receive_stream(
+    source, upload_folder: str, max_bytes: int | None = None
+) -> UploadStream:
+    """The UploadStream holding source's bytes, copying them over if needed.
+
+    Done before save_stream so that a slow copy (e.g. unpacking a zip
+    member) is not made while holding a database transaction.
+    """
+    if isinstance(source, UploadStream):
+        return source
+    # Parsed without UploadRequest; copy it over in fixed-size chunks
+    stream = UploadStream(os.path.join(upload_folder, "tmp"), max_bytes)
+    try:
+        for chunk in iter(lambda: source.read(1024 * 1024), b""):
+            stream.write(chunk)
+            if stream.too_large:
+                break
+    except Exception:
+        stream.close()
+        raise
+    return stream
+
+
+def save_stream(source, upload_folder: str, ext: str, max_bytes: int | None = None):
+    """save_upload for any readable binary stream, e.g. a member of a zip archive."""
+    stream = receive_stream(source, upload_folder, max_bytes)
+    content_hash = stream.hexdigest()
+    path = blob_path(upload_folder, content_hash, ext)
+    created = stream.commit(path)
+    return content_hash, stream.size, path, created
+
+
+def resolve_upload(upload_folder: str, filename: str) -> tuple[str | None, str | None]:
+    """Maps a saved_as filename to (blob path, content hash).
+
+    saved_as is "<document uid>.<ext>" for registered documents and
+    "<content hash>.<ext>" for anonymous uploads and blobs saved by name.
+    """
+    import app.db.db_funcs as db_funcs
+
+    stem, ext = os.path.splitext(filename)
+    ext = ext.lstrip(".").lower()
+
+    document = db_funcs.get_document(stem)
+    if document is not None and document.content_hash:
+        path = blob_path(upload_folder, document.content_hash, ext)
+        if not os.path.isfile(path):
+            return None, document.content_hash
+        touch(path)
+        return path, document.content_hash
+
+    path = shard_path(upload_folder, stem, filename)
+    if not os.path.isfile(path):
+        return None, None
+    touch(path)
+    return path, stem if SHA256_RE.match(stem) else None
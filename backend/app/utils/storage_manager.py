@@ -0,0 +1,366 @@
+import fcntl
+import glob
+import os
+import re
+import threading
+import time
+
+from app.utils.artifacts import ARTIFACT_FILES
+from app.utils.helpers import debug_print, error_print
+from app.utils.log import log_event
+from app.utils.retrieval import retrieval
+from app.utils.storage import SHA256_RE, QuotaExceededError
+from app.utils.text_cache import EXTRACTOR_VERSION
+import app.db.db_funcs as db_funcs
+from app.db.db import transaction
+
+# Files next to a saved artifact that are derived from it (see http_cache):
+# its metadata and its compressed variants, named by content hash
+SIDECAR_RE = re.compile(r"\.meta$|(\.[0-9a-f]{64})?\.(gz|br)$")
+# Files still being written end in these; older ones were left by a crash
+PARTIAL_SUFFIXES = (".tmp", ".part")
+PARTIAL_MAX_AGE = 24 * 60 * 60
+# Evicting for size stops once derived files are this share of the budget
+EVICT_TO_FRACTION = 0.9
+# A worker's first pass waits this long (or the interval, if shorter) after startup
+FIRST_PASS_DELAY = 60
+
+
+def last_used(stat: os.stat_result) -> float:
+    # storage.touch marks use in the access time; the mtime covers files
+    # never read since they were written
+    return max(stat.st_atime, stat.st_mtime)
+
+
+def _idle_seconds(path: str, now: float) -> float:
+    try:
+        return now - last_used(os.stat(path))
+    except FileNotFoundError:
+        return float("inf")
+
+
+def _entries(folder: str):
+    try:
+        with os.scandir(folder) as it:
+            return list(it)
+    except FileNotFoundError:
+        return []
+
+
+def _remove(path: str) -> int:
+    """Deletes path and returns the bytes freed."""
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+        return size
+    except FileNotFoundError:
+        return 0
+
+
+class StorageManager:
+    """Keeps the data folders consistent with the database and within budget.
+
+    Uploads are content-addressed blobs; summaries, flashcards, quizzes and
+    extracted text are derived from them and can always be rebuilt, the
+    artifacts from their database rows. Every STORAGE_GC_INTERVAL seconds
+    one server process makes a pass that:
+
+    - moves files saved before sharding into their <key[:2]>/ folder,
+    - deletes artifacts whose document is gone (the rows went with it
+      through ON DELETE CASCADE) and blobs no document refers to that have
+      not been used for ANONYMOUS_UPLOAD_TTL seconds,
+    - deletes text cache entries of an old extractor or of a deleted blob,
+      and files left half-written by a crash,
+    - evicts derived files unused for ARTIFACT_TTL seconds, then the least
+      recently used ones until they fit in DERIVED_MAX_BYTES,
+    - compacts retrieval indexes whose zeroed rows passed
+      RETRIEVAL_COMPACT_FRACTION.
+
+    Passes take a file lock, so only one process runs one at a time.
+    """
+
+    def __init__(self):
+        self.upload_folder = None
+        self.artifact_folders = {}
+        self.text_cache_folder = None
+        self.interval = 3600
+        self.artifact_ttl = 30 * 24 * 60 * 60
+        self.anonymous_ttl = 7 * 24 * 60 * 60
+        self.derived_max_bytes = 0
+        self.user_quota_bytes = 0
+        self._lock_path = None
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._start_lock = threading.Lock()
+
+    def init_app(self, app):
+        self.upload_folder = app.config["UPLOAD_FOLDER"]
+        self.artifact_folders = {
+            kind: app.config[folder] for kind, (folder, _, _) in ARTIFACT_FILES.items()
+        }
+        self.text_cache_folder = app.config["TEXT_CACHE_FOLDER"]
+        self.interval = app.config.get("STORAGE_GC_INTERVAL", self.interval)
+        self.artifact_ttl = app.config.get("ARTIFACT_TTL", self.artifact_ttl)
+        self.anonymous_ttl = app.config.get("ANONYMOUS_UPLOAD_TTL", self.anonymous_ttl)
+        self.derived_max_bytes = app.config.get("DERIVED_MAX_BYTES", 0)
+        self.user_quota_bytes = app.config.get("USER_QUOTA_BYTES", 0)
+        self._lock_path = os.path.join(
+            os.path.dirname(self.upload_folder), ".storage_gc"
+        )
+        if self.interval:
+            # Started on the first request rather than here: the app may be
+            # built in a process that only forks the server workers
+            app.before_request(self._ensure_started)
+
+    def check_quota(self, user_id: int, size: int):
+        """Raises QuotaExceededError if size more bytes would not fit in the user's quota."""
+        if not self.user_quota_bytes:
+            return
+        _, used = db_funcs.user_storage(user_id)
+        if used + size > self.user_quota_bytes:
+            raise QuotaExceededError(
+                f"Storage quota of {self.user_quota_bytes} bytes exceeded"
+            )
+
+    def remove_artifacts(self, document_uid: str) -> int:
+        """Deletes a document's artifact files and their sidecars; returns bytes freed."""
+        freed = 0
+        for kind, (_, name, _) in ARTIFACT_FILES.items():
+            folder = self.artifact_folders[kind]
+            filename = name.format(uid=document_uid)
+            for path in (
+                os.path.join(folder, document_uid[:2], filename),
+                os.path.join(folder, filename),
+            ):
+                for sidecar in glob.glob(f"{glob.escape(path)}.*"):
+                    if SIDECAR_RE.search(sidecar):
+                        freed += _remove(sidecar)
+                freed += _remove(path)
+        return freed
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._stop = threading.Event()
+            self._thread = threading.Thread(
+                target=self._loop, name="storage-gc", daemon=True
+            )
+            self._thread.start()
+
+    def shutdown(self):
+        self._stop.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout=5)
+
+    def _loop(self):
+        delay = min(FIRST_PASS_DELAY, self.interval)
+        while not self._stop.wait(delay):
+            delay = self.interval
+            try:
+                self.collect()
+            except Exception as e:
+                error_print([f"Storage GC failed: {str(e)}"])
+
+    def collect(self, force: bool = False) -> dict | None:
+        """Runs one pass unless another process is running one or ran one recently.
+
+        Returns the pass report, or None if it was skipped.
+        """
+        os.makedirs(os.path.dirname(self._lock_path), exist_ok=True)
+        with open(f"{self._lock_path}.lock", "a") as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return None
+            try:
+                stamp = f"{self._lock_path}.last"
+                if not force and os.path.exists(stamp):
+                    if time.time() - os.path.getmtime(stamp) < self.interval:
+                        return None
+                report = self._collect()
+                with open(stamp, "w") as f:
+                    f.write(str(time.time()))
+                return report
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _collect(self) -> dict:
+        start = time.perf_counter()
+        now = time.time()
+        report = {
+            "moved": 0,
+            "orphan_blobs": 0,
+            "orphan_artifacts": 0,
+            "stale_files": 0,
+            "evicted": 0,
+            "compacted_rows": 0,
+            "freed_bytes": 0,
+        }
+
+        blobs = self._collect_blobs(now, report)
+        derived = []
+        for kind, folder in self.artifact_folders.items():
+            derived += self._collect_artifacts(kind, folder, blobs, now, report)
+        derived += self._collect_text_cache(blobs, now, report)
+        self._evict(derived, now, report)
+        self._compact_retrieval(report)
+
+        report["derived_bytes"] = sum(group[1] for group in derived)
+        report["seconds"] = round(time.perf_counter() - start, 3)
+        log_event("storage gc", **report)
+        return report
+
+    def _compact_retrieval(self, report: dict):
+        for user_id in retrieval.users():
+            try:
+                dropped = retrieval.compact(user_id)
+            except Exception as e:
+                error_print([f"Could not compact retrieval index {user_id}: {str(e)}"])
+                continue
+            report["compacted_rows"] += dropped
+            report["freed_bytes"] += dropped * retrieval.dim * 4
+
+    def _shards(self, folder: str, now: float, report: dict) -> list[os.DirEntry]:
+        """Every file in folder's shards, after moving flat files into them."""
+        for entry in _entries(folder):
+            if not entry.is_file() or entry.name.startswith("."):
+                continue
+            if self._remove_partial(entry, now, report):
+                continue
+            key = entry.name.split(".", 1)[0]
+            dest = os.path.join(folder, key[:2], entry.name)
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            # A writer that resolved the flat path before the move may have
+            # saved a newer version there since
+            if os.path.exists(dest) and os.path.getmtime(dest) >= entry.stat().st_mtime:
+                os.remove(entry.path)
+            else:
+                os.replace(entry.path, dest)
+            report["moved"] += 1
+
+        files = []
+        for shard in _entries(folder):
+            if shard.is_dir() and len(shard.name) <= 2:
+                files += [entry for entry in _entries(shard.path) if entry.is_file()]
+        return files
+
+    def _remove_partial(self, entry: os.DirEntry, now: float, report: dict) -> bool:
+        # True for a temporary file, which is deleted once it is clearly abandoned
+        if not entry.name.endswith(PARTIAL_SUFFIXES):
+            return False
+        if now - entry.stat().st_mtime > PARTIAL_MAX_AGE:
+            report["freed_bytes"] += _remove(entry.path)
+            report["stale_files"] += 1
+        return True
+
+    def _collect_blobs(self, now: float, report: dict) -> set[str]:
+        """Deletes unreferenced blobs past their TTL; returns the hashes still stored."""
+        for entry in _entries(os.path.join(self.upload_folder, "tmp")):
+            if entry.is_file():
+                self._remove_partial(entry, now, report)
+
+        blobs = {}
+        for entry in self._shards(self.upload_folder, now, report):
+            if self._remove_partial(entry, now, report):
+                continue
+            content_hash = entry.name.split(".", 1)[0]
+            if SHA256_RE.match(content_hash):
+                blobs.setdefault(content_hash, []).append(entry)
+
+        # Serialized with store_upload's transaction, and with a fresh stat: a
+        # blob an upload has just registered or found in place is never removed
+        with transaction():
+            referenced = db_funcs.referenced_hashes(list(blobs))
+            for content_hash, entries in list(blobs.items()):
+                if content_hash in referenced:
+                    continue
+                # Anonymous uploads are only kept while they are in use
+                if all(
+                    _idle_seconds(e.path, now) > self.anonymous_ttl for e in entries
+                ):
+                    for entry in entries:
+                        report["freed_bytes"] += _remove(entry.path)
+                    report["orphan_blobs"] += 1
+                    del blobs[content_hash]
+        return set(blobs)
+
+    def _collect_artifacts(
+        self, kind: str, folder: str, blobs: set[str], now: float, report: dict
+    ) -> list[tuple]:
+        """Deletes artifacts of deleted documents; returns the rest as eviction groups."""
+        suffix = ARTIFACT_FILES[kind][1].format(uid="")
+        groups = {}
+        for entry in self._shards(folder, now, report):
+            if self._remove_partial(entry, now, report):
+                continue
+            name = SIDECAR_RE.sub("", entry.name)
+            if name.endswith(suffix):
+                groups.setdefault(name.removesuffix(suffix), []).append(entry)
+
+        uids = [uid for uid in groups if not SHA256_RE.match(uid)]
+        documents = db_funcs.existing_document_uids(uids)
+        kept = []
+        for uid, entries in groups.items():
+            # Anonymous uploads' artifacts are named by content hash
+            alive = uid in blobs if SHA256_RE.match(uid) else uid in documents
+            if not alive:
+                for entry in entries:
+                    report["freed_bytes"] += _remove(entry.path)
+                report["orphan_artifacts"] += 1
+                continue
+            kept.append(self._group(entries, suffix))
+        return kept
+
+    def _collect_text_cache(
+        self, blobs: set[str], now: float, report: dict
+    ) -> list[tuple]:
+        """Deletes entries no current upload can use; returns the rest as eviction groups."""
+        kept = []
+        for entry in self._shards(self.text_cache_folder, now, report):
+            if self._remove_partial(entry, now, report):
+                continue
+            # Keys are "<content hash>-<ext>-v<extractor version>"
+            parts = entry.name.removesuffix(".txt").split("-")
+            if parts[0] not in blobs or parts[-1] != f"v{EXTRACTOR_VERSION}":
+                report["freed_bytes"] += _remove(entry.path)
+                report["stale_files"] += 1
+                continue
+            kept.append(self._group([entry], ".txt"))
+        return kept
+
+    def _group(self, entries: list[os.DirEntry], main_suffix: str) -> tuple:
+        # (last used, bytes, paths): the file's sidecars go with it
+        stats = [entry.stat() for entry in entries]
+        main = [s for e, s in zip(entries, stats) if e.name.endswith(main_suffix)]
+        used = last_used(main[0]) if main else max(last_used(s) for s in stats)
+        return used, sum(s.st_size for s in stats), [e.path for e in entries]
+
+    def _evict(self, derived: list[tuple], now: float, report: dict):
+        """Evicts expired derived files, then the least recently used over budget."""
+        derived.sort(key=lambda group: group[0])
+        total = sum(group[1] for group in derived)
+        target = int(self.derived_max_bytes * EVICT_TO_FRACTION)
+        shrinking = False
+        evicted = 0
+        for used, size, paths in derived:
+            if self.derived_max_bytes and total > self.derived_max_bytes:
+                shrinking = True
+            expired = self.artifact_ttl and now - used > self.artifact_ttl
+            if not expired and not (shrinking and total > target):
+                break
+            for path in paths:
+                report["freed_bytes"] += _remove(path)
+            total -= size
+            evicted += 1
+        del derived[:evicted]
+        report["evicted"] = evicted
+        if evicted:
+            debug_print([f"Evicted {evicted} derived files"])
+
+
+storage_manager = StorageManager()
@@ -0,0 +1,161 @@
+import hashlib
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+from app.utils.file_ops import extract_text
+from app.utils.helpers import debug_print
+from app.utils.log import log_event
+from app.utils.metrics import TEXT_TOKENS_SAVED
+from app.utils.storage import shard_path, touch
+from app.utils.text_clean import clean_text
+
+# Bump when extraction or cleaning output changes so stale disk entries are ignored
+EXTRACTOR_VERSION = "3"
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def file_digest(file_path: str) -> str:
+    """Returns the sha256 of a file's contents, read in fixed-size chunks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class TextCache:
+    """Content-addressed cache of extracted document text.
+
+    Entries are keyed by the hash of the uploaded file, so the same bytes are
+    parsed once no matter how many artifacts are generated from them. Lookups
+    go through a bounded in-memory LRU first, then a folder of plain-text files.
+    Text is stored after clean_text, so every prompt built from it is smaller.
+    """
+
+    def __init__(self, max_entries: int = 32, max_bytes: int = 64 * 1024 * 1024):
+        self.folder = None
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.extract_options = {}
+        self.token_budget = None
+
+    def init_app(self, app):
+        self.folder = app.config["TEXT_CACHE_FOLDER"]
+        self.max_entries = app.config.get("TEXT_CACHE_MAX_ENTRIES", self.max_entries)
+        self.max_bytes = app.config.get("TEXT_CACHE_MAX_BYTES", self.max_bytes)
+        self.extract_options = {
+            "workers": app.config.get("PDF_WORKERS"),
+            "parallel_min_pages": app.config.get("PDF_PARALLEL_MIN_PAGES"),
+            "page_timeout": app.config.get("PDF_PAGE_TIMEOUT"),
+        }
+        self.token_budget = app.config.get("TEXT_TOKEN_BUDGET")
+        os.makedirs(self.folder, exist_ok=True)
+
+    def get_text(self, file_path: str, digest: str | None = None) -> str:
+        """Returns the extracted text of file_path, extracting it at most once."""
+        key = self._key(file_path, digest)
+
+        text = self._memory_get(key)
+        if text is not None:
+            return text
+
+        # Only one thread extracts a given document; the others wait for it
+        with self._key_lock(key):
+            text = self._memory_get(key)
+            if text is None:
+                text = self._disk_get(key)
+            if text is None:
+                debug_print([f"Extracting text from {os.path.basename(file_path)}"])
+                text = self._extract(file_path)
+                self._disk_put(key, text)
+            self._memory_put(key, text)
+
+        with self._lock:
+            self._key_locks.pop(key, None)
+        return text
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+
+    def _extract(self, file_path: str) -> str:
+        text, report = clean_text(
+            extract_text(file_path, **self.extract_options), self.token_budget
+        )
+        TEXT_TOKENS_SAVED.observe(report["tokens_saved"])
+        log_event("text cleaned", file=os.path.basename(file_path), **report)
+        if report["over_budget"]:
+            log_event(
+                f"Text was cut to the {self.token_budget} token budget",
+                logging.WARNING,
+                file=os.path.basename(file_path),
+                tokens_truncated=report["tokens_truncated"],
+            )
+        return text
+
+    def _key(self, file_path: str, digest: str | None) -> str:
+        ext = os.path.splitext(file_path)[1].lstrip(".").lower()
+        return f"{digest or file_digest(file_path)}-{ext}-v{EXTRACTOR_VERSION}"
+
+    def _key_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _memory_get(self, key: str) -> str | None:
+        with self._lock:
+            text = self._memory.get(key)
+            if text is not None:
+                self._memory.move_to_end(key)
+            return text
+
+    def _memory_put(self, key: str, text: str):
+        size = len(text)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return
+            self._memory[key] = text
+            self._memory_bytes += size
+            while (
+                len(self._memory) > self.max_entries
+                or self._memory_bytes > self.max_bytes
+            ):
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_bytes -= len(evicted)
+
+    def _disk_path(self, key: str) -> str | None:
+        if not self.folder:
+            return None
+        return shard_path(self.folder, key, f"{key}.txt")
+
+    def _disk_get(self, key: str) -> str | None:
+        path = self._disk_path(key)
+        if not path or not os.path.isfile(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        touch(path)
+        return text
+
+    def _disk_put(self, key: str, text: str):
+        path = self._disk_path(key)
+        if not path:
+            return
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+
+
+text_cache = TextCache()
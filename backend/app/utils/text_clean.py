@@ -0,0 +1,169 @@
+import re
+from collections import Counter
+
+from app.ai.chunking import CHARS_PER_TOKEN, estimate_tokens
+from app.utils.file_ops import PAGE_BREAK
+
+# Lines this close to the top or bottom of a page may be running headers/footers
+EDGE_LINES = 3
+# A header/footer must repeat on at least this share of pages (and 3 pages)
+REPEAT_MIN_RATIO = 0.5
+REPEAT_MIN_PAGES = 3
+
+_PAGE_NUMBER_RE = re.compile(
+    r"^(?:page|p\.|seite|página|sayfa)?\s*[-–—]?\s*\d{1,4}\s*[-–—]?"
+    r"(?:\s*(?:of|/|von|de)\s*\d{1,4})?$",
+    re.IGNORECASE,
+)
+_DIGITS_RE = re.compile(r"\d+")
+_HYPHEN_BREAK_RE = re.compile(r"(\w+)([-\u00ad])[ \t]*\n[ \t]*(\w+)")
+_HYPHENATED_RE = re.compile(r"\w+(?:-\w+)+")
+_INVISIBLE_RE = re.compile(r"[\u00ad\u200b\u200c\u200d\ufeff]")
+_SPACES_RE = re.compile(r"[ \t\u00a0\u2000-\u200a\u202f\u205f\u3000]+")
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+def _line_key(line: str) -> str:
+    # Page numbers inside a running header ("Chapter 2 - 14") must not make it unique
+    return _DIGITS_RE.sub("#", _SPACES_RE.sub(" ", line.strip().lower()))
+
+
+def _edge_indexes(lines: list[str]) -> list[int]:
+    filled = [i for i, line in enumerate(lines) if line.strip()]
+    return sorted(set(filled[:EDGE_LINES] + filled[-EDGE_LINES:]))
+
+
+def _page_number(line: str) -> int | None:
+    stripped = line.strip()
+    if _PAGE_NUMBER_RE.match(stripped):
+        return int(_DIGITS_RE.search(stripped).group())
+    return None
+
+
+def _in_sequence(numbers: list[dict], index: int, number: int) -> bool:
+    # Pages up to two away may carry the sequence on; a gap one larger allows
+    # for a blank page the extractor dropped
+    for distance in (1, 2):
+        for other, step in ((index - distance, -1), (index + distance, 1)):
+            if 0 <= other < len(numbers) and any(
+                number + step * gap in numbers[other].values()
+                for gap in (distance, distance + 1)
+            ):
+                return True
+    return False
+
+
+def strip_page_furniture(pages: list[str]) -> tuple[list[str], int]:
+    """Removes running headers, footers and page numbers from page texts.
+
+    A line counts as a header or footer when it sits in the first or last
+    EDGE_LINES lines of its page and the same line, ignoring digits, appears
+    there on enough pages. A page number line ("12", "Page 3 of 9") only
+    counts when it continues the numbers on nearby pages, so a lone figure at
+    the foot of a page is kept. Returns the cleaned pages and the lines removed.
+    """
+    page_lines = [page.split("\n") for page in pages]
+    counts = Counter()
+    numbers = []
+    for lines in page_lines:
+        edges = _edge_indexes(lines)
+        page_numbers = {i: _page_number(lines[i]) for i in edges}
+        counts.update({_line_key(lines[i]) for i in edges if page_numbers[i] is None})
+        numbers.append({i: n for i, n in page_numbers.items() if n is not None})
+    min_pages = max(REPEAT_MIN_PAGES, len(pages) * REPEAT_MIN_RATIO)
+    repeated = {key for key, count in counts.items() if count >= min_pages}
+
+    removed = 0
+    cleaned = []
+    for index, lines in enumerate(page_lines):
+        drop = {
+            i
+            for i in _edge_indexes(lines)
+            if i not in numbers[index] and _line_key(lines[i]) in repeated
+        }
+        drop.update(
+            i for i, n in numbers[index].items() if _in_sequence(numbers, index, n)
+        )
+        removed += len(drop)
+        cleaned.append("\n".join(l for i, l in enumerate(lines) if i not in drop))
+    return cleaned, removed
+
+
+def join_hyphenated(text: str) -> str:
+    """Rejoins words broken across lines with a hyphen.
+
+    "inter-\nnational" becomes "international", but a hyphen is kept when
+    either part is not lowercase ("Anglo-\nSaxon") or the hyphenated word
+    is written that way elsewhere in the text ("self-\nesteem"). Soft
+    hyphens only ever mark a break, so those words are always joined.
+    """
+    hyphenated = {word.lower() for word in _HYPHENATED_RE.findall(text)}
+
+    def join(match: re.Match) -> str:
+        before, hyphen, after = match.groups()
+        if hyphen == "\u00ad" or (
+            before.islower()
+            and after.islower()
+            and f"{before}-{after}" not in hyphenated
+        ):
+            return before + after
+        return f"{before}-{after}"
+
+    return _HYPHEN_BREAK_RE.sub(join, text)
+
+
+def normalize_whitespace(text: str) -> str:
+    text = _INVISIBLE_RE.sub("", text)
+    text = text.replace("\r\n", "\n").replace("\r", "\n")
+    lines = [_SPACES_RE.sub(" ", line).strip() for line in text.split("\n")]
+    return _BLANK_LINES_RE.sub("\n\n", "\n".join(lines)).strip()
+
+
+def truncate_to_budget(text: str, token_budget: int) -> str:
+    """Cuts text to token_budget tokens, at a paragraph or word break if one is near."""
+    limit = token_budget * CHARS_PER_TOKEN
+    if len(text) <= limit:
+        return text
+    head = text[:limit]
+    for separator in ("\n\n", "\n", " "):
+        cut = head.rfind(separator)
+        # Not so far back that most of the budget goes unused
+        if cut >= limit * 0.9:
+            return head[:cut].rstrip()
+    return head
+
+
+def clean_text(text: str, token_budget: int | None = None) -> tuple[str, dict]:
+    """Shrinks extracted text before it is put into prompts.
+
+    Drops repeated page headers/footers and page numbers (for text with
+    PAGE_BREAK-separated pages), joins words hyphenated across line breaks and
+    collapses whitespace. Text still over token_budget is cut to it. Returns
+    the text and a report of what was saved and whether it had to be cut.
+    """
+    tokens_before = estimate_tokens(text)
+    pages = text.split(PAGE_BREAK)
+    removed = 0
+    if len(pages) >= REPEAT_MIN_PAGES:
+        pages, removed = strip_page_furniture(pages)
+    text = "\n\n".join(pages)
+
+    text = join_hyphenated(text)
+    text = normalize_whitespace(text)
+
+    tokens_cleaned = estimate_tokens(text)
+    over_budget = bool(token_budget) and tokens_cleaned > token_budget
+    if over_budget:
+        text = truncate_to_budget(text, token_budget)
+    tokens_after = estimate_tokens(text)
+    report = {
+        "pages": len(pages),
+        "furniture_lines_removed": removed,
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": tokens_before - tokens_after,
+        "token_budget": token_budget,
+        "over_budget": over_budget,
+        "tokens_truncated": tokens_cleaned - tokens_after,
+    }
+    return text, report
@@ -0,0 +1,83 @@
+import hashlib
+import json
+import re
+import time
+from typing import Any, Iterator
+
+from langchain_core.language_models.chat_models import SimpleChatModel
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGenerationChunk
+
+WORDS = (
+    "cell energy membrane protein enzyme reaction history empire treaty war "
+    "revolution republic market price demand supply theory law force mass"
+).split()
+
+
+class FakeChatModel(SimpleChatModel):
+    """Deterministic offline stand-in for ChatOllama.
+
+    The reply depends only on the prompt: flashcard prompts get a JSON array
+    with the requested number of cards, everything else gets a markdown study
+    guide about a tenth of the prompt's length. tokens_per_second simulates
+    generation speed; 0 returns instantly so only our own overhead is timed.
+    """
+
+    model: str = "fake"
+    temperature: float = 0.0
+    tokens_per_second: float = 0.0
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat-model"
+
+    def respond(self, prompt: str) -> str:
+        seed = int(hashlib.sha256(prompt.encode()).hexdigest()[:8], 16)
+        words = [WORDS[(seed + i * 7) % len(WORDS)] for i in range(len(WORDS) * 4)]
+
+        if "flashcards" in prompt and "question" in prompt:
+            match = re.search(r"exactly (\d+) flashcards", prompt)
+            count = int(match.group(1)) if match else 10
+            cards = [
+                {
+                    "question": f"What does {words[i]} {words[i + 3]} mean in part {seed % 97}-{i}?",
+                    "answer": f"{words[i + 1]} {words[i + 2]}",
+                }
+                for i in range(count)
+            ]
+            return "```json\n" + json.dumps(cards, indent=2) + "\n```"
+
+        length = max(40, len(prompt) // 40)
+        lines = ["# Study guide", ""]
+        for i in range(0, length, 8):
+            lines.append(f"- {' '.join(words[(i + j) % len(words)] for j in range(8))}")
+        return "\n".join(lines)
+
+    def _call(self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs):
+        response = self.respond(_prompt_text(messages))
+        self._simulate(len(response) / 4)
+        return response
+
+    def _stream(
+        self, messages: list[BaseMessage], stop=None, run_manager=None, **kwargs: Any
+    ) -> Iterator[ChatGenerationChunk]:
+        response = self.respond(_prompt_text(messages))
+        if self.latency:
+            time.sleep(self.latency)
+        for i in range(0, len(response), 16):
+            piece = response[i : i + 16]
+            if self.tokens_per_second:
+                time.sleep(len(piece) / 4 / self.tokens_per_second)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+
+    def _simulate(self, tokens: float):
+        delay = self.latency
+        if self.tokens_per_second:
+            delay += tokens / self.tokens_per_second
+        if delay:
+            time.sleep(delay)
+
+
+def _prompt_text(messages: list[BaseMessage]) -> str:
+    return "\n".join(str(message.content) for message in messages)
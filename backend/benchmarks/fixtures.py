@@ -0,0 +1,99 @@
+import os
+import random
+
+SIZES = {"small": 5, "medium": 40, "large": 300}
+LINES_PER_PAGE = 40
+
+VOCABULARY = (
+    "the cell membrane controls which molecules enter and leave while enzymes "
+    "speed up reactions inside the cytoplasm during the revolution the republic "
+    "signed a treaty that ended the war and reshaped the empire markets balance "
+    "supply and demand through prices a force changes the motion of a mass"
+).split()
+
+
+def page_lines(rng: random.Random, page: int) -> list[str]:
+    # Running header and footer on every page, like real textbooks
+    lines = ["Introduction to Biology - Chapter 3"]
+    if page % 6 == 0:
+        lines.append(f"{page // 6 + 1}.1 Section {page // 6 + 1}")
+    for _ in range(LINES_PER_PAGE):
+        lines.append(" ".join(rng.choice(VOCABULARY) for _ in range(12)) + ".")
+    lines.append(f"Page {page + 1}")
+    return lines
+
+
+def make_pages(page_count: int, seed: int = 0) -> list[list[str]]:
+    rng = random.Random(seed)
+    return [page_lines(rng, page) for page in range(page_count)]
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: list[list[str]]):
+    """Writes a minimal text-only PDF with one content stream per page."""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "",  # page tree, filled in once page object numbers are known
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for lines in pages:
+        body = " ".join(f"({_pdf_escape(line)}) Tj 0 -16 Td" for line in lines)
+        stream = f"BT /F1 10 Tf 40 780 Td {body} ET"
+        kids.append(len(objects) + 1)
+        objects.append(
+            "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects) + 2} 0 R >>"
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects[1] = (
+        f"<< /Type /Pages /Kids [{' '.join(f'{k} 0 R' for k in kids)}] "
+        f"/Count {len(kids)} >>"
+    )
+
+    out = "%PDF-1.4\n"
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(out.encode("latin-1")))
+        out += f"{number} 0 obj\n{obj}\nendobj\n"
+    xref = len(out.encode("latin-1"))
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n"
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    with open(path, "wb") as f:
+        f.write(out.encode("latin-1"))
+
+
+def write_docx(path: str, pages: list[list[str]]):
+    import docx
+
+    document = docx.Document()
+    for lines in pages:
+        for line in lines:
+            document.add_paragraph(line)
+    document.save(path)
+
+
+def write_txt(path: str, pages: list[list[str]]):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join("\n".join(lines) for lines in pages))
+
+
+WRITERS = {"pdf": write_pdf, "docx": write_docx, "txt": write_txt}
+
+
+def build_corpus(folder: str, sizes: dict = SIZES) -> dict:
+    """Generates (or reuses) one fixture per format and size; returns {(fmt, size): path}."""
+    os.makedirs(folder, exist_ok=True)
+    corpus = {}
+    for size, page_count in sizes.items():
+        pages = make_pages(page_count)
+        for fmt, writer in WRITERS.items():
+            path = os.path.join(folder, f"{size}.{fmt}")
+            if not os.path.exists(path):
+                writer(path, pages)
+            corpus[(fmt, size)] = path
+    return corpus
@@ -0,0 +1,309 @@
+"""Stage-level microbenchmarks for the backend pipeline.
+
+Run from backend/:
+
+    python -m benchmarks.run                      # all stages, saves results
+    python -m benchmarks.run --stages extraction  # a subset
+    python -m benchmarks.run --compare benchmarks/results/<earlier>.json
+
+The startup stage times a fresh interpreter running create_app(); see
+benchmarks.startup for the per-package import-time breakdown.
+
+Everything runs offline: the LLM is benchmarks.fake_llm.FakeChatModel and the
+database is a throwaway SQLite file.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_FOLDER = os.path.join(HERE, ".fixtures")
+RESULTS_FOLDER = os.path.join(HERE, "results")
+# A slower median than this (relative) is reported as a regression
+REGRESSION_THRESHOLD = 0.10
+
+
+def measure(fn, repeat: int = 5, warmup: int = 1) -> dict:
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "median_ms": round(statistics.median(timings), 3),
+        "min_ms": round(timings[0], 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        "runs": repeat,
+    }
+
+
+def bench_extraction(corpus: dict, repeat: int) -> dict:
+    from app.utils.file_ops import extract_text
+
+    results = {}
+    for (fmt, size), path in sorted(corpus.items()):
+        results[f"{fmt}/{size}"] = measure(lambda: extract_text(path), repeat)
+        if fmt == "pdf":
+            results[f"{fmt}/{size}/serial"] = measure(
+                lambda: extract_text(path, workers=1), repeat
+            )
+    return results
+
+
+def bench_prompts(texts: dict, repeat: int) -> dict:
+    from app.ai.chunking import chunk_text
+    from app.ai import summarizer, flashcards
+
+    results = {}
+    for size, text in texts.items():
+
+        def build_summary_prompts():
+            chunks = chunk_text(
+                text, summarizer.SUMMARY_CHUNK_TOKENS, summarizer.SUMMARY_CHUNK_OVERLAP
+            )
+            for i, chunk in enumerate(chunks):
+                summarizer.CHUNK_PROMPT.format(
+                    text=chunk, part=i + 1, total=len(chunks)
+                )
+
+        def build_flashcard_prompts():
+            for chunk in chunk_text(text, flashcards.FLASHCARD_CHUNK_TOKENS):
+                flashcards.FLASHCARD_PROMPT.format(text=chunk, count=12)
+
+        results[f"summary/{size}"] = measure(build_summary_prompts, repeat)
+        results[f"flashcards/{size}"] = measure(build_flashcard_prompts, repeat)
+    return results
+
+
+def bench_llm(texts: dict, repeat: int) -> dict:
+    from app.ai import summarizer, flashcards
+
+    results = {}
+    for size, text in texts.items():
+        results[f"summary/{size}"] = measure(
+            lambda: summarizer.summarize_text(text), repeat
+        )
+        results[f"flashcards/{size}"] = measure(
+            lambda: flashcards.generate_flashcards(text), repeat
+        )
+    return results
+
+
+def bench_parsing(repeat: int) -> dict:
+    from app.ai.flashcards import parse_flashcards
+    from app.ai.dedup import dedupe
+    from benchmarks.fake_llm import FakeChatModel
+
+    model = FakeChatModel()
+    prompt = "Generate flashcards with question and answer, exactly 60 flashcards"
+    output = model.respond(prompt)
+    truncated = output[: int(len(output) * 0.8)]
+    cards = parse_flashcards(output) * 5
+
+    return {
+        "flashcards/valid": measure(lambda: parse_flashcards(output), repeat * 20),
+        "flashcards/truncated": measure(
+            lambda: parse_flashcards(truncated), repeat * 20
+        ),
+        "dedupe/300": measure(
+            lambda: dedupe(cards, key=lambda card: card["question"]), repeat
+        ),
+    }
+
+
+def bench_db(repeat: int) -> dict:
+    import app.db.db as db
+    import app.db.db_funcs as db_funcs
+    import app.db.schemas as schemas
+
+    counter = iter(range(10**9))
+
+    def add_user():
+        db_funcs.add_user(schemas.User(username=f"bench-{next(counter)}", password="x"))
+
+    user = db_funcs.add_user(schemas.User(username="bench-owner", password="x"))
+
+    def add_documents():
+        with db.transaction():
+            for _ in range(100):
+                uid = f"doc-{next(counter)}"
+                db_funcs.upload_document(
+                    schemas.Document(
+                        uid=uid, user_id=user.id, original_name="n.pdf", file_type="pdf"
+                    )
+                )
+                db_funcs.add_summary(schemas.Summary(document_uid=uid, content="s"))
+
+    add_documents()
+    return {
+        "add_user": measure(add_user, repeat * 20),
+        "get_user_by_username": measure(
+            lambda: db_funcs.get_user_by_username("bench-owner"), repeat * 20
+        ),
+        "add_100_documents_tx": measure(add_documents, repeat),
+        "list_documents_page": measure(
+            lambda: db_funcs.list_documents(user.id, 20), repeat * 20
+        ),
+    }
+
+
+def bench_backends(repeat: int) -> dict:
+    """A burst of concurrent calls through the backend pool against stub servers."""
+    from concurrent.futures import ThreadPoolExecutor
+    from app.ai import llm
+    from benchmarks.stub_ollama import StubOllama
+
+    stubs = [StubOllama(tokens_per_second=2000).start() for _ in range(2)]
+    previous_pool, previous_factory = llm._pool, llm._factory
+    prompt = "Write a study guide. " + "The cell membrane controls transport. " * 200
+
+    def burst(calls: int):
+        model = llm.get_llm()
+        with ThreadPoolExecutor(max_workers=calls) as pool:
+            list(pool.map(lambda _: model.invoke(prompt), range(calls)))
+
+    try:
+        llm.set_pool(llm.build_pool([s.url for s in stubs], max_inflight=2))
+        llm.set_llm_factory(llm.pooled_factory)
+        results = {
+            "burst_4": measure(lambda: burst(4), repeat),
+            "burst_16": measure(lambda: burst(16), repeat),
+        }
+    finally:
+        for stub in stubs:
+            stub.stop()
+        # Later stages must not reach the stopped stubs
+        llm.set_pool(previous_pool)
+        llm.set_llm_factory(previous_factory)
+    for stub in stubs:
+        print(
+            f"  {stub.url}: {stub.requests} requests, peak {stub.peak_inflight} in flight",
+            file=sys.stderr,
+        )
+    return results
+
+
+def bench_startup(repeat: int) -> dict:
+    from benchmarks.startup import CREATE_APP, FIRST_LLM_USE, run_python
+
+    return {
+        "create_app": measure(lambda: run_python(CREATE_APP), repeat),
+        "first_llm_use": measure(lambda: run_python(FIRST_LLM_USE), repeat),
+    }
+
+
+def install_fake_llm(tokens_per_second: float):
+    from benchmarks.fake_llm import FakeChatModel
+    from app.ai.llm import set_llm_factory
+
+    set_llm_factory(
+        lambda model, temperature: FakeChatModel(tokens_per_second=tokens_per_second)
+    )
+
+
+def compare(previous: dict, current: dict) -> list[str]:
+    """Lines describing how each benchmark moved between two result files."""
+    lines = []
+    for stage, benches in current["results"].items():
+        for name, stats in benches.items():
+            before = previous["results"].get(stage, {}).get(name)
+            if not before:
+                continue
+            change = (stats["median_ms"] - before["median_ms"]) / max(
+                before["median_ms"], 1e-9
+            )
+            flag = "REGRESSION" if change > REGRESSION_THRESHOLD else ""
+            lines.append(
+                f"{stage:<12} {name:<28} {before['median_ms']:>10.3f} -> "
+                f"{stats['median_ms']:>10.3f} ms {change:+7.1%} {flag}"
+            )
+    return lines
+
+
+STAGES = ("extraction", "prompts", "llm", "parsing", "db", "backends", "startup")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--tokens-per-second",
+        type=float,
+        default=0.0,
+        help="simulated LLM speed; 0 measures pipeline overhead only",
+    )
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    parser.add_argument("--output", help="where to save results (default: results/)")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    os.environ["DB_PATH"] = os.path.join(workdir, "bench.db")
+
+    from benchmarks.fixtures import build_corpus
+    from app.utils.file_ops import extract_text, shutdown_pool
+
+    corpus = build_corpus(FIXTURES_FOLDER)
+    texts = {
+        size: extract_text(path) for (fmt, size), path in corpus.items() if fmt == "txt"
+    }
+    install_fake_llm(args.tokens_per_second)
+
+    results = {}
+    for stage in args.stages:
+        print(f"Running {stage}...", file=sys.stderr)
+        if stage == "extraction":
+            results[stage] = bench_extraction(corpus, args.repeat)
+        elif stage == "prompts":
+            results[stage] = bench_prompts(texts, args.repeat)
+        elif stage == "llm":
+            results[stage] = bench_llm(texts, args.repeat)
+        elif stage == "parsing":
+            results[stage] = bench_parsing(args.repeat)
+        elif stage == "db":
+            results[stage] = bench_db(args.repeat)
+        elif stage == "backends":
+            results[stage] = bench_backends(args.repeat)
+        elif stage == "startup":
+            results[stage] = bench_startup(args.repeat)
+    shutdown_pool()
+
+    report = {
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "tokens_per_second": args.tokens_per_second,
+        "results": results,
+    }
+
+    output = args.output or os.path.join(
+        RESULTS_FOLDER, f"{datetime.now():%Y-%m-%d_%H-%M-%S}.json"
+    )
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Saved results to {output}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            previous = json.load(f)
+        lines = compare(previous, report)
+        print("\n".join(lines))
+        return 1 if any(line.endswith("REGRESSION") for line in lines) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
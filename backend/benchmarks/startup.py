@@ -0,0 +1,80 @@
+"""Import-time report for application startup.
+
+Run from backend/:
+
+    python -m benchmarks.startup             # top modules by cumulative import time
+    python -m benchmarks.startup --top 40
+
+Every run starts a fresh interpreter with `python -X importtime`, so the
+numbers are what a new worker process pays before it can serve a request.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+BACKEND_FOLDER = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CREATE_APP = "from app import create_app; create_app()"
+# First LLM request: what the lazy imports defer until a model is needed
+FIRST_LLM_USE = CREATE_APP + (
+    "; from app.ai.llm import get_chain"
+    "; from app.ai.summarizer import SUMMARY_PROMPT"
+    "; get_chain(SUMMARY_PROMPT)"
+)
+
+
+def run_python(statement: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, "-c", statement],
+        cwd=BACKEND_FOLDER,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def import_times(statement: str = CREATE_APP) -> list[tuple[str, int, int]]:
+    """(module, self_us, cumulative_us) for every module imported by statement."""
+    stderr = run_python(statement, "-X", "importtime").stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            continue  # the header line
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+def report(statement: str, top: int) -> str:
+    modules = import_times(statement)
+    total_us = sum(self_us for _, self_us, _ in modules)
+    packages = {}
+    for name, self_us, _ in modules:
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us
+
+    lines = [f"{len(modules)} modules, {total_us / 1000:.1f} ms total import time"]
+    lines.append("\nBy package (self time):")
+    for package, us in sorted(packages.items(), key=lambda p: -p[1])[:top]:
+        lines.append(f"  {us / 1000:>9.1f} ms  {package}")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    print("create_app()")
+    print(report(CREATE_APP, args.top))
+    print("\ncreate_app() + first LLM use")
+    print(report(FIRST_LLM_USE, args.top))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
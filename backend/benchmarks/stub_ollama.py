@@ -0,0 +1,166 @@
+"""Local stand-in for an Ollama server, for exercising the LLM backend pool.
+
+Run from backend/:
+
+    python -m benchmarks.stub_ollama --port 11500 --tokens-per-second 200
+
+It answers POST /api/chat (streamed NDJSON or a single JSON reply) with the
+deterministic text of benchmarks.fake_llm. Like a real model server, its
+throughput is shared: with n requests in flight each one generates at
+tokens_per_second / n, so overloading it slows every request down.
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.fake_llm import FakeChatModel
+
+CHUNK_CHARS = 16
+
+
+class StubOllama:
+    def __init__(
+        self,
+        port: int = 0,
+        tokens_per_second: float = 0.0,
+        latency: float = 0.0,
+    ):
+        self.tokens_per_second = tokens_per_second
+        self.latency = latency
+        self.inflight = 0
+        self.peak_inflight = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._model = FakeChatModel()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubOllama":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _enter(self):
+        with self._lock:
+            self.inflight += 1
+            self.requests += 1
+            self.peak_inflight = max(self.peak_inflight, self.inflight)
+
+    def _exit(self):
+        with self._lock:
+            self.inflight -= 1
+
+    def _delay(self, chars: int):
+        if self.tokens_per_second > 0:
+            with self._lock:
+                share = self.tokens_per_second / max(1, self.inflight)
+            time.sleep(chars / 4 / share)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                if self.path != "/api/chat":
+                    self.send_error(404)
+                    return
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                prompt = "\n".join(m.get("content", "") for m in body["messages"])
+                stub._enter()
+                try:
+                    time.sleep(stub.latency)
+                    reply = stub._model.respond(prompt)
+                    if body.get("stream", True):
+                        self._stream(body["model"], prompt, reply)
+                    else:
+                        stub._delay(len(reply))
+                        self._send_json(
+                            _message(body["model"], reply, prompt, reply, done=True)
+                        )
+                finally:
+                    stub._exit()
+
+            def _stream(self, model: str, prompt: str, reply: str):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for i in range(0, len(reply), CHUNK_CHARS):
+                    piece = reply[i : i + CHUNK_CHARS]
+                    stub._delay(len(piece))
+                    self._chunk(_message(model, piece))
+                self._chunk(_message(model, "", prompt, reply, done=True))
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _chunk(self, data: dict):
+                line = (json.dumps(data) + "\n").encode()
+                self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+                self.wfile.flush()
+
+            def _send_json(self, data: dict):
+                payload = json.dumps(data).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
+
+
+def _message(
+    model: str, content: str, prompt: str = "", reply: str = "", done: bool = False
+) -> dict:
+    data = {
+        "model": model,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "message": {"role": "assistant", "content": content},
+        "done": done,
+    }
+    if done:
+        data.update(
+            done_reason="stop",
+            prompt_eval_count=len(prompt) // 4,
+            eval_count=len(reply) // 4,
+        )
+    return data
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    stub = StubOllama(args.port, args.tokens_per_second, args.latency)
+    print(f"Stub Ollama listening on {stub.url}")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,24 +1,82 @@
-from app import create_app
-from app.utils.helpers import debug_print
+"""Backend entry point.
+
+    python run.py            # gunicorn: WEB_WORKERS processes x WEB_THREADS threads
+    python run.py --dev      # Flask development server with the reloader
+
+Uploads, summaries, flashcards and caches are kept across restarts.
+"""
+
+import argparse
 import os
 
-app = create_app()
+from app.utils.helpers import debug_print
+
+WEB_BIND = os.environ.get("WEB_BIND", "0.0.0.0:5000")
+WEB_WORKERS = int(os.environ.get("WEB_WORKERS", os.cpu_count() or 1))
+WEB_THREADS = int(os.environ.get("WEB_THREADS", 8))
+# Worker silence (seconds) before gunicorn restarts it, and how long a stopping
+# worker may spend finishing in-flight requests and background generations
+WEB_TIMEOUT = int(os.environ.get("WEB_TIMEOUT", 120))
+WEB_GRACEFUL_TIMEOUT = int(os.environ.get("WEB_GRACEFUL_TIMEOUT", 300))
+
+
+def worker_exit(server, worker):
+    """Runs in each worker after it stops accepting requests."""
+    from app.utils import log
+    from app.utils.file_ops import shutdown_pool
+    from app.utils.jobs import jobs
+    from app.utils.storage_manager import storage_manager
+
+    debug_print([f"Worker {worker.pid} draining background jobs"])
+    jobs.shutdown(wait=True)
+    storage_manager.shutdown()
+    shutdown_pool()
+    debug_print([f"Worker {worker.pid} stopped"])
+    log.shutdown()
+
+
+def serve(bind: str, workers: int, threads: int):
+    from gunicorn.app.base import BaseApplication
+
+    class Server(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", bind)
+            self.cfg.set("workers", workers)
+            self.cfg.set("threads", threads)
+            self.cfg.set("worker_class", "gthread")
+            # Build the app once in the master; workers fork with it imported
+            self.cfg.set("preload_app", True)
+            self.cfg.set("timeout", WEB_TIMEOUT)
+            self.cfg.set("graceful_timeout", WEB_GRACEFUL_TIMEOUT)
+            self.cfg.set("worker_exit", worker_exit)
+
+        def load(self):
+            from app import create_app
+
+            return create_app()
+
+    debug_print([f"Serving on {bind} with {workers} workers x {threads} threads"])
+    Server().run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the backend server")
+    parser.add_argument("--dev", action="store_true", help="Flask dev server")
+    parser.add_argument("--bind", default=WEB_BIND)
+    parser.add_argument("--workers", type=int, default=WEB_WORKERS)
+    parser.add_argument("--threads", type=int, default=WEB_THREADS)
+    args = parser.parse_args()
+
+    if args.dev:
+        from app import create_app
+
+        host, _, port = args.bind.rpartition(":")
+        create_app().run(debug=True, host=host or "0.0.0.0", port=int(port))
+        debug_print(["Flask app stopped"])
+        return
+
+    serve(args.bind, args.workers, args.threads)
+
 
 if __name__ == "__main__":
-    app.run(debug=True, host="0.0.0.0", port=5000)
-    debug_print(["Flask app stopped"])
-    debug_print(["Removing uploaded files"])
-    for f in os.listdir(app.config["UPLOAD_FOLDER"]):
-        os.remove(os.path.join(app.config["UPLOAD_FOLDER"], f))
-    debug_print(["Uploaded files removed"])
-    debug_print(["Removing summary files"])
-    for f in os.listdir(app.config["SUMMARY_FOLDER"]):
-        os.remove(os.path.join(app.config["SUMMARY_FOLDER"], f))
-    debug_print(["Summary files removed"])
-    debug_print(["Removing flashcard files"])
-    for f in os.listdir(app.config["FLASHCARDS_FOLDER"]):
-        os.remove(os.path.join(app.config["FLASHCARDS_FOLDER"], f))
-    debug_print(["Flashcard files removed"])
-    debug_print(["Exiting program"])
-    debug_print(["Goodbye!"])
-    exit(0)
+    main()
@@ -0,0 +1,13 @@
+import pytest
+
+import app.db.db as db
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """A fresh SQLite database for the test, with the app's schema."""
+    monkeypatch.setattr(db, "DB_PATH", tmp_path / "data.db")
+    db._reset_after_fork()
+    db.init_db()
+    yield db
+    db._reset_after_fork()
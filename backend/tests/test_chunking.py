@@ -0,0 +1,89 @@
+import pytest
+
+from app.ai.chunking import (
+    chunk_blocks,
+    chunk_text,
+    estimate_tokens,
+    pack_blocks,
+    split_blocks,
+)
+
+
+def paragraphs(count: int, words: int = 30) -> str:
+    return "\n\n".join(
+        " ".join(f"p{i}w{j}" for j in range(words)) + "." for i in range(count)
+    )
+
+
+def test_split_blocks_breaks_on_blank_lines_and_headings():
+    text = "Intro line one\nline two\n\nCHAPTER 1\nBody text.\n2.1 Membranes\nMore."
+    assert split_blocks(text) == [
+        "Intro line one\nline two",
+        "CHAPTER 1\nBody text.",
+        "2.1 Membranes\nMore.",
+    ]
+
+
+def test_oversized_block_is_split_on_sentences_then_characters():
+    sentences = " ".join(f"Sentence number {i} is here." for i in range(40))
+    blocks = chunk_blocks(sentences, 50)
+    assert len(blocks) > 1
+    assert all(estimate_tokens(block) <= 50 for block in blocks)
+    assert " ".join(blocks) == sentences
+
+    unbroken = "x" * 1000
+    assert chunk_blocks(unbroken, 50) == [
+        unbroken[i : i + 200] for i in range(0, 1000, 200)
+    ]
+
+
+@pytest.mark.parametrize("chunk_tokens", [60, 100, 250])
+def test_chunks_fit_and_keep_every_paragraph_in_order(chunk_tokens):
+    text = paragraphs(20)
+    chunks = chunk_text(text, chunk_tokens)
+    # Blocks are joined with a blank line, which the block estimates leave out
+    assert all(estimate_tokens(chunk) <= chunk_tokens + 2 * 20 for chunk in chunks)
+    assert "\n\n".join(chunks) == text
+
+
+def test_overlap_repeats_the_tail_of_the_previous_chunk():
+    # Paragraphs of about 15 tokens, so whole ones fit in the overlap
+    blocks = chunk_blocks(paragraphs(30, 10), 120, 40)
+    ranges = pack_blocks(blocks, 120, 40)
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(blocks)
+    tokens = [estimate_tokens(block) for block in blocks]
+    for (start, end), (next_start, next_end) in zip(ranges, ranges[1:]):
+        # Starts inside the previous chunk, but never at its start
+        assert start < next_start <= end < next_end
+        assert 0 < sum(tokens[next_start:end]) <= 40
+        assert sum(tokens[next_start:next_end]) <= 120
+
+
+def test_no_overlap_uses_every_block_once():
+    blocks = chunk_blocks(paragraphs(12), 120)
+    ranges = pack_blocks(blocks, 120)
+    assert [b for start, end in ranges for b in range(start, end)] == list(
+        range(len(blocks))
+    )
+
+
+def test_overlap_is_capped_at_half_a_chunk():
+    blocks = chunk_blocks(paragraphs(12), 120, 500)
+    tokens = [estimate_tokens(block) for block in blocks]
+    ranges = pack_blocks(blocks, 120, 500)
+    for (_, end), (next_start, _) in zip(ranges, ranges[1:]):
+        assert sum(tokens[next_start:end]) <= 60
+
+
+def test_anchored_runs_stay_one_chunk():
+    blocks = chunk_blocks(paragraphs(12), 120)
+    ranges = pack_blocks(blocks, 120, anchors={5: 7})
+    assert (5, 7) in ranges
+    assert [b for start, end in ranges for b in range(start, end)] == list(
+        range(len(blocks))
+    )
+
+
+def test_empty_text_has_no_chunks():
+    assert chunk_text("", 100) == []
+    assert chunk_text("\n\n  \n", 100) == []
@@ -0,0 +1,64 @@
+import pytest
+
+from app.ai.dedup import (
+    NUM_PERM,
+    NearDuplicateIndex,
+    dedupe,
+    minhash,
+    shingles,
+    similarity,
+)
+
+
+def jaccard(a: set, b: set) -> float:
+    return len(a & b) / len(a | b)
+
+
+def test_shingles_normalize_case_and_punctuation():
+    assert shingles("What is the Cell?") == {"what is", "is the", "the cell"}
+    assert shingles("Mitosis") == {"mitosis"}
+    assert shingles("") == set()
+
+
+def test_signatures_are_deterministic():
+    features = shingles("what does the mitochondria produce")
+    assert minhash(features) == minhash(set(features))
+    assert len(minhash(features)) == NUM_PERM
+    assert similarity(minhash(features), minhash(features)) == 1.0
+
+
+def test_similarity_estimates_jaccard():
+    a = shingles(" ".join(f"word{i}" for i in range(60)))
+    b = shingles(" ".join(f"word{i}" for i in range(20, 80)))
+    estimate = similarity(minhash(a), minhash(b))
+    assert abs(estimate - jaccard(a, b)) < 0.15
+
+
+def test_near_duplicates_are_dropped():
+    index = NearDuplicateIndex(threshold=0.6)
+    assert index.add("What is the function of the cell membrane in animal cells?")
+    assert not index.add("What is the function of the cell membrane in animal cells")
+    assert not index.add("what is the FUNCTION of the cell membrane in animal cells?")
+    assert index.add("Which organelle produces most of the cell's energy?")
+
+
+@pytest.mark.parametrize(
+    "threshold, kept",
+    [(0.6, 1), (0.95, 2)],
+)
+def test_threshold_decides_borderline_pairs(threshold, kept):
+    base = " ".join(f"term{i}" for i in range(40))
+    # About 0.8 Jaccard similarity: a duplicate at 0.6, not at 0.95
+    variant = " ".join(f"term{i}" for i in range(4, 44))
+    assert len(dedupe([base, variant], key=str, threshold=threshold)) == kept
+
+
+def test_dedupe_keeps_first_of_each_group_in_order():
+    cards = [
+        {"question": "Define osmosis."},
+        {"question": "Define diffusion across a membrane."},
+        {"question": "define osmosis"},
+        {"question": "Define diffusion across a membrane!"},
+    ]
+    kept = dedupe(cards, key=lambda card: card["question"])
+    assert kept == cards[:2]
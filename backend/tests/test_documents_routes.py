@@ -0,0 +1,60 @@
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+
+import app.db.db_funcs as db_funcs
+import app.db.schemas as schemas
+from app.routes.documents_routes import documents_bp
+from app.utils.helpers import encode_cursor
+
+
+@pytest.fixture
+def client(database):
+    app = Flask(__name__)
+    app.config["JWT_SECRET_KEY"] = "test-secret-key-long-enough-for-hs256"
+    app.config["JWT_TOKEN_LOCATION"] = ["cookies"]
+    app.config["JWT_COOKIE_CSRF_PROTECT"] = False
+    JWTManager(app)
+    app.register_blueprint(documents_bp)
+
+    user = db_funcs.add_user(schemas.User(username="reader", password="x"))
+    db_funcs.upload_document(
+        schemas.Document(
+            uid="doc1", user_id=user.id, original_name="notes.pdf", file_type="pdf"
+        )
+    )
+    for i in range(3):
+        db_funcs.add_summary(
+            schemas.Summary(document_uid="doc1", content=f"summary {i}")
+        )
+
+    client = app.test_client()
+    with app.app_context():
+        client.set_cookie("access_token_cookie", create_access_token(str(user.id)))
+    return client
+
+
+def test_artifact_pages_follow_the_cursor(client):
+    first = client.get("/documents/doc1/summaries?limit=2").get_json()
+    assert [s["content"] for s in first["summaries"]] == ["summary 2", "summary 1"]
+
+    rest = client.get(
+        f"/documents/doc1/summaries?limit=2&cursor={first['next_cursor']}"
+    ).get_json()
+    assert [s["content"] for s in rest["summaries"]] == ["summary 0"]
+    assert rest["next_cursor"] is None
+
+
+@pytest.mark.parametrize("value", [2**63, 2**100, -(2**63) - 1, -1, 0, True, "7"])
+def test_out_of_range_artifact_cursor_is_rejected(client, value):
+    response = client.get(f"/documents/doc1/summaries?cursor={encode_cursor(value)}")
+    assert response.status_code == 400
+    assert response.get_json() == {"error": "Invalid cursor"}
+
+
+def test_largest_row_id_cursor_is_accepted(client):
+    response = client.get(
+        f"/documents/doc1/summaries?cursor={encode_cursor(2**63 - 1)}"
+    )
+    assert response.status_code == 200
+    assert len(response.get_json()["summaries"]) == 3
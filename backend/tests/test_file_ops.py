@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+from PyPDF2 import PdfWriter
+
+import app.utils.file_ops as file_ops
+
+
+def hang_first_range(file_path: str, start: int, stop: int, page_timeout: float):
+    """Stands in for _extract_page_range in a pool worker; page 0 never returns."""
+    if start == 0:
+        time.sleep(60)
+    return [f"page {i}" for i in range(start, stop)]
+
+
+@pytest.fixture(autouse=True)
+def fresh_pool():
+    file_ops.shutdown_pool()
+    yield
+    file_ops.shutdown_pool()
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    writer = PdfWriter()
+    for _ in range(2):
+        writer.add_blank_page(width=200, height=200)
+    path = tmp_path / "blank.pdf"
+    with open(path, "wb") as f:
+        writer.write(f)
+    return str(path)
+
+
+def test_hung_range_is_cut_off_by_one_deadline(monkeypatch):
+    monkeypatch.setattr(file_ops, "_extract_page_range", hang_first_range)
+    started = time.monotonic()
+    pages = file_ops._extract_pages_pooled("unused.pdf", 4, 2, 4, 0.25)
+
+    assert pages == ["", "page 1", "page 2", "page 3"]
+    assert time.monotonic() - started < 10
+    # The stuck worker went with the pool; the next document gets a fresh one
+    assert file_ops._pool is None
+
+
+def test_off_main_thread_small_pdfs_run_in_the_pool(monkeypatch, pdf):
+    monkeypatch.setattr(file_ops, "_extract_page_range", hang_first_range)
+    result = {}
+    thread = threading.Thread(
+        target=lambda: result.update(
+            text=file_ops.extract_text_from_pdf(pdf, workers=1, page_timeout=0.25)
+        )
+    )
+    thread.start()
+    thread.join(20)
+
+    # The document is one range in the worker: it hangs, is given up on at the
+    # deadline and its worker killed, rather than hanging this thread forever
+    assert result == {"text": ""}
+    assert file_ops._pool is None
+
+
+def test_main_thread_small_pdfs_run_in_process(monkeypatch, pdf):
+    monkeypatch.setattr(file_ops, "_extract_page_range", hang_first_range)
+    assert file_ops.extract_text_from_pdf(pdf, workers=1, page_timeout=0.25) == ""
+    assert file_ops._pool is None
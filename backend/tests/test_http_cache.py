@@ -0,0 +1,150 @@
+import gzip
+import json
+import os
+import types
+import zlib
+
+import pytest
+from flask import Flask
+
+import app.utils.http_cache as http_cache
+from app.utils.http_cache import artifact_variants, send_artifact, variant_path
+
+BODY = json.dumps([{"question": f"Q{i}", "answer": f"A{i}"} for i in range(100)])
+
+
+@pytest.fixture(autouse=True)
+def fake_brotli(monkeypatch):
+    # brotli is optional; a stand-in exercises the same negotiation
+    monkeypatch.setattr(
+        http_cache,
+        "brotli",
+        types.SimpleNamespace(compress=lambda data, quality: zlib.compress(data, 9)),
+    )
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    path = tmp_path / "doc_flashcards.json"
+    path.write_text(BODY, encoding="utf-8")
+    return str(path)
+
+
+@pytest.fixture
+def client(artifact):
+    app = Flask(__name__)
+
+    @app.route("/artifact")
+    def serve():
+        return send_artifact(artifact, "application/json", max_age=60)
+
+    return app.test_client()
+
+
+def replace(path: str, text: str):
+    # Like write_atomic: a new file, so a new mtime even within the same tick
+    tmp_path = f"{path}.new"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def test_variants_are_stored_once_per_version(artifact):
+    meta = artifact_variants(artifact)
+    assert meta["encodings"] == ["br", "gzip"]
+    gz_path = variant_path(artifact, meta["sha256"], "gzip")
+    assert gzip.decompress(open(gz_path, "rb").read()).decode() == BODY
+
+    written = os.stat(gz_path).st_mtime_ns
+    assert artifact_variants(artifact) == meta
+    assert os.stat(gz_path).st_mtime_ns == written
+
+
+def test_new_version_gets_new_variants_and_drops_old_ones(artifact):
+    old = artifact_variants(artifact)
+    replace(artifact, BODY.replace("Q1", "Question one"))
+    new = artifact_variants(artifact)
+
+    assert new["sha256"] != old["sha256"]
+    assert os.path.isfile(variant_path(artifact, new["sha256"], "gzip"))
+    assert not os.path.exists(variant_path(artifact, old["sha256"], "gzip"))
+
+
+def test_stale_variant_cannot_pair_with_new_meta(artifact):
+    old = artifact_variants(artifact)
+    replace(artifact, BODY.replace("Q1", "Question one"))
+    new = artifact_variants(artifact)
+    # A slow writer of the old version finishing late touches only its own names
+    with open(variant_path(artifact, old["sha256"], "gzip"), "wb") as f:
+        f.write(gzip.compress(BODY.encode()))
+
+    gz_path = variant_path(artifact, new["sha256"], "gzip")
+    assert "Question one" in gzip.decompress(open(gz_path, "rb").read()).decode()
+
+
+def test_missing_variant_is_rebuilt(artifact):
+    meta = artifact_variants(artifact)
+    os.remove(variant_path(artifact, meta["sha256"], "br"))
+    assert artifact_variants(artifact) == meta
+    assert os.path.isfile(variant_path(artifact, meta["sha256"], "br"))
+
+
+def test_small_bodies_have_no_variants(tmp_path):
+    path = tmp_path / "doc_summary.txt"
+    path.write_text("short", encoding="utf-8")
+    assert artifact_variants(str(path))["encodings"] == []
+
+
+@pytest.mark.parametrize(
+    "accept, encoding",
+    [("gzip", "gzip"), ("br, gzip", "br"), ("br;q=0.1, gzip", "gzip"), ("", None)],
+)
+def test_encoding_is_negotiated_with_its_own_etag(client, artifact, accept, encoding):
+    response = client.get("/artifact", headers={"Accept-Encoding": accept})
+    sha256 = artifact_variants(artifact)["sha256"]
+
+    assert response.status_code == 200
+    assert response.headers.get("Content-Encoding") == encoding
+    assert response.headers["ETag"] == (
+        f'"{sha256}"' if encoding is None else f'"{sha256}-{encoding}"'
+    )
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert "Content-Disposition" not in response.headers
+    body = response.get_data()
+    if encoding == "gzip":
+        body = gzip.decompress(body)
+    elif encoding == "br":
+        body = zlib.decompress(body)
+    assert body.decode() == BODY
+
+
+@pytest.mark.parametrize("accept", ["gzip", "br", ""])
+def test_any_encodings_etag_gets_304(client, accept):
+    etag = client.get("/artifact", headers={"Accept-Encoding": "gzip"}).headers["ETag"]
+    response = client.get(
+        "/artifact", headers={"If-None-Match": etag, "Accept-Encoding": accept}
+    )
+    assert response.status_code == 304
+    assert response.get_data() == b""
+    assert response.headers["Cache-Control"] == "private, max-age=60, must-revalidate"
+
+
+def test_changed_artifact_is_sent_again(client, artifact):
+    etag = client.get("/artifact").headers["ETag"]
+    replace(artifact, BODY.replace("Q1", "Question one"))
+    response = client.get("/artifact", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert "Question one" in response.get_data(as_text=True)
+
+
+def test_weak_and_listed_etags_match(client):
+    sha256 = client.get("/artifact").headers["ETag"].strip('"')
+    for header in (f'W/"{sha256}"', f'"other", "{sha256}-br"', "*"):
+        assert (
+            client.get("/artifact", headers={"If-None-Match": header}).status_code
+            == 304
+        )
+    assert (
+        client.get("/artifact", headers={"If-None-Match": '"other"'}).status_code == 200
+    )
@@ -0,0 +1,180 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+import app.db.db_funcs as db_funcs
+import app.utils.jobs as jobs_module
+from app.utils.jobs import DONE, FAILED, RUNNING, Job, JobQueue
+
+
+@pytest.fixture
+def queue():
+    queue = JobQueue(max_workers=2)
+    yield queue
+    queue.shutdown()
+
+
+@pytest.fixture
+def shared_queue(database):
+    queue = JobQueue(max_workers=2)
+    queue.shared = True
+    yield queue
+    queue.shutdown()
+
+
+def slow(result, started=None, release=None):
+    if started is not None:
+        started.set()
+    if release is not None:
+        release.wait(5)
+    return result
+
+
+def foreign_job(key: tuple, pid: int) -> Job:
+    """A running job recorded by another process."""
+    job = Job(key, key[-1])
+    job.status = RUNNING
+    job.pid = pid
+    job.started_at = time.time()
+    db_funcs.save_job(job.to_row())
+    return job
+
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_concurrent_submits_share_one_job(queue):
+    calls = []
+    release = threading.Event()
+
+    def build():
+        calls.append(1)
+        release.wait(5)
+        return {"ok": True}
+
+    submitted = []
+    threads = [
+        threading.Thread(
+            target=lambda: submitted.append(queue.submit(("d", "x"), build))
+        )
+        for _ in range(10)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    release.set()
+
+    assert len({job.id for job in submitted}) == 1
+    assert submitted[0].wait(5) and submitted[0].result == {"ok": True}
+    assert calls == [1]
+    assert queue.inflight(("d", "x")) is None
+
+
+def test_finished_key_runs_again(queue):
+    first = queue.submit(("d", "x"), slow, 1)
+    first.wait(5)
+    second = queue.submit(("d", "x"), slow, 2)
+    second.wait(5)
+    assert first.id != second.id and second.result == 2
+
+
+def test_failed_job_reports_error(queue):
+    def broken():
+        raise ValueError("boom")
+
+    job = queue.submit(("d", "summary"), broken)
+    job.wait(5)
+    assert job.status == FAILED
+    assert job.error == "Error generating summary"
+
+
+def test_requested_background_job_moves_to_main_workers(queue):
+    queue.background_workers = 1
+    started = threading.Event()
+    release = threading.Event()
+    # Occupies the only background worker
+    queue.submit(("busy", "x"), slow, None, started, release, background=True)
+    started.wait(5)
+
+    waiting = queue.submit(("d", "x"), slow, "done", background=True)
+    assert queue.submit(("d", "x"), slow, "other") is waiting
+    assert waiting.wait(5) and waiting.result == "done"
+    release.set()
+
+
+def test_call_runs_in_the_calling_thread_and_joins_in_flight(queue):
+    assert queue.call(("d", "cards"), threading.current_thread) is (
+        threading.current_thread()
+    )
+
+    started = threading.Event()
+    release = threading.Event()
+    job = queue.submit(("e", "cards"), slow, "shared", started, release)
+    started.wait(5)
+    threading.Timer(0.1, release.set).start()
+    assert queue.call(("e", "cards"), slow, "own") == "shared"
+    assert job.status == DONE
+
+    with pytest.raises(RuntimeError):
+        queue.call(("f", "cards"), int, "not a number")
+
+
+def test_call_inside_a_job_does_not_need_a_free_worker():
+    queue = JobQueue(max_workers=1)
+    try:
+        job = queue.submit(
+            ("d", "quiz"), lambda: queue.call(("d", "cards"), slow, [1, 2])
+        )
+        assert job.wait(5) and job.result == [1, 2]
+    finally:
+        queue.shutdown()
+
+
+def test_completed_reuses_one_job_per_key(queue):
+    first = queue.completed(("d", "summary"), {"summary": "a"})
+    assert queue.completed(("d", "summary"), {"summary": "a"}) is first
+    changed = queue.completed(("d", "summary"), {"summary": "b"})
+    assert changed.id == first.id and changed.result == {"summary": "b"}
+    assert queue.get(first.id) is changed
+
+
+def test_shared_job_of_another_process_is_joined(shared_queue):
+    other = foreign_job(("d", "summary"), os.getppid())
+    calls = []
+    job = shared_queue.submit(("d", "summary"), calls.append, 1)
+    assert job.id == other.id and calls == []
+    assert shared_queue.inflight(("d", "summary")).id == other.id
+
+
+def test_shared_job_of_a_dead_process_is_replaced(shared_queue):
+    other = foreign_job(("d", "summary"), dead_pid())
+    job = shared_queue.submit(("d", "summary"), slow, "mine")
+    assert job.id != other.id
+    assert job.wait(5) and job.result == "mine"
+    row = db_funcs.get_job(job.id)
+    assert row[3] == DONE and json.loads(row[4]) == "mine"
+    # Polling the dead job's id reports it failed
+    assert shared_queue.get(other.id).status == FAILED
+
+
+def test_call_waits_for_a_shared_job_to_finish(shared_queue, monkeypatch):
+    monkeypatch.setattr(jobs_module, "SHARED_POLL_SECONDS", 0.05)
+    other = foreign_job(("d", "cards"), os.getppid())
+
+    def finish():
+        other.status = DONE
+        other.result = {"cards": []}
+        other.finished_at = time.time()
+        db_funcs.save_job(other.to_row())
+
+    threading.Timer(0.2, finish).start()
+    assert shared_queue.call(("d", "cards"), slow, "own") == {"cards": []}
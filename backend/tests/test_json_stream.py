@@ -0,0 +1,76 @@
+import pytest
+
+from app.ai.json_stream import JsonObjectStream, loads_lenient, parse_objects
+
+CARDS = (
+    '```json\n[{"question": "What is {x}?", "answer": "a \\"brace\\" }"},\n'
+    ' {"question": "Back\\\\slash", "answer": "ok"},]\n```'
+)
+EXPECTED = [
+    {"question": "What is {x}?", "answer": 'a "brace" }'},
+    {"question": "Back\\slash", "answer": "ok"},
+]
+
+
+def feed_in_pieces(text: str, size: int) -> list[dict]:
+    stream = JsonObjectStream()
+    objects = []
+    for i in range(0, len(text), size):
+        objects += stream.feed(text[i : i + size])
+    return objects + stream.close()
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, len(CARDS)])
+def test_objects_survive_any_chunk_boundary(size):
+    assert feed_in_pieces(CARDS, size) == EXPECTED
+
+
+def test_objects_are_returned_as_soon_as_they_close():
+    stream = JsonObjectStream()
+    assert stream.feed('[{"a": 1}, {"b"') == [{"a": 1}]
+    assert stream.feed(": 2}]") == [{"b": 2}]
+    assert stream.close() == []
+
+
+def test_nested_objects_come_out_whole():
+    assert parse_objects('{"a": {"b": {"c": 1}}} {"d": 2}') == [
+        {"a": {"b": {"c": 1}}},
+        {"d": 2},
+    ]
+
+
+def test_escaped_quote_at_chunk_boundary_keeps_string_open():
+    stream = JsonObjectStream()
+    assert stream.feed('{"q": "say \\') == []
+    assert stream.feed('"} now"}') == [{"q": 'say "} now'}]
+
+
+@pytest.mark.parametrize(
+    "truncated, expected",
+    [
+        ('{"question": "Q1", "answer": "A1"', {"question": "Q1", "answer": "A1"}),
+        ('{"question": "Q1", "answer": "A1",', {"question": "Q1", "answer": "A1"}),
+        ('{"question": "Q1", "answer":', {"question": "Q1"}),
+        ('{"question": "Q1", "answer"', {"question": "Q1"}),
+        ('{"question": "Q1", "answer": "A1 cut of', {"question": "Q1"}),
+        ('{"outer": {"inner": 1', {"outer": {"inner": 1}}),
+    ],
+)
+def test_close_repairs_a_truncated_object(truncated, expected):
+    assert parse_objects('[{"first": true}, ' + truncated) == [
+        {"first": True},
+        expected,
+    ]
+
+
+def test_invalid_objects_and_non_objects_are_skipped():
+    assert parse_objects('{"a": nope} [1, 2] {"b": 1}') == [{"b": 1}]
+
+
+def test_loads_lenient_accepts_trailing_commas():
+    assert loads_lenient('{"a": [1, 2,], "b": {"c": 3,},}') == {
+        "a": [1, 2],
+        "b": {"c": 3},
+    }
+    with pytest.raises(ValueError):
+        loads_lenient("{not json}")
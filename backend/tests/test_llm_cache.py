@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+from app.ai.llm_cache import LLMCache
+
+MAX_BYTES = 20000
+
+
+def disk_bytes(folder) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(folder)
+        for name in names
+    )
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two caches on one folder, as in two server processes."""
+    caches = []
+    for _ in range(2):
+        cache = LLMCache(MAX_BYTES)
+        cache.folder = str(tmp_path)
+        cache._scan()
+        caches.append(cache)
+    return caches
+
+
+def test_budget_holds_across_processes(workers, tmp_path):
+    for i in range(200):
+        workers[i % 2].put(f"{i:064x}", "x" * 200)
+        # Each process only evicts on its own writes, yet sees both
+        assert disk_bytes(tmp_path) <= MAX_BYTES * (1 + 2 * 0.05) + 300
+
+    assert disk_bytes(tmp_path) <= MAX_BYTES
+    assert sum(cache.evictions for cache in workers) > 0
+
+
+def test_least_recently_used_entries_go_first(workers):
+    first, second = workers
+    fillers = [f"{i:064x}" for i in range(75)]
+    for age, key in enumerate(["a" * 64, "b" * 64] + fillers):
+        second.put(key, "x" * 200)
+        os.utime(second._path(key), (1000 + age, 1000 + age))
+    # Read long after it was written: now the most recently used
+    assert first.get("a" * 64) is not None
+
+    for i in range(10):
+        first.put(f"{i:064x}".replace("0", "f"), "x" * 200)
+
+    assert os.path.isfile(first._path("a" * 64))
+    assert not os.path.exists(first._path("b" * 64))
+    assert not os.path.exists(first._path(fillers[0]))
+    assert os.path.isfile(first._path(fillers[-1]))
@@ -0,0 +1,117 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import app.ai.llm as llm
+from app.ai.llm import build_pool
+from app.ai.llm_pool import LLMBusyError, PooledChatModel
+from app.utils.metrics import metrics
+from benchmarks.stub_ollama import StubOllama
+
+PROMPT = "Write a study guide. " + "The cell membrane controls transport. " * 20
+
+
+@pytest.fixture
+def stubs():
+    servers = [StubOllama(tokens_per_second=4000).start() for _ in range(2)]
+    yield servers
+    for server in servers:
+        server.stop()
+
+
+def chat_model(pool) -> PooledChatModel:
+    return PooledChatModel(model="stub", temperature=0.0, pool=pool)
+
+
+def test_acquire_prefers_least_loaded_backend(stubs):
+    pool = build_pool([s.url for s in stubs], max_inflight=2)
+    first = pool.acquire()
+    second = pool.acquire()
+    assert first is not second
+    pool.release(first)
+    # first is idle again, second still holds a call
+    assert pool.acquire() is first
+
+
+def test_calls_spread_across_backends_within_limit(stubs):
+    pool = build_pool([s.url for s in stubs], max_inflight=2)
+    model = chat_model(pool)
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        replies = list(executor.map(lambda _: model.invoke(PROMPT), range(8)))
+
+    assert all(reply.content for reply in replies)
+    assert all(s.requests for s in stubs)
+    assert sum(s.requests for s in stubs) == 8
+    assert all(s.peak_inflight <= 2 for s in stubs)
+    assert all(b["inflight"] == 0 for b in pool.stats())
+
+
+def test_queue_timeout_raises_busy(stubs):
+    pool = build_pool([stubs[0].url], max_inflight=1)
+    held = pool.acquire()
+    with pytest.raises(LLMBusyError):
+        pool.acquire(timeout=0.1)
+    pool.release(held)
+    pool.release(pool.acquire(timeout=0.1))
+
+
+def test_full_queue_raises_busy(stubs):
+    pool = build_pool([stubs[0].url], max_inflight=1, max_queue=1)
+    held = pool.acquire()
+    results = []
+
+    def wait_for_slot():
+        backend = pool.acquire(timeout=5)
+        results.append(backend)
+        pool.release(backend)
+
+    waiter = threading.Thread(target=wait_for_slot)
+    waiter.start()
+    # Until the waiter is queued (llm_queue_waiting)
+    while not pool.collect_metrics()[1][3]:
+        time.sleep(0.01)
+    with pytest.raises(LLMBusyError, match="queue is full"):
+        pool.acquire(timeout=5)
+
+    pool.release(held)
+    waiter.join(5)
+    assert results == [held]
+
+
+def test_unreachable_backend_fails_over(stubs):
+    dead = StubOllama().start()
+    dead_url = dead.url
+    dead.stop()
+    pool = build_pool([dead_url, stubs[0].url], max_inflight=1)
+
+    reply = chat_model(pool).invoke(PROMPT)
+
+    assert reply.content
+    assert stubs[0].requests == 1
+    down = {b["url"]: b["down"] for b in pool.stats()}
+    assert down == {dead_url: True, stubs[0].url: False}
+
+
+def test_every_backend_unreachable_raises():
+    servers = [StubOllama().start() for _ in range(2)]
+    urls = [server.url for server in servers]
+    for server in servers:
+        server.stop()
+    pool = build_pool(urls, max_inflight=1)
+
+    with pytest.raises(Exception):
+        chat_model(pool).invoke(PROMPT)
+    assert all(b["down"] and b["inflight"] == 0 for b in pool.stats())
+
+
+def test_set_pool_none_goes_back_to_the_default(stubs, monkeypatch):
+    monkeypatch.setattr(llm, "_pool", None)
+    llm.set_pool(build_pool([s.url for s in stubs]))
+    assert "llm_backends" in metrics._collectors
+
+    llm.set_pool(None)
+
+    assert llm._pool is None
+    assert "llm_backends" not in metrics._collectors
@@ -0,0 +1,69 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app.utils.metrics import Metrics
+
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = Metrics()
+    registry.folder = str(tmp_path)
+    return registry
+
+
+def other_process(registry: Metrics, pid: int, observations: list, queued: int):
+    """Writes the snapshot another server process would have flushed."""
+    other = Metrics()
+    histogram = other.histogram("work_seconds", "Work time", (1, 5), ("kind",))
+    for value, kind in observations:
+        histogram.observe(value, kind=kind)
+    other.register_collector("jobs", lambda: [("jobs_queued", "gauge", "Jobs", queued)])
+    with open(os.path.join(registry.folder, f"{pid}.json"), "w") as f:
+        json.dump(other.snapshot(), f)
+
+
+def test_single_process_renders_without_a_folder():
+    registry = Metrics()
+    registry.histogram("work_seconds", "Work time", (1, 5)).observe(2)
+    text = registry.render()
+    assert 'work_seconds_bucket{le="5"} 1' in text
+    assert "work_seconds_count 1" in text
+
+
+def test_scrape_sums_every_live_process(registry):
+    histogram = registry.histogram("work_seconds", "Work time", (1, 5), ("kind",))
+    histogram.observe(0.5, kind="a")
+    registry.register_collector("jobs", lambda: [("jobs_queued", "gauge", "Jobs", 2)])
+    other_process(registry, os.getppid(), [(3, "a"), (10, "b")], 5)
+
+    text = registry.render()
+
+    assert 'work_seconds_bucket{kind="a",le="1"} 1' in text
+    assert 'work_seconds_bucket{kind="a",le="5"} 2' in text
+    assert 'work_seconds_count{kind="a"} 2' in text
+    assert 'work_seconds_sum{kind="a"} 3.5' in text
+    assert 'work_seconds_bucket{kind="b",le="+Inf"} 1' in text
+    assert "jobs_queued 7" in text
+    assert text.count("# TYPE work_seconds histogram") == 1
+    assert os.path.isfile(os.path.join(registry.folder, f"{os.getpid()}.json"))
+
+
+def test_exited_processes_are_dropped(registry):
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    other_process(registry, process.pid, [(3, "a")], 5)
+
+    text = registry.render()
+
+    assert "work_seconds" not in text
+    assert not os.path.exists(os.path.join(registry.folder, f"{process.pid}.json"))
+
+
+def test_forked_worker_starts_from_zero(registry):
+    registry.histogram("work_seconds", "Work time", (1, 5)).observe(2)
+    registry._reset_after_fork()
+    assert "work_seconds_count" not in registry.render()
@@ -0,0 +1,88 @@
+import json
+
+from app.ai.revisions import Revision, fingerprint
+
+CHUNK_TOKENS = 120
+
+
+def paragraph(i: int, tag: str = "") -> str:
+    return " ".join(f"p{i}{tag}w{j}" for j in range(10)) + "."
+
+
+def document(count: int, changed: dict | None = None) -> str:
+    changed = changed or {}
+    return "\n\n".join(changed.get(i, paragraph(i)) for i in range(count))
+
+
+def generate(revision: Revision, text: str, overlap: int = 0) -> list[int]:
+    """Splits text and fills in every chunk, like summarize_chunks; returns those generated."""
+    chunks = revision.split(text, CHUNK_TOKENS, overlap)
+    generated = []
+    for index, chunk in enumerate(chunks):
+        if revision.output(index) is None:
+            revision.record(index, f"notes on {fingerprint(chunk)}")
+            generated.append(index)
+    return generated
+
+
+def previous_manifest(text: str, overlap: int = 0) -> dict:
+    revision = Revision()
+    generate(revision, text, overlap)
+    # Stored as JSON between versions
+    return json.loads(json.dumps(revision.manifest()))
+
+
+def test_fingerprint_ignores_whitespace_layout():
+    assert fingerprint("a  b\nc") == fingerprint(" a b c ")
+    assert fingerprint("a b c") != fingerprint("a b d")
+
+
+def test_first_version_generates_every_chunk():
+    revision = Revision()
+    generated = generate(revision, document(30))
+    manifest = revision.manifest()
+    assert generated == list(range(len(manifest["chunks"])))
+    assert revision.reused == 0
+    assert all(chunk["output"] for chunk in manifest["chunks"])
+
+
+def test_unchanged_text_reuses_every_chunk():
+    text = document(30)
+    revision = Revision(previous_manifest(text))
+    assert generate(revision, text) == []
+    assert revision.reused == len(revision.chunks)
+
+
+def test_edit_only_regenerates_the_chunks_around_it():
+    revision = Revision(previous_manifest(document(30)))
+    generated = generate(revision, document(30, {15: paragraph(15, "x")}))
+    assert 1 <= len(generated) <= 2
+    assert revision.reused == len(revision.chunks) - len(generated)
+
+
+def test_inserted_paragraph_keeps_later_boundaries():
+    revision = Revision(previous_manifest(document(30)))
+    text = document(30, {3: paragraph(3) + "\n\n" + paragraph(99)})
+    generated = generate(revision, text)
+    # Without anchoring every chunk after the insert would shift
+    assert 1 <= len(generated) <= 2
+    assert max(generated) < len(revision.chunks) // 2
+
+
+def test_changed_chunk_settings_reuse_nothing():
+    revision = Revision(previous_manifest(document(30)))
+    chunks = revision.split(document(30), CHUNK_TOKENS, 20)
+    assert all(revision.output(i) is None for i in range(len(chunks)))
+    assert revision.reused == 0
+
+
+def test_overlapping_chunks_are_reused():
+    text = document(30)
+    manifest = previous_manifest(text, overlap=30)
+    assert any(chunk["overlap"] for chunk in manifest["chunks"][1:])
+    revision = Revision(manifest)
+    assert generate(revision, text, overlap=30) == []
+
+
+def test_manifest_is_none_until_split():
+    assert Revision().manifest() is None
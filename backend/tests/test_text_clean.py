@@ -0,0 +1,77 @@
+from app.utils.file_ops import PAGE_BREAK
+from app.utils.text_clean import (
+    clean_text,
+    join_hyphenated,
+    strip_page_furniture,
+    truncate_to_budget,
+)
+
+
+def body(i: int) -> str:
+    # Letters, not digits: header detection ignores digits
+    return "\n".join(f"Line {'abcdefgh'[j]} of part {'abcdefgh'[i]}." for j in range(8))
+
+
+def page(i: int, footer: str = "", header: str = "Annual Report 2023") -> str:
+    return "\n".join(line for line in (header, body(i), footer) if line)
+
+
+def test_running_headers_and_page_numbers_are_removed():
+    pages = [page(i, str(i + 1)) for i in range(5)]
+    cleaned, removed = strip_page_furniture(pages)
+    assert cleaned == [body(i) for i in range(5)]
+    assert removed == 10
+
+
+def test_page_numbers_may_skip_a_dropped_blank_page():
+    pages = [page(i, n) for i, n in enumerate(("1", "2", "4", "5"))]
+    cleaned, _ = strip_page_furniture(pages)
+    assert cleaned == [body(i) for i in range(4)]
+
+
+def test_numbers_outside_a_sequence_are_kept():
+    footers = ("42", "17", "1999", "8")
+    cleaned, _ = strip_page_furniture([page(i, n) for i, n in enumerate(footers)])
+    assert cleaned == [f"{body(i)}\n{n}" for i, n in enumerate(footers)]
+
+
+def test_lone_number_is_kept_next_to_numbered_pages():
+    pages = [page(0, "3"), page(1, "Total\n250"), page(2, "5"), page(3, "6")]
+    cleaned, _ = strip_page_furniture(pages)
+    assert cleaned == [body(0), f"{body(1)}\nTotal\n250", body(2), body(3)]
+
+
+def test_line_broken_words_are_joined():
+    assert join_hyphenated("inter-\nnational law") == "international law"
+    assert join_hyphenated("pro\u00adcess") == "pro\u00adcess"
+    assert join_hyphenated("pro\u00ad\ncess") == "process"
+
+
+def test_compounds_keep_their_hyphen():
+    assert join_hyphenated("the Anglo-\nSaxon era") == "the Anglo-Saxon era"
+    text = "Low self-esteem. Building self-\nesteem takes time."
+    assert join_hyphenated(text) == "Low self-esteem. Building self-esteem takes time."
+
+
+def test_text_over_budget_is_cut_at_a_word_break():
+    text = " ".join(f"word{i}" for i in range(1000))
+    cut = truncate_to_budget(text, 100)
+    assert len(cut) <= 400
+    assert len(cut) >= 360
+    assert text.startswith(cut)
+    assert text[len(cut)] == " "
+    assert truncate_to_budget("short", 100) == "short"
+
+
+def test_clean_text_enforces_the_budget():
+    long_line = "Some sentence here. " * 200
+    text = PAGE_BREAK.join(f"{body(i)}\n{long_line}\n{body(i)}" for i in range(3))
+    cleaned, report = clean_text(text, token_budget=500)
+    assert report["over_budget"]
+    assert report["tokens_after"] <= 500
+    assert report["tokens_truncated"] > 0
+    assert len(cleaned) <= 2000
+
+    cleaned, report = clean_text(text, token_budget=None)
+    assert not report["over_budget"]
+    assert report["tokens_truncated"] == 0
@@ -0,0 +1,84 @@
+import io
+import threading
+import time
+
+import pytest
+from flask import Flask
+
+import app.db.db_funcs as db_funcs
+import app.db.schemas as schemas
+import app.routes.upload_routes as upload_routes
+from app.routes.upload_routes import store_upload
+from app.utils.storage import QuotaExceededError
+from app.utils.storage_manager import storage_manager
+
+UPLOADS = 6
+
+
+@pytest.fixture
+def user_id(database):
+    user = db_funcs.add_user(schemas.User(username="reader", password="x"))
+    return user.id
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    app = Flask(__name__)
+    app.config["UPLOAD_FOLDER"] = str(tmp_path / "uploads")
+    app.config["MAX_UPLOAD_BYTES"] = 1024
+    monkeypatch.setattr(storage_manager, "user_quota_bytes", 250)
+    # Widen the window between each check and the insert it guards
+    check_quota, find = storage_manager.check_quota, upload_routes.find_document_by_hash
+    monkeypatch.setattr(
+        storage_manager, "check_quota", lambda *args: slowly(check_quota, *args)
+    )
+    monkeypatch.setattr(
+        upload_routes, "find_document_by_hash", lambda *args: slowly(find, *args)
+    )
+    return app
+
+
+def slowly(fn, *args):
+    result = fn(*args)
+    time.sleep(0.02)
+    return result
+
+
+def upload_all(app, contents: list[bytes], user_id: int) -> list:
+    """Stores every content from its own thread at once; returns replies or errors."""
+    results = [None] * len(contents)
+    start = threading.Barrier(len(contents))
+
+    def run(i):
+        with app.app_context():
+            start.wait()
+            try:
+                # Not extractable, so no background jobs are scheduled
+                results[i] = store_upload(io.BytesIO(contents[i]), "notes.bin", user_id)
+            except QuotaExceededError as e:
+                results[i] = e
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(contents))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+    return results
+
+
+def test_concurrent_uploads_cannot_overrun_the_quota(app, user_id):
+    contents = [bytes([i]) * 100 for i in range(UPLOADS)]
+    results = upload_all(app, contents, user_id)
+
+    stored = [r for r in results if isinstance(r, dict)]
+    assert len(stored) == 2
+    assert sum(isinstance(r, QuotaExceededError) for r in results) == UPLOADS - 2
+    assert db_funcs.user_storage(user_id) == (2, 200)
+
+
+def test_concurrent_identical_uploads_make_one_document(app, user_id):
+    results = upload_all(app, [b"same bytes" * 10] * UPLOADS, user_id)
+
+    assert len({r["file_id"] for r in results}) == 1
+    assert sum(not r["duplicate"] for r in results) == 1
+    assert db_funcs.user_storage(user_id) == (1, 100)
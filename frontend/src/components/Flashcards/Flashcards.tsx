@@ -4,7 +4,7 @@ import { AnimatePresence, motion } from 'framer-motion'
 import FileDropZone from '../FileUpload/FileDropZone'
 import FileList from '../FileUpload/FileList'
 import Button from '../Button'
-import { validateFile } from '../helpers'
+import { validateFile, waitForJob } from '../helpers'
 import rightArrowImg from '../../assets/right-arrow.svg'
 import leftArrowImg from '../../assets/left-arrow.svg'
 
@@ -83,7 +83,10 @@ function Flashcards({ API_BASE_URL }: FlashcardsProps) {
       const res = await axios.post<UploadResponse>(
         `http://${API_BASE_URL}/upload`,
         fd,
-        { headers: { 'Content-Type': 'multipart/form-data' } }
+        {
+          headers: { 'Content-Type': 'multipart/form-data' },
+          withCredentials: true,
+        }
       )
       setUploadedFileId(res.data.saved_as)
     } catch {
@@ -100,8 +103,11 @@ function Flashcards({ API_BASE_URL }: FlashcardsProps) {
 
     axios
       .get(`http://${API_BASE_URL}/generate_flashcards/${uploadedFileId}`)
-      .then((res) => {
-        setFlashcards(res.data.flashcards ?? [])
+      .then((res) =>
+        waitForJob<{ flashcards: Flashcard[] }>(API_BASE_URL, res.data.job_id)
+      )
+      .then((result) => {
+        setFlashcards(result.flashcards ?? [])
         setCurrentIndex(0)
       })
       .catch(() => setError('Could not generate flashcards'))
@@ -5,7 +5,7 @@ import FileDropZone from '../FileUpload/FileDropZone'
 import FileList from '../FileUpload/FileList'
 import Button from '../Button'
 import SummaryPanel from './SummaryPanel'
-import { validateFile } from '../helpers'
+import { validateFile, waitForJob } from '../helpers'
 
 interface FileObject {
   file: File
@@ -104,6 +104,7 @@ function CompleteFileUpload({ API_BASE_URL }: { API_BASE_URL: string }) {
           formData,
           {
             headers: { 'Content-Type': 'multipart/form-data' },
+            withCredentials: true,
           }
         )
 
@@ -111,7 +112,11 @@ function CompleteFileUpload({ API_BASE_URL }: { API_BASE_URL: string }) {
         const summaryResponse = await axios.get(
           `http://${API_BASE_URL}/generate_summary/${response.data.saved_as}`
         )
-        setSummary(summaryResponse.data.summary)
+        const result = await waitForJob<{ summary: string }>(
+          API_BASE_URL,
+          summaryResponse.data.job_id
+        )
+        setSummary(result.summary)
 
         setMultipleResponseMessage((prev) => ({
           files: prev?.files ? [...prev.files, response.data] : [response.data],
@@ -1,3 +1,5 @@
+import axios from 'axios'
+
 export const formatFileSize = (bytes: number): string => {
   if (bytes === 0) return '0 Bytes'
   const k = 1024
@@ -19,3 +21,28 @@ export const validateFile = (
   }
   return null
 }
+
+interface JobStatus<T> {
+  job_id: string
+  status: 'queued' | 'running' | 'done' | 'failed'
+  result?: T
+  error?: string
+}
+
+// Generation endpoints return a job id; poll /jobs/<id> until it finishes
+export const waitForJob = async <T>(
+  apiBaseUrl: string,
+  jobId: string,
+  intervalMs = 1000
+): Promise<T> => {
+  for (;;) {
+    const res = await axios.get<JobStatus<T>>(
+      `http://${apiBaseUrl}/jobs/${jobId}`
+    )
+    if (res.data.status === 'done') return res.data.result as T
+    if (res.data.status === 'failed') {
+      throw new Error(res.data.error ?? 'Job failed')
+    }
+    await new Promise((resolve) => setTimeout(resolve, intervalMs))
+  }
+}